@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from moviepy.editor import VideoClip
+
+KEYED_ASSETS_DIR = ".editing_assets/keyed_assets/"
+# Uncompressed RGBA frames are about 8 MB per 1080p frame, a budget of a few green screen animations
+KEYED_ASSETS_MAX_SIZE = 4 * 1024 * 1024 * 1024
+# Bump when the green screen keying or the frame layout changes, so that stale assets are never reused
+KEYED_ASSETS_VERSION = 1
+# Actions that only change the pixels of a frame, independently of its time
+PIXEL_ACTIONS = {'resize', 'crop', 'green_screen', 'normalize_image', 'auto_resize_image'}
+# Pixel actions whose result can be computed once and stored
+STATIC_PIXEL_ACTIONS = {'resize', 'crop', 'green_screen'}
+
+
+def split_keyed_actions(actions: List[Dict[str, Any]]) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Splits the actions of a green screen video asset into the pixel actions that can be baked into a keyed asset
+    and the remaining timing / positioning actions. Returns None when the asset has nothing worth preprocessing.
+    """
+    pixel_actions = [action for action in actions if action['type'] in PIXEL_ACTIONS]
+    if not any(action['type'] == 'green_screen' for action in pixel_actions):
+        return None
+    for action in pixel_actions:
+        if action['type'] not in STATIC_PIXEL_ACTIONS or callable(action['param'].get('newsize')):
+            return None
+    other_actions = [action for action in actions if action['type'] not in PIXEL_ACTIONS]
+    return pixel_actions, other_actions
+
+
+def make_keyed_clip(frames: np.ndarray, fps: float, duration: float) -> VideoClip:
+    """Wraps an array of RGBA frames into a clip whose mask is the alpha channel"""
+    last_index = len(frames) - 1
+
+    def frame_index(t):
+        return min(int(fps * t + 0.00001), last_index)
+    clip = VideoClip(lambda t: frames[frame_index(t)][:, :, :3], duration=duration)
+    mask = VideoClip(lambda t: frames[frame_index(t)][:, :, 3] / 255.0, ismask=True, duration=duration)
+    clip = clip.set_mask(mask)
+    clip.fps = fps
+    return clip
+
+
+class KeyedVideoCache:
+    """
+    On-disk store of green screen videos with their chroma key and static resize / crop already applied.
+    Each asset is a memory-mapped array of RGBA frames, so renders read the alpha directly instead of keying every frame.
+    The least recently used assets are evicted when the store grows over its size budget.
+    """
+
+    def __init__(self, cache_dir=KEYED_ASSETS_DIR, max_size=KEYED_ASSETS_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_key(self, url: str, pixel_actions: List[Dict[str, Any]]) -> str:
+        key_data = {'url': os.path.abspath(url) if os.path.exists(url) else url,
+                    'actions': pixel_actions,
+                    'version': KEYED_ASSETS_VERSION}
+        if os.path.exists(url):
+            stat = os.stat(url)
+            key_data['source'] = [stat.st_size, stat.st_mtime]
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> Optional[VideoClip]:
+        frames_path = os.path.join(self.cache_dir, f"{key}.npy")
+        info_path = os.path.join(self.cache_dir, f"{key}.json")
+        # The info file is written last, its presence means the frames are complete
+        if not os.path.exists(info_path):
+            return None
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        try:
+            os.utime(info_path)
+        except OSError:
+            pass
+        frames = np.load(frames_path, mmap_mode='r')
+        return make_keyed_clip(frames, info['fps'], info['duration'])
+
+    def build(self, key: str, keyed_clip: VideoClip):
+        """Renders the frames and alpha of a keyed moviepy clip into the store"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        times = np.arange(0, keyed_clip.duration, 1.0 / keyed_clip.fps)
+        width, height = keyed_clip.size
+        # The .tmp suffix keeps partial files out of the eviction of other processes
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            frames = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.uint8, shape=(len(times), height, width, 4))
+            for i, t in enumerate(times):
+                frames[i, :, :, :3] = keyed_clip.get_frame(t)
+                frames[i, :, :, 3] = np.round(keyed_clip.mask.get_frame(t) * 255)
+            frames.flush()
+            del frames
+            os.replace(temp_path, os.path.join(self.cache_dir, f"{key}.npy"))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        info_path = os.path.join(self.cache_dir, f"{key}.json")
+        temp_info_path = f"{info_path}.{os.getpid()}.tmp"
+        with open(temp_info_path, 'w', encoding='utf-8') as f:
+            json.dump({'fps': keyed_clip.fps, 'duration': keyed_clip.duration}, f)
+        os.replace(temp_info_path, info_path)
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None):
+        """Deletes the least recently used assets, the last time an asset was loaded being the time of its info file"""
+        assets = {}
+        for filename in os.listdir(self.cache_dir):
+            key, extension = os.path.splitext(filename)
+            if extension not in ('.npy', '.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                continue
+            asset = assets.setdefault(key, {'mtime': 0, 'size': 0})
+            asset['size'] += stat.st_size
+            if extension == '.json':
+                asset['mtime'] = stat.st_mtime
+        total_size = sum(asset['size'] for asset in assets.values())
+        for key, asset in sorted(assets.items(), key=lambda item: item[1]['mtime']):
+            if total_size <= self.max_size:
+                break
+            if key == keep:
+                continue
+            try:
+                # The info file goes first, so that no render loads an asset whose frames are being deleted
+                for extension in ('.json', '.npy'):
+                    path = os.path.join(self.cache_dir, f"{key}{extension}")
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError:
+                # Frames still memory-mapped by a render can't be deleted on Windows
+                continue
+            total_size -= asset['size']
+
+    def get_or_build(self, url: str, pixel_actions: List[Dict[str, Any]], build_clip: Callable[[], VideoClip]) -> VideoClip:
+        key = self.get_key(url, pixel_actions)
+        clip = self.load(key)
+        if clip is None:
+            self.build(key, build_clip())
+            clip = self.load(key)
+        return clip
@@ -0,0 +1,91 @@
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from shortGPT.editing_framework.ffmpeg_editing_engine import FFmpegEditingEngine
+from shortGPT.editing_framework.schema_utils import schema_hash
+
+AUDIO_PREMIX_DIR = ".editing_assets/audio_premix/"
+AUDIO_PREMIX_MAX_SIZE = 1024 * 1024 * 1024
+
+
+def get_premix_key(schema: Dict[str, Any]) -> str:
+    """Hash of the audio assets, and of the size and modification time of the audio files they read"""
+    sources = {}
+    for asset in schema['audio_assets'].values():
+        url = asset['parameters']['url']
+        if os.path.exists(url):
+            stat = os.stat(url)
+            sources[url] = [stat.st_size, stat.st_mtime]
+    return schema_hash({'audio_assets': schema['audio_assets'], 'sources': sources})
+
+
+def evict_premixes(cache_dir=AUDIO_PREMIX_DIR, max_size=AUDIO_PREMIX_MAX_SIZE, keep: str = None):
+    """Deletes the least recently used tracks until the premixes fit max_size, except the `keep` key"""
+    premixes = {}
+    for filename in os.listdir(cache_dir):
+        # Files being written have the pid in their name: <key>.<pid>.m4a and <key>.json.<pid>.tmp
+        key, extension = os.path.splitext(filename)
+        if extension not in ('.m4a', '.json') or '.' in key:
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, filename))
+        except FileNotFoundError:
+            continue
+        premix = premixes.setdefault(key, {'mtime': 0, 'size': 0})
+        premix['size'] += stat.st_size
+        if extension == '.json':
+            premix['mtime'] = stat.st_mtime
+    total_size = sum(premix['size'] for premix in premixes.values())
+    for key, premix in sorted(premixes.items(), key=lambda item: item[1]['mtime']):
+        if total_size <= max_size:
+            break
+        if key == keep:
+            continue
+        # The info file goes first, so that no render reuses a track being deleted
+        for extension in ('.json', '.m4a'):
+            try:
+                os.remove(os.path.join(cache_dir, f"{key}{extension}"))
+            except FileNotFoundError:
+                pass
+        total_size -= premix['size']
+
+
+def premix_audio(schema: Dict[str, Any], cache_dir=AUDIO_PREMIX_DIR, max_size=AUDIO_PREMIX_MAX_SIZE) -> Optional[Tuple[str, float]]:
+    """
+    Mixes the audio assets of the schema into one AAC track with ffmpeg, reusing the track of a previous render
+    when the audio assets and their files didn't change. The least recently used tracks are evicted when the
+    premixes grow over max_size.
+    Returns the path and the duration of the track, or None if the schema has no audio asset.
+    Raises NotImplementedError if an audio action can't be mixed by ffmpeg.
+    """
+    if not schema['audio_assets']:
+        return None
+    key = get_premix_key(schema)
+    audio_file = os.path.join(cache_dir, f"{key}.m4a")
+    info_file = os.path.join(cache_dir, f"{key}.json")
+    # The info file is written last, its presence means the track is complete
+    if os.path.exists(info_file):
+        with open(info_file, 'r', encoding='utf-8') as f:
+            duration = json.load(f)['duration']
+        try:
+            os.utime(info_file)
+        except OSError:
+            pass
+        return audio_file, duration
+    engine = FFmpegEditingEngine()
+    audio_tracks = engine.compile_audio_tracks(schema)
+    duration = max(track['end'] for track in audio_tracks)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = f"{audio_file}.{os.getpid()}.m4a"
+    try:
+        engine.generate_audio(schema, temp_file, audio_tracks=audio_tracks)
+        os.replace(temp_file, audio_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    with open(f"{info_file}.{os.getpid()}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({'duration': duration}, f)
+    os.replace(f"{info_file}.{os.getpid()}.tmp", info_file)
+    evict_premixes(cache_dir, max_size, keep=key)
+    return audio_file, duration
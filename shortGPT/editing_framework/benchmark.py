@@ -0,0 +1,206 @@
+"""
+Rendering benchmark of the editing framework, on synthetic media generated locally with ffmpeg and Pillow.
+
+    python -m shortGPT.editing_framework.benchmark --configs short caption_heavy --backends moviepy ffmpeg --output results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the memory peaks aren't reported there
+    resource = None
+
+import numpy as np
+from PIL import Image
+
+from shortGPT.editing_framework.core_editing_engine import get_lookahead_workers
+from shortGPT.editing_framework.editing_engine import EditingEngine, EditingStep, RenderingBackend
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+
+BENCHMARK_MEDIA_DIR = ".editing_assets/benchmark_media/"
+BENCHMARK_CONFIGS = {
+    'minimal': {'duration': 5, 'n_captions': 0, 'n_images': 0, 'subscribe_animation': False, 'music': False},
+    'short': {'duration': 10, 'n_captions': 20, 'n_images': 3, 'subscribe_animation': True, 'music': True},
+    'caption_heavy': {'duration': 10, 'n_captions': 100, 'n_images': 0, 'subscribe_animation': False, 'music': True},
+    'image_heavy': {'duration': 10, 'n_captions': 0, 'n_images': 20, 'subscribe_animation': False, 'music': True},
+    'long': {'duration': 30, 'n_captions': 60, 'n_images': 6, 'subscribe_animation': True, 'music': True},
+}
+# Green of the subscribe animation, keyed by its editing step
+GREEN_SCREEN_COLOR = "0x34FF14"
+IMAGE_SIZES = [(800, 600), (600, 900), (1200, 1200)]
+
+
+def run_ffmpeg(args: List[str]):
+    output = subprocess.run(["ffmpeg", "-y", "-v", "error", *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            stdin=subprocess.DEVNULL, text=True)
+    if output.returncode != 0:
+        raise Exception(f"Could not generate the benchmark media. {output.stderr.strip()}")
+
+
+def generate_media(durations: List[float], media_dir=BENCHMARK_MEDIA_DIR) -> Dict[str, Any]:
+    """
+    Generates the background video, green screen animation, music, images and one voiceover per video duration
+    used by the benchmark. The files are kept in `media_dir` and only generated once.
+    """
+    os.makedirs(media_dir, exist_ok=True)
+    duration = max(durations)
+    media = {
+        'background': os.path.abspath(os.path.join(media_dir, f"background_{duration}.mp4")),
+        'green_screen': os.path.abspath(os.path.join(media_dir, "green_screen.mp4")),
+        # The voiceover sets the duration of the video, like in the content engines
+        'voices': {d: os.path.abspath(os.path.join(media_dir, f"voice_{d}.wav")) for d in durations},
+        'music': os.path.abspath(os.path.join(media_dir, "music.mp3")),
+        'images': [os.path.abspath(os.path.join(media_dir, f"image_{width}x{height}.png")) for width, height in IMAGE_SIZES],
+    }
+    if not os.path.exists(media['background']):
+        run_ffmpeg(["-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={duration}",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", media['background']])
+    if not os.path.exists(media['green_screen']):
+        run_ffmpeg(["-f", "lavfi", "-i", f"color=c={GREEN_SCREEN_COLOR}:size=1280x720:rate=30:duration=4",
+                    "-f", "lavfi", "-i", "testsrc=size=320x320:rate=30:duration=4",
+                    "-filter_complex", "[0][1]overlay=x='(W-w)*t/4':y=(H-h)/2:shortest=1",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", media['green_screen']])
+    for voice_duration, voice_path in media['voices'].items():
+        if not os.path.exists(voice_path):
+            run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=44100:duration={voice_duration}", voice_path])
+    if not os.path.exists(media['music']):
+        run_ffmpeg(["-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100:duration=20", "-ac", "2", media['music']])
+    for (width, height), image_path in zip(IMAGE_SIZES, media['images']):
+        if os.path.exists(image_path):
+            continue
+        x, y = np.meshgrid(np.linspace(0, 255, width), np.linspace(0, 255, height))
+        pixels = np.dstack([x, y, 255 - x, np.full(x.shape, 255)]).astype('uint8')
+        Image.fromarray(pixels, 'RGBA').save(image_path)
+    return media
+
+
+def build_benchmark_engine(media: Dict[str, Any], config: Dict[str, Any]) -> EditingEngine:
+    """Builds the editing schema of a benchmark configuration from the editing steps used by the content engines"""
+    duration = config['duration']
+    engine = EditingEngine()
+    engine.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {'url': media['voices'][duration]})
+    if config['music']:
+        engine.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': media['music'], 'loop_background_music': duration, 'volume_percentage': 0.11})
+    engine.addEditingStep(EditingStep.CROP_1920x1080, {'url': media['background']})
+    if config['subscribe_animation']:
+        engine.addEditingStep(EditingStep.ADD_SUBSCRIBE_ANIMATION, {'url': media['green_screen']})
+    for i in range(config['n_images']):
+        start = i * duration / config['n_images']
+        engine.addEditingStep(EditingStep.SHOW_IMAGE, {'url': media['images'][i % len(media['images'])],
+                                                       'set_time_start': start, 'set_time_end': start + duration / config['n_images']})
+    for i in range(config['n_captions']):
+        start = i * duration / config['n_captions']
+        engine.addEditingStep(EditingStep.ADD_CAPTION_SHORT, {'text': f"benchmark caption {i}",
+                                                              'set_time_start': start, 'set_time_end': start + duration / config['n_captions']})
+    return engine
+
+
+def count_subprocess(counter):
+    with counter.get_lock():
+        counter.value += 1
+
+
+def run_render(config: Dict[str, Any], backend: RenderingBackend, media: Dict[str, Any], work_dir: str,
+               render_options: Dict[str, Any], counter, results):
+    """Benchmark process: renders one configuration in `work_dir`, where the editing caches live, and reports its measures"""
+    engine = build_benchmark_engine(media, config)
+    os.chdir(work_dir)
+    # Every ffmpeg, ffprobe and worker process started by the render, or by the processes it started, is counted
+    execute_child = subprocess.Popen._execute_child
+
+    def counted_execute_child(popen, *args, **kwargs):
+        count_subprocess(counter)
+        return execute_child(popen, *args, **kwargs)
+    subprocess.Popen._execute_child = counted_execute_child
+    os.register_at_fork(after_in_child=lambda: count_subprocess(counter))
+    output_file = os.path.join(work_dir, "benchmark.mp4")
+    start = time.perf_counter()
+    engine.renderVideo(output_file, backend=backend, **render_options)
+    wall_time = time.perf_counter() - start
+    n_subprocesses = counter.value
+    infos = probe_media(output_file)
+    n_frames = round(infos['duration'] * infos['fps'])
+    results.put({'rendered_with': engine.last_render_backend.value, 'wall_time': wall_time, 'n_frames': n_frames, 'render_fps': n_frames / wall_time, 'subprocesses': n_subprocesses,
+                 'peak_rss_mb': get_peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                 'peak_subprocess_rss_mb': get_peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None})
+
+
+def get_peak_rss_mb(who) -> float:
+    max_rss = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def run_benchmark(config_name: str, backend: RenderingBackend, media: Dict[str, Any], work_dir: str, **render_options) -> Dict[str, Any]:
+    """Renders a benchmark configuration in a fresh process, so that the memory and process counts are its own"""
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else multiprocessing.get_context()
+    counter = context.Value('i', 0)
+    results = context.Queue()
+    process = context.Process(target=run_render, args=(BENCHMARK_CONFIGS[config_name], backend, media, work_dir,
+                                                       render_options, counter, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise Exception(f"The benchmark render of {config_name} with {backend.value} failed")
+    result = results.get()
+    return {'config': config_name, 'backend': backend.value, **BENCHMARK_CONFIGS[config_name], **render_options,
+            **result}
+
+
+def run_benchmarks(config_names: List[str], backends: List[RenderingBackend], repeat=1, media_dir=BENCHMARK_MEDIA_DIR,
+                   **render_options) -> List[Dict[str, Any]]:
+    """
+    Renders every configuration with every backend. Each configuration and backend pair renders in its own
+    working directory: the first run starts with empty editing caches (`cache: cold`), the next ones reuse them.
+    """
+    media = generate_media(sorted({BENCHMARK_CONFIGS[name]['duration'] for name in config_names}), media_dir)
+    results = []
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        for config_name in config_names:
+            for backend in backends:
+                work_dir = tempfile.mkdtemp(dir=benchmark_dir)
+                for run in range(repeat):
+                    result = run_benchmark(config_name, backend, media, work_dir, **render_options)
+                    result['cache'] = 'cold' if run == 0 else 'warm'
+                    results.append(result)
+                    print_result(result)
+    return results
+
+
+def print_result(result: Dict[str, Any]):
+    print(f"{result['config']:<14} {result['backend']:<8} {result['cache']:<5} {result['wall_time']:8.2f}s "
+          f"{result['render_fps']:7.2f} fps  peak RSS {result['peak_rss_mb'] or 0:7.1f} MB "
+          f"(subprocesses {result['peak_subprocess_rss_mb'] or 0:.1f} MB)  {result['subprocesses']} subprocesses"
+          + (f"  fell back to {result['rendered_with']}" if result.get('rendered_with', result['backend']) != result['backend'] else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the rendering of synthetic editing schemas")
+    parser.add_argument('--configs', nargs='+', default=['minimal', 'short'], choices=list(BENCHMARK_CONFIGS))
+    parser.add_argument('--backends', nargs='+', default=[RenderingBackend.MOVIEPY.value], choices=[backend.value for backend in RenderingBackend])
+    parser.add_argument('--repeat', type=int, default=1, help="Renders per configuration, the runs after the first one use warm caches")
+    parser.add_argument('--workers', type=int, default=None, help="n_workers of EditingEngine.renderVideo")
+    parser.add_argument('--draft', action='store_true', help="Renders draft previews")
+    parser.add_argument('--incremental', action='store_true', help="Renders incrementally, the warm runs reuse the stored segments")
+    parser.add_argument('--lookahead', action='store_true', help="Renders with one look-ahead worker per CPU, minus one")
+    parser.add_argument('--media-dir', default=BENCHMARK_MEDIA_DIR)
+    parser.add_argument('--output', help="JSON file the results are written to")
+    args = parser.parse_args()
+    results = run_benchmarks(args.configs, [RenderingBackend(backend) for backend in args.backends], repeat=args.repeat,
+                             media_dir=args.media_dir, n_workers=args.workers, draft=args.draft, incremental=args.incremental,
+                             lookahead_workers=get_lookahead_workers() if args.lookahead else None)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+from bisect import bisect_right
+from typing import Callable, List
+
+import numpy as np
+from moviepy.editor import CompositeVideoClip, ImageClip, VideoClip
+from moviepy.video.tools.drawing import blit
+
+from shortGPT.editing_framework.geometry import resolve_position
+
+# Pre-blending costs about as much as blitting a few frames
+FLATTEN_MIN_FRAMES = 5
+
+
+def flatten_clips(clips, size, t) -> ImageClip:
+    """
+    Pre-blends static clips, in compositing order, into one RGBA layer covering their bounding box.
+    Blitting the layer gives the same picture as blitting each of the clips, as VideoClip.blit_on does.
+    """
+    layers = []
+    for clip in clips:
+        ct = t - clip.start
+        img = clip.get_frame(ct)
+        mask = clip.mask.get_frame(ct) if clip.mask is not None else np.ones(img.shape[:2])
+        x, y = resolve_position(clip.pos(ct), size, (img.shape[1], img.shape[0]), relative=clip.relative_pos)
+        layers.append((img, mask, x, y))
+    x1 = max(min(x for _, _, x, _ in layers), 0)
+    y1 = max(min(y for _, _, _, y in layers), 0)
+    x2 = min(max(x + img.shape[1] for img, _, x, _ in layers), size[0])
+    y2 = min(max(y + img.shape[0] for img, _, _, y in layers), size[1])
+    if x1 >= x2 or y1 >= y2:
+        return None
+    # Blitting on black gives the color premultiplied by the alpha of the layers below
+    premultiplied = np.zeros((y2 - y1, x2 - x1, 3))
+    alpha = np.zeros((y2 - y1, x2 - x1))
+    for img, mask, x, y in layers:
+        premultiplied = blit(img, premultiplied, [x - x1, y - y1], mask=mask)
+        coverage = blit(mask, np.zeros(alpha.shape), [x - x1, y - y1], ismask=True)
+        alpha = coverage + (1 - coverage) * alpha
+    color = premultiplied / np.maximum(alpha, 1e-6)[:, :, np.newaxis]
+    layer = ImageClip(np.clip(color, 0, 255)).set_position((x1, y1))
+    return layer.set_mask(ImageClip(alpha, ismask=True))
+
+
+class LazyAssetClip(VideoClip):
+    """
+    Stand-in for the clip of an asset whose window on the timeline is known from its actions. The clip is built
+    by `build` the first time the asset is composited, and released by the IntervalCompositeVideoClip once the
+    asset isn't visible anymore, so that only the assets on screen hold decoded pictures and ffmpeg readers.
+    `build` returns the clip (or None when the asset can't be loaded) and a function releasing its resources.
+    """
+
+    def __init__(self, build: Callable, start: float, end: float, fps: float = None):
+        super().__init__()
+        self.build = build
+        self.built = False
+        self.clip = None
+        self.clip_mask = None
+        self.release_resources = None
+        self.start = start
+        self.end = end
+        self.duration = end - start
+        self.fps = fps
+        self.make_frame = lambda t: self.materialize().get_frame(t)
+        self.mask = LazyMaskClip(self)
+
+    def materialize(self):
+        if not self.built:
+            self.clip, self.release_resources = self.build()
+            self.built = True
+            if self.clip is not None:
+                # Positioned like the masks of a CompositeVideoClip
+                mask = self.clip.mask if self.clip.mask is not None else self.clip.add_mask().mask
+                self.clip_mask = mask.set_position(self.clip.pos).set_start(self.clip.start, change_end=False)
+        return self.clip
+
+    def release(self):
+        if not self.built:
+            return
+        if self.release_resources:
+            self.release_resources()
+        self.clip = self.clip_mask = self.release_resources = None
+        self.built = False
+
+    def blit_on(self, picture, t):
+        clip = self.materialize()
+        return clip.blit_on(picture, t) if clip is not None else picture
+
+
+class LazyMaskClip(VideoClip):
+    """Mask of a LazyAssetClip, blitting the mask of the clip once it is built"""
+
+    def __init__(self, owner: LazyAssetClip):
+        super().__init__(ismask=True)
+        self.owner = owner
+        self.make_frame = lambda t: self.owner.materialize().mask.get_frame(t)
+
+    def release(self):
+        self.owner.release()
+
+    def blit_on(self, picture, t):
+        if self.owner.materialize() is None:
+            return picture
+        return self.owner.clip_mask.blit_on(picture, t)
+
+
+def materialize_clip(clip):
+    return clip.materialize() if isinstance(clip, LazyAssetClip) else clip
+
+
+class IntervalCompositeVideoClip(CompositeVideoClip):
+    """
+    CompositeVideoClip that only looks at the clips playing at time t.
+    The timeline is cut at every clip start and end, and each of these elementary intervals stores
+    the clips visible in it, so the cost of a frame depends on the visible layers and not on the
+    total number of layers of the schema.
+    Consecutive static clips (flagged in `static_clips`) visible in the same interval are pre-blended
+    into a single layer the first time the interval is rendered, when the interval lasts long enough
+    for the pre-blending to pay off.
+    When the timeline moves to another interval, the LazyAssetClips and pre-blended layers that aren't visible
+    in it are released.
+    """
+
+    def __init__(self, clips, size=None, bg_color=None, use_bgclip=False, ismask=False, static_clips: List[bool] = None):
+        super().__init__(clips, size=size, bg_color=bg_color, use_bgclip=use_bgclip, ismask=ismask)
+        if isinstance(self.mask, CompositeVideoClip):
+            self.mask = IntervalCompositeVideoClip(self.mask.clips, self.size, ismask=True, bg_color=0.0)
+        self.static_clips = {id(clip) for clip, static in zip(clips, static_clips or []) if static}
+        self.flattened_layers = {}
+        self.lazy_clips = [clip for clip in self.clips if isinstance(clip, (LazyAssetClip, LazyMaskClip))]
+        self.current_interval = None
+        self.build_interval_index()
+
+    def build_interval_index(self):
+        starts = {}
+        ends = {}
+        for i, clip in enumerate(self.clips):
+            starts.setdefault(clip.start, []).append(i)
+            if clip.end is not None:
+                ends.setdefault(clip.end, []).append(i)
+        self.breakpoints = sorted(set(starts) | set(ends))
+        self.active_clips = []
+        active = set()
+        for breakpoint in self.breakpoints:
+            active.difference_update(ends.get(breakpoint, []))
+            active.update(i for i in starts.get(breakpoint, []) if self.clips[i].end is None or self.clips[i].end > breakpoint)
+            # Clips keep their compositing order inside each interval
+            self.active_clips.append([self.clips[i] for i in sorted(active)])
+        self.interval_layers = [None] * len(self.breakpoints)
+
+    def playing_clips(self, t=0) -> List:
+        interval = bisect_right(self.breakpoints, t) - 1
+        if interval != self.current_interval:
+            self.enter_interval(interval)
+        if interval < 0:
+            return []
+        if not self.static_clips:
+            return self.active_clips[interval]
+        if self.interval_layers[interval] is None:
+            interval_end = self.breakpoints[interval + 1] if interval + 1 < len(self.breakpoints) else self.duration
+            n_frames = (interval_end - self.breakpoints[interval]) * self.fps if interval_end is not None and self.fps else np.inf
+            if n_frames < FLATTEN_MIN_FRAMES:
+                self.interval_layers[interval] = self.active_clips[interval]
+            else:
+                self.interval_layers[interval] = self.flatten_static_runs(self.active_clips[interval], self.breakpoints[interval])
+        return self.interval_layers[interval]
+
+    def enter_interval(self, interval):
+        visible = {id(clip) for clip in self.active_clips[interval]} if interval >= 0 else set()
+        for clip in self.lazy_clips:
+            if id(clip) not in visible:
+                clip.release()
+        if self.current_interval is not None and self.current_interval >= 0:
+            self.interval_layers[self.current_interval] = None
+        self.flattened_layers = {key: layer for key, layer in self.flattened_layers.items() if visible.issuperset(key)}
+        self.current_interval = interval
+
+    def flatten_static_runs(self, clips, t) -> List:
+        layers, run = [], []
+        for clip in clips + [None]:
+            if clip is not None and id(clip) in self.static_clips:
+                run.append(clip)
+                continue
+            if len(run) > 1:
+                key = tuple(id(static_clip) for static_clip in run)
+                if key not in self.flattened_layers:
+                    loaded_run = [static_clip for static_clip in map(materialize_clip, run) if static_clip is not None]
+                    self.flattened_layers[key] = flatten_clips(loaded_run, self.size, t) if loaded_run else None
+                if self.flattened_layers[key] is not None:
+                    layers.append(self.flattened_layers[key])
+            else:
+                layers.extend(run)
+            run = []
+            if clip is not None:
+                layers.append(clip)
+        return layers
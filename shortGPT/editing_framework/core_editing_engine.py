@@ -3,22 +3,120 @@ import os
 magick_path = get_program_path("magick")
 if magick_path:
     os.environ['IMAGEMAGICK_BINARY'] = magick_path
+IMAGEMAGICK_AVAILABLE = bool(magick_path or get_program_path("convert"))
 from shortGPT.config.path_utils import handle_path
 import numpy as np
+import functools
 import json
+import multiprocessing
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Any, Dict, List, Union
 from moviepy.editor import (AudioFileClip, CompositeVideoClip,CompositeAudioClip, ImageClip,
                             TextClip, VideoFileClip, vfx,)
 from moviepy.audio.fx.audio_loop import audio_loop
 from moviepy.audio.fx.audio_normalize import audio_normalize
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from shortGPT.editing_framework.audio_premix import premix_audio
+from shortGPT.editing_framework.asset_preprocessing import KeyedVideoCache, split_keyed_actions
+from shortGPT.editing_framework.compositing import IntervalCompositeVideoClip, LazyAssetClip
+from shortGPT.editing_framework.ffmpeg_editing_engine import FFmpegEditingEngine, probe_media
+from shortGPT.editing_framework.geometry import auto_resized_size
+from shortGPT.editing_framework.image_compositor import ImageCompositor
+from shortGPT.editing_framework.media_readers import MediaReaderPool, get_read_shift, split_decoder_actions
+from shortGPT.editing_framework.multi_output import MultiOutputVideoWriter
+from shortGPT.editing_framework.render_checkpoints import RenderCheckpoint, RenderSegmentStore
+from shortGPT.editing_framework.render_pipeline import start_workers, write_video_pipelined
+from shortGPT.editing_framework.render_profiling import RenderProfiler
 from shortGPT.editing_framework.rendering_logger import MoviepyProgressLogger
+from shortGPT.editing_framework.schema_utils import get_clip_timing, is_static_asset, slice_schema
+from shortGPT.editing_framework.text_cache import TextRasterCache
+from shortGPT.editing_framework.text_rendering import find_font_file, get_text_clip_params, render_text
+from shortGPT.editing_utils.handle_videos import concat_videos
 
 def load_schema(json_path):
     return json.loads(open(json_path, 'r', encoding='utf-8').read())
 
+def get_worker_context():
+    # Forked workers don't re-import the __main__ module (runShortGPT.py launches the UI at import time)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+def get_lookahead_workers():
+    # The number of look-ahead workers to opt in with. Workers rebuild their clips from the schema, which is only
+    # cheap (and safe for runShortGPT.py) when forking. One core is left to the encoders, so single core machines
+    # render without look-ahead
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return 0
+    return (os.cpu_count() or 1) - 1
+
+def get_segment_workers():
+    # Each segment worker composites and encodes its own frames, so there is one per CPU. Without fork
+    # the workers would re-import runShortGPT.py, the segments are then rendered by a single worker
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return 1
+    return os.cpu_count() or 1
+
+def get_frame_count(duration, fps) -> int:
+    # The frames moviepy's write_videofile renders, at t = 0, 1/fps, ... up to the duration excluded.
+    # Every render path writes the same number of frames for a schema
+    return len(np.arange(0, duration, 1.0 / fps))
+
+def closes_readers(generate):
+    """Closes the media readers opened by a render of the CoreEditingEngine once it is finished"""
+    @functools.wraps(generate)
+    def generate_and_close(self, *args, **kwargs):
+        try:
+            return generate(self, *args, **kwargs)
+        finally:
+            self.readers.close()
+    return generate_and_close
+
+def build_worker_clip(schema:Dict[str, Any]):
+    return CoreEditingEngine().build_video_clip(schema, with_audio=False)
+
+def render_video_segment(schema:Dict[str, Any], segment_file, first_frame, last_frame, fps, preset='medium'):
+    """Worker entry point of CoreEditingEngine.generate_video_segmented, renders frames [first_frame, last_frame[ without audio"""
+    engine = CoreEditingEngine()
+    video = engine.build_video_clip(schema, with_audio=False)
+    # Rendered under another name, so that a killed worker never leaves a truncated segment behind
+    root, extension = os.path.splitext(segment_file)
+    partial_file = f"{root}.partial{extension}"
+    try:
+        with FFMPEG_VideoWriter(partial_file, video.size, fps, codec='libx264', preset=preset) as writer:
+            for frame_index in range(first_frame, last_frame):
+                frame = video.get_frame(frame_index / fps)
+                if frame.dtype != 'uint8':
+                    frame = frame.astype('uint8')
+                writer.write_frame(frame)
+    finally:
+        engine.readers.close()
+    os.replace(partial_file, segment_file)
+    return segment_file
+
+def uses_imagemagick(text_clip_params: Dict[str, Any]) -> bool:
+    """Whether a text is rendered by ImageMagick: when it is installed and Pillow can't find the requested font"""
+    return IMAGEMAGICK_AVAILABLE and not find_font_file(text_clip_params.get('font', 'Courier'))
+
 class CoreEditingEngine:
 
+    def __init__(self, text_cache: TextRasterCache = None, keyed_videos: KeyedVideoCache = None, readers: MediaReaderPool = None):
+        self.text_cache = text_cache if text_cache is not None else TextRasterCache()
+        self.keyed_videos = keyed_videos if keyed_videos is not None else KeyedVideoCache()
+        self.readers = readers if readers is not None else MediaReaderPool()
+        # Set by generate_video_profiled while it builds and renders the clips
+        self.profiler = None
+
+    @closes_readers
     def generate_image(self, schema:Dict[str, Any],output_file , logger=None):
+        # Image-only schemas are blended with Pillow and numpy, without building moviepy clips. Texts in
+        # fonts only ImageMagick has are left to make_text_clip, so both renderers draw them with the same font
+        text_assets = [asset for asset in schema['visual_assets'].values() if asset['type'] == 'text']
+        if ImageCompositor.supports(schema) and not any(uses_imagemagick(get_text_clip_params(asset['parameters'])) for asset in text_assets):
+            return ImageCompositor(self.text_cache).generate_image(schema, output_file)
         assets = dict(sorted(schema['visual_assets'].items(), key=lambda item: item[1]['z']))
         clips = []
 
@@ -32,7 +130,6 @@ class CoreEditingEngine:
                     continue
             elif asset_type == 'text':
                 clip = self.process_text_asset(asset)
-                clips.append(clip)
             else:
                 raise ValueError(f'Invalid asset type: {asset_type}')
             clips.append(clip)
@@ -41,27 +138,301 @@ class CoreEditingEngine:
         image.save_frame(output_file)
         return output_file
 
-    def generate_video(self, schema:Dict[str, Any], output_file, logger=None) -> None:
+    @closes_readers
+    def generate_video(self, schema:Dict[str, Any], output_file, logger=None, n_workers=None, fps=None, preset='medium', lookahead_workers=None, resumable=False, incremental=False, profile=False, outputs: List[Dict[str, Any]] = None) -> None:
+        if profile:
+            return self.generate_video_profiled(schema, output_file, logger=logger, fps=fps, preset=preset)
+        if outputs:
+            return self.generate_video_multi_output(schema, output_file, outputs, logger=logger, fps=fps, preset=preset, lookahead_workers=lookahead_workers)
+        if incremental:
+            return self.generate_video_incremental(schema, output_file, n_workers=n_workers, logger=logger, fps=fps, preset=preset)
+        if resumable:
+            return self.generate_video_resumable(schema, output_file, n_workers=n_workers, logger=logger, fps=fps, preset=preset)
+        if n_workers and n_workers > 1:
+            return self.generate_video_segmented(schema, output_file, n_segments=n_workers, n_workers=n_workers, logger=logger, fps=fps, preset=preset)
+        if lookahead_workers:
+            return self.generate_video_pipelined(schema, output_file, lookahead_workers, logger=logger, fps=fps, preset=preset)
+        video, audio_file = self.build_video_and_soundtrack(schema)
+        audio = audio_file if audio_file else True
+        if logger:
+            my_logger = MoviepyProgressLogger(callBackFunction=logger)
+            video.write_videofile(output_file, fps=fps, codec='libx264', audio=audio, audio_codec='aac', preset=preset, logger=my_logger)
+        else:
+            video.write_videofile(output_file, fps=fps, codec='libx264', audio=audio, audio_codec='aac', preset=preset)
+        return output_file
+
+    @closes_readers
+    def generate_video_pipelined(self, schema:Dict[str, Any], output_file, n_workers, logger=None, fps=None, preset='medium') -> None:
+        """
+        Renders the video with `n_workers` processes, each compositing and encoding one contiguous range of frames,
+        which are joined without re-encoding them. The soundtrack is mixed while the workers start compositing.
+        """
+        video, audio_file = self.build_video_and_soundtrack(schema)
+        fps = fps or video.fps
+        n_frames = get_frame_count(video.duration, fps)
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+        my_logger = MoviepyProgressLogger(callBackFunction=logger) if logger else None
+
+        def write_audio():
+            return self.write_soundtrack(video, audio_file, work_dir)
+        try:
+            visual_schema = {'visual_assets': schema['visual_assets'], 'audio_assets': {}}
+            write_video_pipelined(build_worker_clip, (visual_schema,), output_file, video.size, n_frames, fps, n_workers,
+                                  get_worker_context(), preset=preset, logger=my_logger, on_workers_started=write_audio)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_file
+
+    @closes_readers
+    def generate_video_multi_output(self, schema:Dict[str, Any], output_file, outputs: List[Dict[str, Any]], logger=None, fps=None, preset='medium', lookahead_workers=None) -> None:
+        """
+        Renders output_file and the renditions described by the `outputs` specs (crop, resize, bitrate, preset) from
+        the same frames: each frame is composited once and encoded by one encoder per output, in a single ffmpeg process.
+        """
+        video, audio_file = self.build_video_and_soundtrack(schema)
+        fps = fps or video.fps
+        n_frames = get_frame_count(video.duration, fps)
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+        my_logger = MoviepyProgressLogger(callBackFunction=logger) if logger else None
+
+        def write_audio():
+            return self.write_soundtrack(video, audio_file, work_dir)
+        try:
+            if lookahead_workers:
+                visual_schema = {'visual_assets': schema['visual_assets'], 'audio_assets': {}}
+                write_video_pipelined(build_worker_clip, (visual_schema,), output_file, video.size, n_frames, fps, lookahead_workers,
+                                      get_worker_context(), preset=preset, logger=my_logger, on_workers_started=write_audio, outputs=outputs)
+                return output_file
+            if my_logger:
+                my_logger(t__total=n_frames)
+            with MultiOutputVideoWriter(video.size, fps, [{'output_file': output_file}] + outputs, preset=preset, audio_file=write_audio()) as writer:
+                for frame_index in range(n_frames):
+                    frame = video.get_frame(frame_index / fps)
+                    if frame.dtype != 'uint8':
+                        frame = frame.astype('uint8')
+                    writer.write_frame(frame)
+                    if my_logger:
+                        my_logger(t__index=frame_index + 1)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_file
+
+    @closes_readers
+    def generate_video_segmented(self, schema:Dict[str, Any], output_file, n_segments, n_workers=None, logger=None, fps=None, preset='medium') -> None:
+        """
+        Splits the timeline in `n_segments` slices of frames, renders each slice in its own worker process
+        and joins the slices with ffmpeg's concat demuxer, without re-encoding them.
+        """
+        video, audio_file = self.build_video_and_soundtrack(schema)
+        fps = fps or video.fps
+        n_frames = get_frame_count(video.duration, fps)
+        boundaries = [round(i * n_frames / n_segments) for i in range(n_segments + 1)]
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+        my_logger = MoviepyProgressLogger(callBackFunction=logger) if logger else None
+        try:
+            segment_files = [os.path.join(work_dir, f"segment_{i:04d}.mp4") for i in range(n_segments)]
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_worker_context()) as pool:
+                start_workers(pool)
+                futures = []
+                for i, segment_file in enumerate(segment_files):
+                    first_frame, last_frame = boundaries[i], boundaries[i + 1]
+                    segment_schema = slice_schema(schema, first_frame / fps, last_frame / fps)
+                    futures.append(pool.submit(render_video_segment, segment_schema, segment_file, first_frame, last_frame, fps, preset))
+                # Without a premixed track, the soundtrack is mixed once, while the workers render the frames
+                audio_codec = 'copy' if audio_file else 'aac'
+                if not audio_file and video.audio is not None:
+                    audio_file = os.path.join(work_dir, "audio.wav")
+                    video.audio.write_audiofile(audio_file, fps=44100, logger=None)
+                if my_logger:
+                    my_logger(t__total=n_segments)
+                for done, future in enumerate(as_completed(futures)):
+                    future.result()
+                    if my_logger:
+                        my_logger(t__index=done + 1)
+            concat_videos(segment_files, output_file, audio_file=audio_file, audio_codec=audio_codec)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_file
+
+    @closes_readers
+    def generate_video_resumable(self, schema:Dict[str, Any], output_file, n_workers=None, logger=None, fps=None, preset='medium') -> None:
+        """
+        Renders the video in segments recorded in a RenderCheckpoint manifest. When a previous render of the same
+        schema was interrupted, only the segments it didn't finish are rendered again. The segments are joined
+        with ffmpeg's concat demuxer, without re-encoding them, and the checkpoint is removed once the video is written.
+        """
+        n_workers = n_workers or get_segment_workers()
+        video, audio_file = self.build_video_and_soundtrack(schema)
+        fps = fps or video.fps
+        n_frames = get_frame_count(video.duration, fps)
+        checkpoint = RenderCheckpoint(schema, fps, n_frames, preset)
+        segments = checkpoint.manifest['segments']
+        pending_segments = checkpoint.get_pending_segments()
+        my_logger = MoviepyProgressLogger(callBackFunction=logger) if logger else None
+        if my_logger:
+            my_logger(t__total=len(segments))
+        errors = []
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_worker_context()) as pool:
+            # Nothing is forked when every segment is already done
+            if pending_segments:
+                start_workers(pool)
+            futures = {}
+            for segment in pending_segments:
+                first_frame, last_frame = segment['first_frame'], segment['last_frame']
+                segment_schema = slice_schema(schema, first_frame / fps, last_frame / fps)
+                future = pool.submit(render_video_segment, segment_schema, checkpoint.get_segment_path(segment), first_frame, last_frame, fps, preset)
+                futures[future] = segment
+            audio_codec = 'copy' if audio_file else 'aac'
+            if not audio_file and video.audio is not None:
+                audio_file = os.path.join(checkpoint.directory, "audio.wav")
+                video.audio.write_audiofile(audio_file, fps=44100, logger=None)
+            for done, future in enumerate(as_completed(futures)):
+                # Every finished segment is recorded, even when another one failed
+                try:
+                    future.result()
+                    checkpoint.mark_done(futures[future])
+                except Exception as e:
+                    errors.append(e)
+                if my_logger:
+                    my_logger(t__index=len(segments) - len(pending_segments) + done + 1)
+        if errors:
+            raise errors[0]
+        concat_videos(checkpoint.get_segment_files(), output_file, audio_file=audio_file, audio_codec=audio_codec)
+        checkpoint.remove()
+        return output_file
+
+    @closes_readers
+    def generate_video_incremental(self, schema:Dict[str, Any], output_file, n_workers=None, logger=None, fps=None, preset='medium') -> None:
+        """
+        Renders the video in segments kept in a RenderSegmentStore under the hash of their content. Segments whose
+        layers didn't change since a previous render are reused, so that fixing a caption only re-renders the segments
+        the caption is visible in, which are spliced with the others without re-encoding them. An interrupted render
+        also resumes from its finished segments.
+        """
+        n_workers = n_workers or get_segment_workers()
+        video, audio_file = self.build_video_and_soundtrack(schema)
+        fps = fps or video.fps
+        n_frames = get_frame_count(video.duration, fps)
+        store = RenderSegmentStore()
+        segments = store.get_segments(schema, fps, n_frames, preset)
+        pending_segments = [segment for segment in segments if not store.is_rendered(segment)]
+        my_logger = MoviepyProgressLogger(callBackFunction=logger) if logger else None
+        if my_logger:
+            my_logger(t__total=len(segments))
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+        errors = []
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_worker_context()) as pool:
+                if pending_segments:
+                    start_workers(pool)
+                futures = [pool.submit(render_video_segment, segment['schema'], store.get_path(segment), segment['first_frame'], segment['last_frame'], fps, preset)
+                           for segment in pending_segments]
+                audio_codec = 'copy' if audio_file else 'aac'
+                if not audio_file and video.audio is not None:
+                    audio_file = os.path.join(work_dir, "audio.wav")
+                    video.audio.write_audiofile(audio_file, fps=44100, logger=None)
+                for done, future in enumerate(as_completed(futures)):
+                    # Every finished segment stays in the store, even when another one failed
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+                    if my_logger:
+                        my_logger(t__index=len(segments) - len(pending_segments) + done + 1)
+            if errors:
+                raise errors[0]
+            segment_files = [store.get_path(segment) for segment in segments]
+            concat_videos(segment_files, output_file, audio_file=audio_file, audio_codec=audio_codec)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        store.evict(keep=segment_files)
+        return output_file
+
+    @closes_readers
+    def generate_video_profiled(self, schema:Dict[str, Any], output_file, logger=None, fps=None, preset='medium') -> None:
+        """
+        Renders the video in this process with a RenderProfiler wrapped around the frame functions of every layer,
+        timing the compositing of each frame and the encoder separately, and writes the report next to the video.
+        """
+        self.profiler = RenderProfiler()
+        start = time.perf_counter()
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+        try:
+            with self.profiler.measure('setup'):
+                video, audio_file = self.build_video_and_soundtrack(schema)
+                if not audio_file and video.audio is not None:
+                    audio_file = os.path.join(work_dir, "audio.m4a")
+                    video.audio.write_audiofile(audio_file, fps=44100, codec='aac', logger=None)
+            fps = fps or video.fps
+            n_frames = get_frame_count(video.duration, fps)
+            my_logger = MoviepyProgressLogger(callBackFunction=logger) if logger else None
+            if my_logger:
+                my_logger(t__total=n_frames)
+            with FFMPEG_VideoWriter(output_file, video.size, fps, codec='libx264', preset=preset, audiofile=audio_file) as writer:
+                for frame_index in range(n_frames):
+                    with self.profiler.measure('compositing'):
+                        frame = video.get_frame(frame_index / fps)
+                        if frame.dtype != 'uint8':
+                            frame = frame.astype('uint8')
+                    # Writing blocks while the encoder is busy, so this is the time the encoder holds the render back
+                    with self.profiler.measure('encoder'):
+                        writer.write_frame(frame)
+                    self.profiler.n_frames += 1
+                    if my_logger:
+                        my_logger(t__index=frame_index + 1)
+            report_file = self.profiler.write_report(output_file, time.perf_counter() - start, fps=fps, preset=preset, size=list(video.size))
+            print(f"Render profile written to {report_file}")
+        finally:
+            self.profiler = None
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return output_file
+
+    def build_video_and_soundtrack(self, schema:Dict[str, Any]):
+        """
+        Builds the clip of the visual assets and premixes the audio assets into one track with ffmpeg.
+        Returns the clip and the premixed audio file, or the clip with moviepy's audio and None when
+        the audio assets can't be premixed.
+        """
+        try:
+            premix = premix_audio(schema)
+        except NotImplementedError as e:
+            print(f"The audio can't be premixed with ffmpeg ({e}), mixing it with moviepy")
+            return self.build_video_clip(schema), None
+        video = self.build_video_clip(schema, with_audio=False)
+        if premix is None:
+            return video, None
+        audio_file, duration = premix
+        video.duration = duration
+        video.audio = None
+        return video, audio_file
+
+    def write_soundtrack(self, video: CompositeVideoClip, audio_file, work_dir):
+        """Returns the premixed soundtrack, or mixes the audio of the clip into an AAC file of work_dir when there is none"""
+        if audio_file or video.audio is None:
+            return audio_file
+        mixed_audio_file = os.path.join(work_dir, "audio.m4a")
+        video.audio.write_audiofile(mixed_audio_file, fps=44100, codec='aac', logger=None)
+        return mixed_audio_file
+
+    def build_video_clip(self, schema:Dict[str, Any], with_audio=True) -> CompositeVideoClip:
         visual_assets = dict(sorted(schema['visual_assets'].items(), key=lambda item: item[1]['z']))
-        audio_assets = dict(sorted(schema['audio_assets'].items(), key=lambda item: item[1]['z']))
+        audio_assets = dict(sorted(schema['audio_assets'].items(), key=lambda item: item[1]['z'])) if with_audio else {}
         
         visual_clips = []
+        static_clips = []
         for asset_key in visual_assets:
             asset = visual_assets[asset_key]
-            asset_type = asset['type']
-            if asset_type == 'video':
-                clip = self.process_video_asset(asset)
-            elif asset_type == 'image':
-                try:
-                    clip = self.process_image_asset(asset)
-                except Exception as e:
-                    continue
-            elif asset_type == 'text':
-                clip = self.process_text_asset(asset)
+            # The lowest asset gives its size to the video, it is always built up front
+            window = self.get_lazy_window(asset) if visual_clips else None
+            if window:
+                clip = LazyAssetClip(functools.partial(self.materialize_asset, asset_key, asset), **window)
             else:
-                raise ValueError(f'Invalid asset type: {asset_type}')
+                clip = self.build_visual_asset(asset_key, asset)
+                if clip is None:
+                    continue
 
             visual_clips.append(clip)
+            static_clips.append(is_static_asset(asset))
         
         audio_clips = []
 
@@ -74,19 +445,72 @@ class CoreEditingEngine:
                 raise ValueError(f"Invalid asset type: {asset_type}")
 
             audio_clips.append(audio_clip)
-        video = CompositeVideoClip(visual_clips)
+        # Overlapping watermarks, templates and images are pre-blended into one layer
+        video = IntervalCompositeVideoClip(visual_clips, static_clips=static_clips)
         if(audio_clips):
             audio = CompositeAudioClip(audio_clips)
             video.duration = audio.duration
             video.audio = audio
-        if logger:
-            my_logger = MoviepyProgressLogger(callBackFunction=logger)
-            video.write_videofile(output_file, codec='libx264', audio_codec='aac', logger=my_logger)
-        else:
-            video.write_videofile(output_file, codec='libx264', audio_codec='aac')
-        return output_file
+        return video
     
+    def build_visual_asset(self, asset_key: str, asset: Dict[str, Any]) -> Union[VideoFileClip, ImageClip, TextClip, None]:
+        """Builds the clip of a visual asset, or returns None for an image that can't be loaded"""
+        asset_type = asset['type']
+        if self.profiler:
+            self.profiler.set_asset(asset_key, asset_type)
+        try:
+            if asset_type == 'video':
+                return self.process_video_asset(asset)
+            elif asset_type == 'image':
+                try:
+                    return self.process_image_asset(asset)
+                except Exception as e:
+                    return None
+            elif asset_type == 'text':
+                return self.process_text_asset(asset)
+            else:
+                raise ValueError(f'Invalid asset type: {asset_type}')
+        finally:
+            if self.profiler:
+                self.profiler.current_asset = None
+
+    def get_lazy_window(self, asset: Dict[str, Any]) -> Union[Dict[str, Any], None]:
+        """
+        Returns the start, end and frame rate of an asset that can be built only while it is on screen,
+        or None when the asset has to be built up front: its end isn't set by its actions, or it is a video
+        whose soundtrack moviepy mixes when the clip is built.
+        """
+        if asset['type'] not in ('video', 'image', 'text'):
+            return None
+        if asset['type'] == 'video' and asset['parameters'].get('audio', True):
+            return None
+        timing = get_clip_timing(asset['actions'])
+        if timing['end'] is None:
+            return None
+        # The frame rate of a video is part of the frame rate of the composition
+        fps = probe_media(handle_path(asset['parameters']['url']))['fps'] if asset['type'] == 'video' else None
+        return {'start': timing['start'], 'end': timing['end'], 'fps': fps}
+
+    def materialize_asset(self, asset_key: str, asset: Dict[str, Any]):
+        """Builds a LazyAssetClip's asset with its own readers. Returns the clip and the function closing the readers"""
+        readers = self.readers
+        asset_readers = readers.open_child()
+        self.readers = asset_readers
+        try:
+            clip = self.build_visual_asset(asset_key, asset)
+        except Exception:
+            readers.close_child(asset_readers)
+            raise
+        finally:
+            self.readers = readers
+        return clip, functools.partial(readers.close_child, asset_readers)
+
+    @closes_readers
     def generate_audio(self, schema:Dict[str, Any], output_file, logger=None) -> None:
+        try:
+            return FFmpegEditingEngine().generate_audio(schema, output_file)
+        except NotImplementedError as e:
+            print(f"The audio can't be mixed with ffmpeg ({e}), mixing it with moviepy")
         audio_assets = dict(sorted(schema['audio_assets'].items(), key=lambda item: item[1]['z']))
         audio_clips = []
 
@@ -135,10 +559,12 @@ class CoreEditingEngine:
  
             if action['type'] == 'resize':
                 clip = clip.resize(**action['param'])
+                clip = self.profile_stage(clip, 'resize')
                 continue
 
             if action['type'] == 'crop':
                 clip = clip.crop(**action['param'])
+                clip = self.profile_stage(clip, 'crop')
                 continue
 
             if action['type'] == 'screen_position':
@@ -151,24 +577,29 @@ class CoreEditingEngine:
                 thr = params['thr'] if params['thr'] else 100
                 s = params['s'] if params['s'] else 5
                 clip = clip.fx(vfx.mask_color, color=color,thr=thr, s=s)
+                clip = self.profile_stage(clip, 'green_screen')
                 continue
 
             if action['type'] == 'normalize_image':
                 clip = clip.fx(self.__normalize_image)
+                clip = self.profile_stage(clip, 'normalize_image')
                 continue
 
             if action['type'] == 'auto_resize_image':
-                ar = clip.aspect_ratio
-                height = action['param']['maxHeight']
-                width = action['param']['maxWidth']
-                if ar <1:
-                    clip = clip.resize((height*ar, height))
-                else:
-                    clip = clip.resize((width, width/ar))
+                newsize = auto_resized_size(clip.size, **action['param'])
+                # Ingested images are already fitted to the box
+                if tuple(newsize) != tuple(clip.size):
+                    clip = clip.resize(newsize)
+                    clip = self.profile_stage(clip, 'auto_resize_image')
                 continue
 
         return clip
 
+    def profile_stage(self, clip: Union[VideoFileClip, ImageClip, TextClip], stage: str) -> Union[VideoFileClip, ImageClip, TextClip]:
+        if self.profiler is None:
+            return clip
+        return self.profiler.wrap_clip(clip, stage)
+
     # Process audio actions
     def process_audio_actions(self, clip: AudioFileClip,
                                    actions: List[Dict[str, Any]]) -> AudioFileClip:
@@ -197,26 +628,40 @@ class CoreEditingEngine:
         }
         if 'audio' in asset['parameters']:
             params['audio'] = asset['parameters']['audio']
-        clip = VideoFileClip(**params)
-        return self.process_common_visual_actions(clip, asset['actions'])
+        # Layers of the same file read at different times get their own readers, see MediaReaderPool
+        read_shift = get_read_shift(asset['actions'])
+        keyed_actions = split_keyed_actions(asset['actions'])
+        if keyed_actions:
+            # Green screen videos are keyed and resized once, then read back with their alpha on every render
+            pixel_actions, other_actions = keyed_actions
+            clip = self.keyed_videos.get_or_build(params['filename'], pixel_actions,
+                lambda: self.process_common_visual_actions(self.profile_stage(self.readers.get_video(params['filename'], audio=False), 'decode'), pixel_actions))
+            clip = self.profile_stage(clip, 'keyed_read')
+            if params.get('audio', True):
+                clip = clip.set_audio(self.readers.get_audio(params['filename'], read_shift))
+            return self.process_common_visual_actions(clip, other_actions)
+        # Leading crops and resizes are applied by the ffmpeg reader, frames are decoded at their final size
+        decoder_actions, other_actions = split_decoder_actions(asset['actions'])
+        clip = self.profile_stage(self.readers.get_video(**params, decoder_actions=decoder_actions, read_shift=read_shift), 'decode')
+        return self.process_common_visual_actions(clip, other_actions)
 
     def process_image_asset(self, asset: Dict[str, Any]) -> ImageClip:
-        clip = ImageClip(asset['parameters']['url'])
+        clip = self.profile_stage(self.readers.get_image(asset['parameters']['url']), 'load')
         return self.process_common_visual_actions(clip, asset['actions'])
 
     def process_text_asset(self, asset: Dict[str, Any]) -> TextClip:
-        text_clip_params = asset['parameters']
-        
-        if not (any(key in text_clip_params for key in ['text','fontsize', 'size'])):
-            raise Exception('You must include at least a size or a fontsize to determine the size of your text')
-        text_clip_params['txt'] = text_clip_params['text']
-        clip_info = {k: text_clip_params[k] for k in ('txt', 'fontsize', 'font', 'color', 'stroke_width', 'stroke_color', 'size', 'kerning', 'method', 'align') if k in text_clip_params}
-        clip = TextClip(**clip_info)
-
+        clip = self.profile_stage(self.make_text_clip(asset['parameters']), 'text')
         return self.process_common_visual_actions(clip, asset['actions'])
 
+    def make_text_clip(self, text_clip_params: Dict[str, Any]) -> Union[ImageClip, TextClip]:
+        clip_info = get_text_clip_params(text_clip_params)
+        # Text is rasterized in-process with Pillow. ImageMagick is only used for fonts Pillow can't find, when it is installed
+        if uses_imagemagick(clip_info):
+            return TextClip(**clip_info)
+        return ImageClip(self.text_cache.get_or_render(clip_info, render_text))
+
     def process_audio_asset(self, asset: Dict[str, Any]) -> AudioFileClip:
-        clip = AudioFileClip(asset['parameters']['url'])
+        clip = self.readers.get_audio(asset['parameters']['url'], get_read_shift(asset['actions']))
         return self.process_audio_actions(clip, asset['actions'])
     
     def __normalize_image(self, clip):
@@ -238,13 +683,8 @@ class CoreEditingEngine:
         [dimensions, ] = np.shape(shape)
 
         if dimensions == 2:
-            (height, width) = shape
-            normalized_frame = np.zeros((height, width, 3))
-            for y in range(height):
-                for x in range(width):
-                    grey_value = frame[y][x]
-                    normalized_frame[y][x] = (grey_value, grey_value, grey_value)
-            return normalized_frame
+            # Grey values copied to the three channels
+            return np.repeat(np.asarray(frame, dtype=float)[:, :, np.newaxis], 3, axis=2)
         else:
             return frame
         
@@ -1,18 +1,13 @@
 import json
 from typing import Any, Dict, List, Union
 from enum import Enum
-import collections.abc
 
 from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
-
-def update_dict(d, u):
-    for k, v in u.items():
-        if isinstance(v, collections.abc.Mapping):
-            d[k] = update_dict(d.get(k, {}), v)
-        else:
-            d[k] = v
-    return d
-
+from shortGPT.editing_framework.editing_templates import EditingTemplateRegistry, update_dict
+from shortGPT.editing_framework.ffmpeg_editing_engine import FFmpegEditingEngine
+from shortGPT.editing_framework.media_cache import RemoteMediaCache
+from shortGPT.editing_framework.schema_optimizer import optimize_schema
+from shortGPT.editing_framework.schema_utils import scale_schema
 
 class EditingStep(Enum):
     CROP_1920x1080 = "crop_1920x1080_to_short.json"
@@ -34,73 +29,72 @@ class EditingStep(Enum):
 class Flow(Enum):
     WHITE_REDDIT_IMAGE_FLOW = "build_reddit_image.json"
 
+class RenderingBackend(Enum):
+    MOVIEPY = "moviepy"
+    FFMPEG = "ffmpeg"
+
 from pathlib import Path
 
 _here = Path(__file__).parent
 STEPS_PATH = (_here / 'editing_steps/').resolve()
 FLOWS_PATH = (_here / 'flows/').resolve()
+# Every step and flow file is parsed and validated once per process
+EDITING_TEMPLATES = EditingTemplateRegistry(STEPS_PATH, [step.value for step in EditingStep], FLOWS_PATH, [flow.value for flow in Flow])
+
+# Draft renders: a 1080x1920 short is previewed at 360x640, 12 fps
+DRAFT_SCALE = 1 / 3
+DRAFT_FPS = 12
+DRAFT_PRESET = 'ultrafast'
 
 class EditingEngine:
     def __init__(self,):
         self.editing_step_tracker = dict((step, 0) for step in EditingStep)
         self.schema = {'visual_assets': {}, 'audio_assets': {}}
+        # The backend that rendered the last video, which is moviepy when the ffmpeg backend fell back to it
+        self.last_render_backend = None
 
     def addEditingStep(self, editingStep: EditingStep, args: Dict[str, any] = {}):
-        json_step = json.loads(
-            open(STEPS_PATH / f"{editingStep.value}", 'r', encoding='utf-8').read())
-        step_name, editingStepDict = list(json_step.items())[0]
-        if 'inputs' in editingStepDict:
-            required_args = (editingStepDict['inputs']['actions'] if 'actions' in editingStepDict['inputs'] else []) + (editingStepDict['inputs']['parameters'] if 'parameters' in editingStepDict['inputs'] else [])
-            for required_argument in required_args:
-                if required_argument not in args:
-                    raise Exception(
-                        f"Error. '{required_argument}' input missing, you must include it to use this editing step")
-            if required_args:
-                pass
-            action_names = [action['type'] for action in editingStepDict['actions']
-                            ] if 'actions' in editingStepDict else []
-            param_names = [param_name for param_name in editingStepDict['parameters']
-                           ] if 'parameters' in editingStepDict else []
-            for arg_name in args:
-                if ('inputs' in editingStepDict):
-                    if 'parameters' in editingStepDict['inputs'] and arg_name in param_names:
-                        editingStepDict['parameters'][arg_name] = args[arg_name]
-                        pass
-                    if 'actions' in editingStepDict['inputs'] and arg_name in action_names:
-                        for i, action in enumerate(editingStepDict['actions']):
-                            if action['type'] == arg_name:
-                                editingStepDict['actions'][i]['param'] = args[arg_name]
+        step = EDITING_TEMPLATES.get_step(editingStep.value)
+        editingStepDict = step.instantiate(args)
         if editingStepDict['type'] == 'audio':
-            self.schema['audio_assets'][f"{step_name}_{self.editing_step_tracker[editingStep]}"] = editingStepDict
+            self.schema['audio_assets'][f"{step.name}_{self.editing_step_tracker[editingStep]}"] = editingStepDict
         else:
-            self.schema['visual_assets'][f"{step_name}_{self.editing_step_tracker[editingStep]}"] = editingStepDict
+            self.schema['visual_assets'][f"{step.name}_{self.editing_step_tracker[editingStep]}"] = editingStepDict
         self.editing_step_tracker[editingStep] += 1
 
 
     def ingestFlow(self, flow: Flow, args):
-        json_flow = json.loads(open(FLOWS_PATH / f"{flow.value}", 'r', encoding='utf-8').read())
-        for required_argument in list(json_flow['inputs'].keys()):
-                if required_argument not in args:
-                    raise Exception(
-                        f"Error. '{required_argument}' input missing, you must include it to use this editing step")
-                update = args[required_argument]
-                for path_key in reversed(json_flow['inputs'][required_argument].split("/")):
-                    update = {path_key: update}
-                json_flow = update_dict(json_flow, update)
-        self.schema = json_flow
+        self.schema = EDITING_TEMPLATES.get_flow(flow.value).instantiate(args)
 
     def dumpEditingSchema(self):
         return self.schema
     
-    def renderVideo(self, outputPath, logger=None):
+    def renderVideo(self, outputPath, logger=None, backend: RenderingBackend = RenderingBackend.MOVIEPY, n_workers=None, draft=False, resumable=False, incremental=False, profile=False, outputs=None, lookahead_workers=None):
+        # Remote media are downloaded once, concurrently, and every backend and worker reads the local files
+        schema, fps, preset = RemoteMediaCache().localize_schema(self.schema), None, 'medium'
+        schema = optimize_schema(schema)
+        if draft:
+            # Preview of the timing and placement of the layers, at a fraction of the resolution and frame rate
+            schema, fps, preset = scale_schema(schema, DRAFT_SCALE), DRAFT_FPS, DRAFT_PRESET
+            # The crops and sizes of the renditions are given in full resolution pixels, a draft only previews the main output
+            outputs = None
+        # Profiling times the layers of the moviepy compositor, the ffmpeg backend has none. Renditions are encoded from the moviepy frames
+        if backend == RenderingBackend.FFMPEG and not profile and not outputs:
+            try:
+                FFmpegEditingEngine().generate_video(schema, outputPath, logger=logger, fps=fps, preset=preset)
+                self.last_render_backend = RenderingBackend.FFMPEG
+                return
+            except NotImplementedError as e:
+                print(f"The ffmpeg rendering backend can't render this schema ({e}), falling back to moviepy")
         engine = CoreEditingEngine()
-        engine.generate_video(self.schema, outputPath, logger=logger)
+        engine.generate_video(schema, outputPath, logger=logger, n_workers=n_workers, fps=fps, preset=preset, lookahead_workers=lookahead_workers, resumable=resumable, incremental=incremental, profile=profile, outputs=outputs)
+        self.last_render_backend = RenderingBackend.MOVIEPY
     def renderImage(self, outputPath, logger=None):
         engine = CoreEditingEngine()
-        engine.generate_image(self.schema, outputPath, logger=logger)
+        engine.generate_image(RemoteMediaCache().localize_schema(self.schema), outputPath, logger=logger)
     def generateAudio(self, outputPath, logger=None):
         engine = CoreEditingEngine()
-        engine.generate_audio(self.schema, outputPath, logger=logger)
+        engine.generate_audio(RemoteMediaCache().localize_schema(self.schema), outputPath, logger=logger)
 
 
 
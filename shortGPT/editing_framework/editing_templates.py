@@ -0,0 +1,139 @@
+import collections.abc
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ASSET_TYPES = {'video', 'image', 'text', 'audio'}
+
+
+def update_dict(d, u):
+    for k, v in u.items():
+        if isinstance(v, collections.abc.Mapping):
+            d[k] = update_dict(d.get(k, {}), v)
+        else:
+            d[k] = v
+    return d
+
+
+def copy_json(value):
+    """Copies a JSON-like value (dicts, lists and scalars), much faster than copy.deepcopy"""
+    if isinstance(value, dict):
+        return {k: copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_json(v) for v in value]
+    return value
+
+
+def check_missing_inputs(required_args: List[str], args: Dict[str, Any]):
+    for required_argument in required_args:
+        if required_argument not in args:
+            raise Exception(
+                f"Error. '{required_argument}' input missing, you must include it to use this editing step")
+
+
+class StepTemplate:
+    """
+    An editing step file, validated and compiled once. The `inputs` of the step are compiled into the list of
+    required arguments and the slots they fill: a parameter, or the param of every action of that type.
+    """
+
+    def __init__(self, file_name: str, json_step: Dict[str, Any]):
+        if not isinstance(json_step, dict) or len(json_step) != 1:
+            raise Exception(f"Invalid editing step {file_name}: it must contain exactly one asset")
+        self.name, self.template = list(json_step.items())[0]
+        asset = self.template
+        if asset.get('type') not in ASSET_TYPES:
+            raise Exception(f"Invalid editing step {file_name}: unknown asset type {asset.get('type')}")
+        if not isinstance(asset.get('z'), (int, float)):
+            raise Exception(f"Invalid editing step {file_name}: the asset has no z index")
+        if any('type' not in action or 'param' not in action for action in asset.get('actions', [])):
+            raise Exception(f"Invalid editing step {file_name}: every action needs a type and a param")
+        inputs = asset.get('inputs', {})
+        self.required_args = inputs.get('actions', []) + inputs.get('parameters', [])
+        self.param_slots = set(asset.get('parameters', {})) if 'parameters' in inputs else set()
+        self.action_slots = {}
+        if 'actions' in inputs:
+            for i, action in enumerate(asset.get('actions', [])):
+                self.action_slots.setdefault(action['type'], []).append(i)
+        for required_argument in self.required_args:
+            if required_argument not in self.param_slots and required_argument not in self.action_slots:
+                raise Exception(f"Invalid editing step {file_name}: the input '{required_argument}' fills no parameter or action")
+
+    def instantiate(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns a new asset of the step, with the arguments filled in"""
+        check_missing_inputs(self.required_args, args)
+        asset = copy_json(self.template)
+        for arg_name, value in args.items():
+            if arg_name in self.param_slots:
+                asset['parameters'][arg_name] = value
+            for i in self.action_slots.get(arg_name, ()):
+                asset['actions'][i]['param'] = value
+        return asset
+
+
+class FlowTemplate:
+    """A flow file, validated and compiled once, with its inputs compiled into the key paths they fill"""
+
+    def __init__(self, file_name: str, json_flow: Dict[str, Any]):
+        if not isinstance(json_flow, dict) or 'inputs' not in json_flow:
+            raise Exception(f"Invalid flow {file_name}: it has no inputs")
+        self.template = json_flow
+        self.input_paths: Dict[str, Tuple[str, ...]] = {}
+        for input_name, path in json_flow['inputs'].items():
+            keys = tuple(path.split("/"))
+            parent = json_flow
+            for key in keys[:-1]:
+                parent = parent.get(key) if isinstance(parent, dict) else None
+            if not isinstance(parent, dict):
+                raise Exception(f"Invalid flow {file_name}: the input '{input_name}' points to a missing path {path}")
+            self.input_paths[input_name] = keys
+
+    def instantiate(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns a new schema of the flow, with the arguments filled in"""
+        check_missing_inputs(list(self.input_paths), args)
+        schema = copy_json(self.template)
+        for input_name, keys in self.input_paths.items():
+            parent = schema
+            for key in keys[:-1]:
+                parent = parent[key]
+            value = args[input_name]
+            if isinstance(value, collections.abc.Mapping):
+                parent[keys[-1]] = update_dict(parent.get(keys[-1], {}), value)
+            else:
+                parent[keys[-1]] = value
+        return schema
+
+
+class EditingTemplateRegistry:
+    """
+    Loads and validates every editing step and flow file the first time one of them is used,
+    and keeps them compiled for the lifetime of the process.
+    """
+
+    def __init__(self, steps_path: Path, step_files: List[str], flows_path: Path, flow_files: List[str]):
+        self.steps_path = steps_path
+        self.step_files = step_files
+        self.flows_path = flows_path
+        self.flow_files = flow_files
+        self.steps = None
+        self.flows = None
+
+    def load(self):
+        steps = {file_name: StepTemplate(file_name, self.read_json(self.steps_path / file_name)) for file_name in self.step_files}
+        flows = {file_name: FlowTemplate(file_name, self.read_json(self.flows_path / file_name)) for file_name in self.flow_files}
+        self.steps, self.flows = steps, flows
+
+    @staticmethod
+    def read_json(path: Path) -> Dict[str, Any]:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def get_step(self, file_name: str) -> StepTemplate:
+        if self.steps is None:
+            self.load()
+        return self.steps[file_name]
+
+    def get_flow(self, file_name: str) -> FlowTemplate:
+        if self.flows is None:
+            self.load()
+        return self.flows[file_name]
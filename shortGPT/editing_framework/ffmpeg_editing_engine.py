@@ -0,0 +1,303 @@
+import json
+import math
+import os
+import subprocess
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from shortGPT.config.path_utils import handle_path
+from shortGPT.editing_framework.geometry import (apply_geometric_action,
+                                                 crop_box, resolve_position)
+from shortGPT.editing_framework.rendering_logger import MoviepyProgressLogger
+from shortGPT.editing_framework.schema_utils import (TIME_ACTIONS,
+                                                     get_clip_timing)
+
+AUDIO_SAMPLE_RATE = 44100
+# Actions of the audio assets that compile_audio_asset mixes like CoreEditingEngine.process_audio_actions.
+# normalize_audio, added by the background music step, is ignored by both
+AUDIO_ACTIONS = TIME_ACTIONS | {'normalize_music', 'normalize_audio', 'loop_background_music', 'volume_percentage'}
+# Largest euclidean distance between two RGB colors, used to express moviepy's mask_color threshold as a colorkey similarity
+RGB_MAX_DISTANCE = math.sqrt(3) * 255
+PROBE_CACHE_SIZE = 256
+
+
+def probe_media(url: str) -> Dict[str, Any]:
+    """
+    Returns the size, frame rate, duration and audio information of a media file using ffprobe.
+    Local files are probed once per version, the optimizer, the audio premix and the renderers share the result.
+    """
+    try:
+        stat = os.stat(url)
+    except (OSError, ValueError):
+        return run_ffprobe(url)
+    # Callers complete the information, each one gets its own copy
+    return dict(probe_local_media(url, stat.st_size, stat.st_mtime))
+
+
+@lru_cache(maxsize=PROBE_CACHE_SIZE)
+def probe_local_media(path: str, size: int, mtime: float) -> Dict[str, Any]:
+    return run_ffprobe(path)
+
+
+def run_ffprobe(url: str) -> Dict[str, Any]:
+    cmd = ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", "-i", url]
+    output = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if output.returncode != 0:
+        raise Exception(f"Could not probe the media {url}. {output.stderr.strip()}")
+    metadata = json.loads(output.stdout)
+    infos = {'width': None, 'height': None, 'fps': None, 'duration': None, 'has_audio': False, 'sample_rate': None}
+    if metadata.get('format', {}).get('duration'):
+        infos['duration'] = float(metadata['format']['duration'])
+    for stream in metadata.get('streams', []):
+        if stream['codec_type'] == 'video' and infos['width'] is None:
+            infos['width'], infos['height'] = int(stream['width']), int(stream['height'])
+            num, den = stream.get('r_frame_rate', '0/0').split('/')
+            infos['fps'] = float(num) / float(den) if float(den) else None
+        elif stream['codec_type'] == 'audio' and not infos['has_audio']:
+            infos['has_audio'] = True
+            infos['sample_rate'] = int(stream.get('sample_rate', AUDIO_SAMPLE_RATE))
+    return infos
+
+
+class FFmpegEditingEngine:
+    """
+    Renders an editing schema by compiling it into a single ffmpeg -filter_complex graph, so that every
+    frame is composited by ffmpeg instead of moviepy. Raises NotImplementedError while compiling
+    when the schema uses an action that the graph can't express.
+    """
+
+    def generate_video(self, schema: Dict[str, Any], output_file, logger=None, fps=None, preset='medium'):
+        with tempfile.TemporaryDirectory() as work_dir:
+            command, duration, fps = self.compile_video(schema, output_file, work_dir, fps=fps, preset=preset)
+            self.run_ffmpeg(command, int(duration * fps), work_dir, logger=logger)
+        return output_file
+
+    def compile_video(self, schema: Dict[str, Any], output_file, work_dir, fps=None, preset='medium'):
+        visual_assets = dict(sorted(schema['visual_assets'].items(), key=lambda item: item[1]['z']))
+        audio_assets = dict(sorted(schema['audio_assets'].items(), key=lambda item: item[1]['z']))
+
+        layers = [self.compile_visual_asset(asset_key, asset, work_dir) for asset_key, asset in visual_assets.items()]
+        if not layers:
+            raise NotImplementedError('Nothing to render: the schema has no visual asset')
+        audio_tracks = self.compile_audio_tracks(schema)
+        if not audio_tracks:
+            # Without audio assets, moviepy keeps the soundtrack of the video clips
+            audio_tracks = [layer['audio'] for layer in layers if layer['audio']]
+
+        if fps is None:
+            fpss = [layer['fps'] for layer in layers if layer['fps']]
+            if not fpss:
+                raise NotImplementedError('Cannot infer the frame rate of a schema without video assets')
+            fps = max(fpss)
+        if audio_assets:
+            duration = max(track['end'] for track in audio_tracks)
+        else:
+            ends = [layer['end'] for layer in layers]
+            if None in ends:
+                raise ValueError('Cannot infer the duration of the video, some visual assets have no end')
+            duration = max(ends)
+
+        canvas_width, canvas_height = layers[0]['size']
+        inputs, graph = [], [f"color=c=black:s={canvas_width}x{canvas_height}:r={fps}:d={duration:.6f}[base]"]
+        current = 'base'
+        for i, layer in enumerate(layers):
+            inputs += self.layer_input_args(layer, duration, fps)
+            filters = layer['filters'] + [f"setpts=PTS-STARTPTS+{layer['start']:.6f}/TB"]
+            graph.append(f"[{i}:v]{','.join(filters)}[v{i}]")
+            x, y = resolve_position(layer['pos'], (canvas_width, canvas_height), layer['size'], layer['relative'])
+            enable = f"gte(t,{layer['start']:.6f})" + (f"*lt(t,{layer['end']:.6f})" if layer['end'] is not None else "")
+            graph.append(f"[{current}][v{i}]overlay=x={x}:y={y}:eof_action=pass:enable='{enable}'[c{i}]")
+            current = f"c{i}"
+        if canvas_width % 2 == 0 and canvas_height % 2 == 0:
+            graph.append(f"[{current}]format=yuv420p[vout]")
+            current = 'vout'
+
+        mapping = ['-map', f"[{current}]"]
+        if audio_tracks:
+            audio_inputs, audio_graph = self.compile_audio_mix(audio_tracks, len(layers))
+            inputs += audio_inputs
+            graph += audio_graph
+            mapping += ['-map', '[aout]', '-c:a', 'aac', '-ar', str(AUDIO_SAMPLE_RATE)]
+
+        graph_file = os.path.join(work_dir, 'filter_graph.txt')
+        with open(graph_file, 'w', encoding='utf-8') as f:
+            f.write(';\n'.join(graph))
+        command = (['ffmpeg', '-y', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1'] + inputs +
+                   ['-filter_complex_script', graph_file] + mapping +
+                   ['-c:v', 'libx264', '-preset', preset, '-r', str(fps), '-t', f"{duration:.6f}", output_file])
+        return command, duration, fps
+
+    def generate_audio(self, schema: Dict[str, Any], output_file, audio_tracks: List[Dict[str, Any]] = None):
+        """Mixes the audio assets of the schema into one track, encoded according to the extension of output_file"""
+        if audio_tracks is None:
+            audio_tracks = self.compile_audio_tracks(schema)
+        if not audio_tracks:
+            raise ValueError('The schema has no audio asset to mix')
+        duration = max(track['end'] for track in audio_tracks)
+        inputs, graph = self.compile_audio_mix(audio_tracks, 0)
+        codec = ['-c:a', 'pcm_s16le'] if output_file.lower().endswith('.wav') else ['-c:a', 'aac']
+        command = (['ffmpeg', '-y', '-loglevel', 'error', '-nostats'] + inputs +
+                   ['-filter_complex', ';'.join(graph), '-map', '[aout]'] + codec +
+                   ['-ar', str(AUDIO_SAMPLE_RATE), '-t', f"{duration:.6f}", output_file])
+        output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+        if output.returncode != 0:
+            raise Exception(f"ffmpeg failed to mix the audio. {output.stderr.strip()}")
+        return output_file
+
+    def compile_audio_tracks(self, schema: Dict[str, Any]) -> List[Dict[str, Any]]:
+        audio_assets = dict(sorted(schema['audio_assets'].items(), key=lambda item: item[1]['z']))
+        return [self.compile_audio_asset(asset) for asset in audio_assets.values()]
+
+    def compile_audio_mix(self, audio_tracks: List[Dict[str, Any]], first_input_index: int):
+        """Returns the input arguments and the filter graph mixing the audio tracks into the [aout] stream"""
+        inputs, graph, labels = [], [], []
+        for j, track in enumerate(audio_tracks):
+            inputs += track['input']
+            graph.append(f"[{first_input_index + j}:a]{','.join(track['filters'])}[a{j}]")
+            labels.append(f"[a{j}]")
+        if len(labels) > 1:
+            graph.append(f"{''.join(labels)}amix=inputs={len(labels)}:duration=longest:dropout_transition=0:normalize=0[aout]")
+        else:
+            graph.append(f"{labels[0]}anull[aout]")
+        return inputs, graph
+
+    def compile_visual_asset(self, asset_key: str, asset: Dict[str, Any], work_dir) -> Dict[str, Any]:
+        asset_type = asset['type']
+        actions = asset['actions']
+        if asset_type == 'video':
+            path = handle_path(asset['parameters']['url'])
+            infos = probe_media(path)
+        elif asset_type == 'image':
+            path = asset['parameters']['url']
+            try:
+                infos = probe_media(path)
+            except Exception:
+                infos = {'width': None}
+            if not infos['width']:
+                # moviepy reads images with imageio, which knows formats ffprobe doesn't
+                raise NotImplementedError(f"ffprobe can't read the image {path}")
+            infos['duration'] = infos['fps'] = None
+        elif asset_type == 'text':
+            # Imported here since CoreEditingEngine premixes its audio with this module
+            from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
+            path = os.path.join(work_dir, f"{asset_key}.png")
+            clip = CoreEditingEngine().make_text_clip(dict(asset['parameters']))
+            clip.save_frame(path, withmask=True)
+            infos = {'width': clip.size[0], 'height': clip.size[1], 'duration': None, 'fps': None, 'has_audio': False}
+        else:
+            raise ValueError(f'Invalid asset type: {asset_type}')
+
+        size = (infos['width'], infos['height'])
+        filters = [] if asset_type == 'video' else ['format=rgba']
+        pos, relative = (0, 0), False
+        for action in actions:
+            action_type = action['type']
+            if action_type in TIME_ACTIONS or action_type == 'normalize_image':
+                continue
+            if action_type == 'screen_position':
+                pos, relative = action['param']['pos'], action['param'].get('relative', False)
+            elif action_type == 'crop':
+                x, y, width, height = crop_box(size, **action['param'])
+                filters.append(f"crop={width}:{height}:{x}:{y}")
+                size = (width, height)
+            elif action_type in ('resize', 'auto_resize_image'):
+                size = apply_geometric_action(size, action)
+                filters.append(f"scale={size[0]}:{size[1]}:flags=lanczos")
+            elif action_type == 'green_screen':
+                filters.append(self.green_screen_filter(action['param']))
+            else:
+                raise NotImplementedError(f"The ffmpeg rendering backend doesn't support the '{action_type}' action")
+
+        timing = get_clip_timing(actions, infos['duration'])
+        layer = {'type': asset_type, 'path': path, 'filters': filters, 'size': size, 'pos': pos, 'relative': relative,
+                 'fps': infos['fps'], 'audio': None, **timing}
+        if asset_type == 'video' and asset['parameters'].get('audio', True) and infos['has_audio']:
+            layer['audio'] = {'input': self.timed_input_args(path, timing),
+                              'filters': self.audio_timing_filters(timing['start']),
+                              'end': timing['end']}
+        return layer
+
+    def compile_audio_asset(self, asset: Dict[str, Any]) -> Dict[str, Any]:
+        if asset['type'] != 'audio':
+            raise ValueError(f"Invalid asset type: {asset['type']}")
+        path = asset['parameters']['url']
+        infos = probe_media(path)
+        timing = get_clip_timing(asset['actions'], infos['duration'])
+        # Decoded to stereo first like moviepy's audio reader, which matters for the level of mono files
+        filters = [f"aformat=sample_rates={AUDIO_SAMPLE_RATE}:channel_layouts=stereo"]
+        for action in asset['actions']:
+            if action['type'] not in AUDIO_ACTIONS:
+                # Raised so that CoreEditingEngine mixes the audio with moviepy, instead of dropping the action
+                raise NotImplementedError(f"The ffmpeg audio mix doesn't support the '{action['type']}' action")
+            if action['type'] == 'normalize_music':
+                # Same as moviepy's audio_normalize: scale the track so that its loudest sample is at full scale
+                max_volume = self.measure_max_volume(self.timed_input_args(path, timing), filters)
+                filters.append(f"volume={10 ** (-max_volume / 20):.6f}")
+            if action['type'] == 'loop_background_music':
+                # Same as CoreEditingEngine: skip the first 15% of the track, then loop it up to the target duration
+                target_duration = action['param']
+                skipped = timing['duration'] * 0.15
+                timing['offset'] += skipped
+                timing['duration'] -= skipped
+                loop_size = math.ceil(timing['duration'] * (infos['sample_rate'] or AUDIO_SAMPLE_RATE))
+                filters += [f"aloop=loop=-1:size={loop_size}", f"atrim=duration={target_duration:.6f}", "asetpts=PTS-STARTPTS"]
+                timing.update({'start': 0, 'end': target_duration})
+            if action['type'] == 'volume_percentage':
+                filters.append(f"volume={action['param']}")
+        filters += self.audio_timing_filters(timing['start'])
+        return {'input': self.timed_input_args(path, timing), 'filters': filters, 'end': timing['end']}
+
+    def measure_max_volume(self, input_args: List[str], filters: List[str]) -> float:
+        """Returns the peak level, in dB relative to full scale, of an input after the given audio filters"""
+        command = (['ffmpeg', '-nostats', '-hide_banner'] + input_args +
+                   ['-af', ','.join(filters + ['volumedetect']), '-f', 'null', '-'])
+        output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+        for line in output.stderr.splitlines():
+            if 'max_volume:' in line:
+                return float(line.split('max_volume:')[1].split('dB')[0])
+        raise Exception(f"Could not measure the volume of {input_args[-1]}. {output.stderr.strip()}")
+
+    def green_screen_filter(self, params: Dict[str, Any]) -> str:
+        color = params['color'] if params['color'] else [52, 255, 20]
+        thr = params['thr'] if params['thr'] else 100
+        s = params['s'] if params['s'] else 5
+        # moviepy's mask is d**s / (thr**s + d**s): a ramp centered on thr whose slope at thr is s / (4 * thr).
+        # colorkey ramps linearly from similarity to similarity + blend, so we match the center and the slope.
+        blend = 4 * thr / s
+        similarity = max(thr - blend / 2, 1)
+        return f"colorkey=color=0x{color[0]:02x}{color[1]:02x}{color[2]:02x}:similarity={similarity / RGB_MAX_DISTANCE:.4f}:blend={blend / RGB_MAX_DISTANCE:.4f}"
+
+    def audio_timing_filters(self, start: float) -> List[str]:
+        filters = [f"aformat=sample_rates={AUDIO_SAMPLE_RATE}:channel_layouts=stereo"]
+        if start:
+            filters.append(f"adelay=delays={int(start * 1000)}:all=1")
+        return filters
+
+    def timed_input_args(self, path: str, timing: Dict[str, Any]) -> List[str]:
+        args = []
+        if timing['offset']:
+            args += ['-ss', f"{timing['offset']:.6f}"]
+        if timing['duration'] is not None:
+            args += ['-t', f"{timing['duration']:.6f}"]
+        return args + ['-i', path]
+
+    def layer_input_args(self, layer: Dict[str, Any], duration: float, fps: float) -> List[str]:
+        if layer['type'] == 'video':
+            return self.timed_input_args(layer['path'], layer)
+        end = layer['end'] if layer['end'] is not None else duration
+        return ['-loop', '1', '-framerate', str(fps), '-t', f"{max(end - layer['start'], 0):.6f}", '-i', layer['path']]
+
+    def run_ffmpeg(self, command: List[str], total_frames: int, work_dir, logger=None):
+        progress_logger = MoviepyProgressLogger(callBackFunction=logger) if logger else None
+        if progress_logger:
+            progress_logger(t__total=total_frames)
+        with open(os.path.join(work_dir, 'ffmpeg.log'), 'w+', encoding='utf-8') as log_file:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=log_file, stdin=subprocess.DEVNULL, text=True)
+            for line in process.stdout:
+                if progress_logger and line.startswith('frame='):
+                    progress_logger(t__index=min(int(line.split('=')[1]), total_frames))
+            process.wait()
+            if process.returncode != 0:
+                log_file.seek(0)
+                raise Exception(f"ffmpeg failed to render the video. {log_file.read().strip()}")
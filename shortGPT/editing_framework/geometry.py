@@ -0,0 +1,86 @@
+from typing import Any, Dict, Tuple
+
+# Pure size / position arithmetic for the editing step actions. These mirror what
+# moviepy does when it applies the same actions, so that renderers that don't
+# go through moviepy (ffmpeg, Pillow) land every layer on the same pixel.
+
+
+def crop_box(size, x1=None, y1=None, x2=None, y2=None, width=None, height=None, x_center=None, y_center=None) -> Tuple[int, int, int, int]:
+    """Returns the (x, y, width, height) box kept by moviepy's `crop` for a frame of the given size"""
+    if width and x1 is not None:
+        x2 = x1 + width
+    elif width and x2 is not None:
+        x1 = x2 - width
+    if height and y1 is not None:
+        y2 = y1 + height
+    elif height and y2 is not None:
+        y1 = y2 - height
+    if x_center:
+        x1, x2 = x_center - width / 2, x_center + width / 2
+    if y_center:
+        y1, y2 = y_center - height / 2, y_center + height / 2
+    x1 = int(x1 or 0)
+    y1 = int(y1 or 0)
+    x2 = min(int(x2 or size[0]), size[0])
+    y2 = min(int(y2 or size[1]), size[1])
+    return x1, y1, x2 - x1, y2 - y1
+
+
+def resized_size(size, newsize=None, height=None, width=None) -> Tuple[int, int]:
+    """Returns the frame size produced by moviepy's `resize` with constant parameters"""
+    w, h = size
+    if newsize is not None:
+        if isinstance(newsize, (int, float)):
+            newsize = [newsize * w, newsize * h]
+    elif height is not None:
+        newsize = [w * height / h, height]
+    elif width is not None:
+        newsize = [width, h * width / w]
+    else:
+        return w, h
+    return int(newsize[0]), int(newsize[1])
+
+
+def auto_resized_size(size, maxWidth, maxHeight, **kwargs) -> Tuple[int, int]:
+    """Returns the frame size produced by the `auto_resize_image` action"""
+    ar = size[0] / size[1]
+    # Already fitted (like the images prepared by the image ingestion), the same size up to the rounding
+    if (ar < 1 and size[1] == maxHeight) or (ar >= 1 and size[0] == maxWidth):
+        return tuple(size)
+    if ar < 1:
+        return resized_size(size, (maxHeight * ar, maxHeight))
+    return resized_size(size, (maxWidth, maxWidth / ar))
+
+
+def resolve_position(pos, frame_size, clip_size, relative=False) -> Tuple[int, int]:
+    """Returns the top-left pixel where moviepy blits a clip of `clip_size` positioned at `pos`"""
+    wf, hf = frame_size
+    wi, hi = clip_size
+    if isinstance(pos, str):
+        pos = {'center': ['center', 'center'],
+               'left': ['left', 'center'],
+               'right': ['right', 'center'],
+               'top': ['center', 'top'],
+               'bottom': ['center', 'bottom']}[pos]
+    else:
+        pos = list(pos)
+    if relative:
+        for i, dim in enumerate([wf, hf]):
+            if not isinstance(pos[i], str):
+                pos[i] = dim * pos[i]
+    if isinstance(pos[0], str):
+        pos[0] = {'left': 0, 'center': (wf - wi) / 2, 'right': wf - wi}[pos[0]]
+    if isinstance(pos[1], str):
+        pos[1] = {'top': 0, 'center': (hf - hi) / 2, 'bottom': hf - hi}[pos[1]]
+    return int(pos[0]), int(pos[1])
+
+
+def apply_geometric_action(size, action: Dict[str, Any]) -> Tuple[int, int]:
+    """Returns the frame size after a crop / resize / auto_resize_image action, or the same size for other actions"""
+    if action['type'] == 'crop':
+        return crop_box(size, **action['param'])[2:]
+    if action['type'] == 'resize':
+        return resized_size(size, **action['param'])
+    if action['type'] == 'auto_resize_image':
+        return auto_resized_size(size, **action['param'])
+    return tuple(size)
@@ -0,0 +1,100 @@
+import os
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from moviepy.video.tools.drawing import blit
+from PIL import Image
+
+from shortGPT.config.path_utils import handle_path
+from shortGPT.editing_framework.geometry import auto_resized_size, crop_box, resized_size, resolve_position
+from shortGPT.editing_framework.text_cache import TextRasterCache
+from shortGPT.editing_framework.text_rendering import get_text_clip_params, render_text
+
+# Actions the compositor applies itself, schemas with other actions are rendered by moviepy
+IMAGE_COMPOSITOR_ACTIONS = {'screen_position', 'resize', 'crop', 'auto_resize_image'}
+IMAGE_CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=IMAGE_CACHE_SIZE)
+def load_decoded_image(path: str, mtime: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Decodes an image once per file version, as an RGB array and a mask in [0, 1] like moviepy's ImageClip"""
+    with Image.open(path) as image:
+        pixels = np.array(image.convert('RGBA'))
+    img, mask = pixels[:, :, :3], pixels[:, :, 3] / 255.0
+    # Shared between renders, the layers are transformed into new arrays
+    img.flags.writeable = False
+    mask.flags.writeable = False
+    return img, mask
+
+
+def get_decoded_image(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    return load_decoded_image(path, os.path.getmtime(path))
+
+
+class ImageCompositor:
+    """
+    Renders image-only schemas (images and text, like the Reddit thread image) with Pillow and numpy,
+    without building moviepy clips. Images are decoded once per process, text is rasterized in-process
+    through the text cache, and the layers are blended like CompositeVideoClip.save_frame does.
+    """
+
+    def __init__(self, text_cache: TextRasterCache = None):
+        self.text_cache = text_cache or TextRasterCache()
+
+    @staticmethod
+    def supports(schema: Dict[str, Any]) -> bool:
+        for asset in schema['visual_assets'].values():
+            if asset['type'] not in ('image', 'text'):
+                return False
+            if any(action['type'] not in IMAGE_COMPOSITOR_ACTIONS for action in asset['actions']):
+                return False
+            if any(callable(value) for action in asset['actions'] for value in action['param'].values()):
+                return False
+        return True
+
+    def get_layer(self, asset: Dict[str, Any]):
+        """Returns the RGB array, mask and screen position of an asset"""
+        if asset['type'] == 'image':
+            img, mask = get_decoded_image(handle_path(asset['parameters']['url']))
+        else:
+            raster = self.text_cache.get_or_render(get_text_clip_params(asset['parameters']), render_text)
+            img, mask = raster[:, :, :3], raster[:, :, 3] / 255.0
+        position = {'pos': (0, 0), 'relative': False}
+        for action in asset['actions']:
+            size = (img.shape[1], img.shape[0])
+            if action['type'] == 'screen_position':
+                position = {'relative': False, **action['param']}
+            elif action['type'] == 'crop':
+                x, y, width, height = crop_box(size, **action['param'])
+                img, mask = img[y:y + height, x:x + width], mask[y:y + height, x:x + width]
+            elif action['type'] in ('resize', 'auto_resize_image'):
+                newsize = resized_size(size, **action['param']) if action['type'] == 'resize' else auto_resized_size(size, **action['param'])
+                img = np.array(Image.fromarray(img).resize(newsize, Image.LANCZOS))
+                mask = np.array(Image.fromarray(mask.astype('float32'), 'F').resize(newsize, Image.BILINEAR)).clip(0, 1)
+        return img, mask, position
+
+    def composite(self, schema: Dict[str, Any]) -> np.ndarray:
+        """Returns the RGBA picture of the schema, the size of its first layer"""
+        assets = sorted(schema['visual_assets'].values(), key=lambda asset: asset['z'])
+        layers = []
+        for asset in assets:
+            try:
+                layers.append(self.get_layer(asset))
+            except Exception:
+                # Images that can't be loaded are left out, like in CoreEditingEngine.generate_image
+                if asset['type'] != 'image':
+                    raise
+        height, width = layers[0][0].shape[:2]
+        picture = np.zeros((height, width, 3), dtype='uint8')
+        alpha = np.zeros((height, width))
+        for img, mask, position in layers:
+            pos = resolve_position(position['pos'], (width, height), (img.shape[1], img.shape[0]), relative=position['relative'])
+            picture = blit(img, picture, pos, mask=mask)
+            # The masks add up, like the mask of a CompositeVideoClip
+            alpha = np.minimum(1, alpha + blit(mask, np.zeros(alpha.shape), pos, ismask=True))
+        return np.dstack([picture, 255 * alpha]).astype('uint8')
+
+    def generate_image(self, schema: Dict[str, Any], output_file: str) -> str:
+        Image.fromarray(self.composite(schema), 'RGBA').save(output_file)
+        return output_file
@@ -0,0 +1,143 @@
+import copy
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+MEDIA_CACHE_DIR = ".editing_assets/media_cache/"
+MEDIA_CACHE_MAX_SIZE = 8 * 1024 * 1024 * 1024
+PREFETCH_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 60
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def is_remote_url(url) -> bool:
+    return isinstance(url, str) and url.startswith(('http://', 'https://'))
+
+
+def canonicalize_url(url: str) -> str:
+    """Returns the URL with a lowercase scheme and host, without its default port or fragment, and with sorted query parameters"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc += f":{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+class RemoteMediaCache:
+    """
+    On-disk cache of the remote media of the editing schemas (stock videos, images, music), stored under the hash
+    of their canonical URL so that every render reads local files instead of streaming and seeking over the network.
+    Downloads are written next to their final path then renamed, so that several renders can share the cache.
+    The least recently used files are evicted when the cache grows over its size budget.
+    """
+
+    def __init__(self, cache_dir=MEDIA_CACHE_DIR, max_size=MEDIA_CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_path(self, url: str) -> str:
+        canonical_url = canonicalize_url(url)
+        key = hashlib.sha256(canonical_url.encode('utf-8')).hexdigest()
+        extension = os.path.splitext(urlsplit(canonical_url).path)[1].lower()
+        # Keeps the extension ffmpeg and Pillow recognize, the rest of the name is the key
+        if not extension[1:].isalnum() or len(extension) > 6:
+            extension = ''
+        return os.path.join(self.cache_dir, f"{key}{extension}")
+
+    def get(self, url: str) -> Optional[str]:
+        path = self.get_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def download(self, url: str) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(url)
+        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        temp_file.write(chunk)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def get_or_download(self, url: str) -> str:
+        return self.get(url) or self.download(url)
+
+    def evict(self, keep: str = None):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            # Downloads in progress are never evicted
+            if filename.endswith('.part'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path = os.path.join(self.cache_dir, filename)
+            if keep and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def prefetch(self, urls: List[str], max_workers=PREFETCH_WORKERS) -> Dict[str, str]:
+        """
+        Downloads the remote URLs that aren't cached yet, concurrently.
+        Returns the local file of each URL; URLs that couldn't be downloaded are left out, and are read remotely.
+        """
+        urls = list(dict.fromkeys(url for url in urls if is_remote_url(url)))
+        if not urls:
+            return {}
+        local_files = {}
+
+        def fetch(url):
+            try:
+                local_files[url] = self.get_or_download(url)
+            except Exception as e:
+                print(f"Could not download {url} to the media cache ({e}), it will be read remotely")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+            list(pool.map(fetch, urls))
+        return local_files
+
+    def localize_schema(self, schema: Dict[str, Any], max_workers=PREFETCH_WORKERS) -> Dict[str, Any]:
+        """Prefetches the remote media of a schema, and returns a copy of the schema reading their local files"""
+        assets = list(schema['visual_assets'].values()) + list(schema['audio_assets'].values())
+        local_files = self.prefetch([asset['parameters'].get('url') for asset in assets], max_workers=max_workers)
+        if not local_files:
+            return schema
+        schema = copy.deepcopy(schema)
+        for asset_group in ('visual_assets', 'audio_assets'):
+            for asset in schema[asset_group].values():
+                url = asset['parameters'].get('url')
+                if url in local_files:
+                    asset['parameters']['url'] = local_files[url]
+        return schema
@@ -0,0 +1,159 @@
+import json
+import os
+import subprocess
+from typing import Any, Dict, List, Tuple
+
+from moviepy.config import get_setting
+from moviepy.editor import AudioFileClip, ImageClip, VideoClip, VideoFileClip
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+
+from shortGPT.editing_framework.geometry import crop_box, resized_size
+from shortGPT.editing_framework.schema_utils import get_clip_timing
+
+# Geometric actions ffmpeg can apply while decoding, with the same result as moviepy
+DECODER_ACTIONS = {'crop', 'resize'}
+# Actions that don't change the pixels of a frame, and can be applied before or after the decoder actions
+FRAME_INDEPENDENT_ACTIONS = {'set_time_start', 'set_time_end', 'subclip', 'screen_position'}
+
+
+def split_decoder_actions(actions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Splits the actions of a video asset into the leading crop / resize actions, which the ffmpeg reader
+    applies while decoding, and the actions left to moviepy.
+    """
+    decoder_actions = []
+    other_actions = []
+    leading = True
+    for action in actions:
+        if action['type'] in FRAME_INDEPENDENT_ACTIONS:
+            other_actions.append(action)
+        elif leading and action['type'] in DECODER_ACTIONS and not callable(action['param'].get('newsize')):
+            decoder_actions.append(action)
+        else:
+            leading = False
+            other_actions.append(action)
+    return decoder_actions, other_actions
+
+
+def compile_decoder_filters(size, actions: List[Dict[str, Any]]) -> Tuple[List[str], Tuple[int, int]]:
+    """Returns the ffmpeg filters applying crop / resize actions to frames of the given size, and the size of the result"""
+    # moviepy converts frames to RGB before cropping and resizing them, so does the filter chain
+    filters = ["format=rgb24"]
+    for action in actions:
+        if action['type'] == 'crop':
+            x, y, width, height = crop_box(size, **action['param'])
+            filters.append(f"crop={width}:{height}:{x}:{y}")
+            size = (width, height)
+        elif action['type'] == 'resize':
+            size = resized_size(size, **action['param'])
+            filters.append(f"scale={size[0]}:{size[1]}:flags=lanczos")
+    return filters, size
+
+
+class FilteredVideoReader(FFMPEG_VideoReader):
+    """moviepy video reader whose ffmpeg process crops and scales the frames before piping them"""
+
+    def __init__(self, filename: str, actions: List[Dict[str, Any]]):
+        self.actions = actions
+        self.filters = None
+        super().__init__(filename)
+
+    def initialize(self, starttime=0):
+        if self.filters is None:
+            # First call, from FFMPEG_VideoReader.__init__, where the size is still the size of the file
+            self.filters, self.size = compile_decoder_filters(self.size, self.actions)
+        self.close()
+        if starttime != 0:
+            offset = min(1, starttime)
+            i_arg = ['-ss', "%.06f" % (starttime - offset), '-i', self.filename, '-ss', "%.06f" % offset]
+        else:
+            i_arg = ['-i', self.filename]
+        cmd = [get_setting("FFMPEG_BINARY"), *i_arg, '-loglevel', 'error', '-f', 'image2pipe',
+               '-vf', ','.join(self.filters), '-pix_fmt', self.pix_fmt, '-vcodec', 'rawvideo', '-']
+        popen_params = {"bufsize": self.bufsize, "stdout": subprocess.PIPE, "stderr": subprocess.PIPE, "stdin": subprocess.DEVNULL}
+        if os.name == "nt":
+            popen_params["creationflags"] = 0x08000000
+        self.proc = subprocess.Popen(cmd, **popen_params)
+
+
+class FilteredVideoFileClip(VideoFileClip):
+    """VideoFileClip read through a FilteredVideoReader, its frames have the size given by the actions"""
+
+    def __init__(self, filename: str, actions: List[Dict[str, Any]]):
+        VideoClip.__init__(self)
+        self.reader = FilteredVideoReader(filename, actions)
+        self.duration = self.reader.duration
+        self.end = self.reader.duration
+        self.fps = self.reader.fps
+        self.size = self.reader.size
+        self.rotation = self.reader.rotation
+        self.filename = self.reader.filename
+        self.make_frame = lambda t: self.reader.get_frame(t)
+
+
+def get_read_shift(actions: List[Dict[str, Any]]) -> float:
+    """
+    Difference between the time an asset reads in its source and the time of the timeline, from its
+    set_time_start and subclip actions. Assets with the same shift read the same frame at every time of the render.
+    """
+    timing = get_clip_timing(actions)
+    return round(timing['offset'] - timing['start'], 3)
+
+
+class MediaReaderPool:
+    """
+    Opens each media file of a render once per read shift (see get_read_shift). Assets using the same source
+    (and the same decoder actions) at the same shift get copies of the same clip, which share its ffmpeg reader
+    (subclips and other transforms are views on it), so the reader keeps decoding forward. Assets reading the
+    source at different shifts get their own readers, a shared one would seek back and forth on every frame.
+    Every reader is closed by `close` when the render is finished, instead of being left to the garbage collector.
+    """
+
+    def __init__(self):
+        self.videos = {}
+        self.audios = {}
+        self.images = {}
+        self.children = []
+
+    def get_video(self, filename: str, audio=True, decoder_actions: List[Dict[str, Any]] = None, read_shift=0) -> VideoFileClip:
+        """Returns a clip of the video, with `decoder_actions` (see split_decoder_actions) applied by its ffmpeg reader"""
+        key = (filename, json.dumps(decoder_actions or [], sort_keys=True), read_shift)
+        if key not in self.videos:
+            self.videos[key] = FilteredVideoFileClip(filename, decoder_actions) if decoder_actions else VideoFileClip(filename, audio=False)
+        clip = self.videos[key].copy()
+        # The soundtrack of a video shares its reader with the audio assets extracted from the same file
+        if audio and clip.reader.infos['audio_found']:
+            clip = clip.set_audio(self.get_audio(filename, read_shift))
+        return clip
+
+    def get_audio(self, filename: str, read_shift=0) -> AudioFileClip:
+        key = (filename, read_shift)
+        if key not in self.audios:
+            self.audios[key] = AudioFileClip(filename)
+        return self.audios[key].copy()
+
+    def get_image(self, filename: str) -> ImageClip:
+        if filename not in self.images:
+            self.images[filename] = ImageClip(filename)
+        return self.images[filename].copy()
+
+    def open_child(self) -> 'MediaReaderPool':
+        """Returns a pool for the readers of one lazily built asset, which is closed with this pool if it is still open"""
+        child = MediaReaderPool()
+        self.children.append(child)
+        return child
+
+    def close_child(self, child: 'MediaReaderPool'):
+        child.close()
+        if child in self.children:
+            self.children.remove(child)
+
+    def close(self):
+        for clip in list(self.videos.values()) + list(self.audios.values()):
+            clip.close()
+        for child in self.children:
+            child.close()
+        self.videos.clear()
+        self.audios.clear()
+        self.images.clear()
+        self.children.clear()
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from shortGPT.editing_framework.geometry import crop_box, resized_size
+
+OUTPUT_SPEC_KEYS = {'output_file', 'crop', 'resize', 'bitrate', 'preset'}
+
+
+def get_output_size(frame_size, output: Dict[str, Any]) -> Tuple[Tuple[int, int, int, int], Tuple[int, int]]:
+    """
+    Returns the crop box and the final size of an output, like the `crop` then `resize` actions would give.
+    The size is rounded down to even dimensions, which yuv420p x264 requires.
+    """
+    box = crop_box(frame_size, **output.get('crop', {})) if output.get('crop') else (0, 0, *frame_size)
+    width, height = resized_size(box[2:], **output.get('resize', {}))
+    return box, (width - width % 2, height - height % 2)
+
+
+def check_output_specs(outputs: List[Dict[str, Any]]):
+    output_files = set()
+    for output in outputs:
+        if not output.get('output_file'):
+            raise Exception(f"Invalid output {output}: it has no output_file")
+        unknown_keys = set(output) - OUTPUT_SPEC_KEYS
+        if unknown_keys:
+            raise Exception(f"Invalid output {output['output_file']}: unknown keys {sorted(unknown_keys)}")
+        if os.path.abspath(output['output_file']) in output_files:
+            raise Exception(f"The output {output['output_file']} is written twice")
+        output_files.add(os.path.abspath(output['output_file']))
+
+
+class MultiOutputVideoWriter:
+    """
+    Streams composited frames into a single ffmpeg process which splits them between several libx264 encoders,
+    one per output spec, each with its own crop, size, bitrate and preset. Frames are composited once, however
+    many renditions of the video are written. Used like moviepy's FFMPEG_VideoWriter.
+    """
+
+    def __init__(self, size, fps, outputs: List[Dict[str, Any]], preset='medium', audio_file=None):
+        check_output_specs(outputs)
+        self.size = tuple(size)
+        self.outputs = outputs
+        filters = [f"[0:v]split={len(outputs)}" + ''.join(f"[s{i}]" for i in range(len(outputs)))]
+        output_args = []
+        for i, output in enumerate(outputs):
+            (x, y, width, height), output_size = get_output_size(self.size, output)
+            chain = []
+            if (x, y, width, height) != (0, 0, *self.size):
+                chain.append(f"crop={width}:{height}:{x}:{y}")
+            if output_size != (width, height):
+                chain.append(f"scale={output_size[0]}:{output_size[1]}:flags=lanczos")
+            filters.append(f"[s{i}]{','.join(chain) or 'null'}[v{i}]")
+            output_args += ['-map', f"[v{i}]"]
+            output_args += ['-map', '1:a', '-c:a', 'copy'] if audio_file else ['-an']
+            output_args += ['-c:v', 'libx264', '-preset', output.get('preset', preset), '-pix_fmt', 'yuv420p']
+            if output.get('bitrate'):
+                output_args += ['-b:v', str(output['bitrate'])]
+            output_args.append(output['output_file'])
+        command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-vcodec', 'rawvideo', '-s', f"{self.size[0]}x{self.size[1]}",
+                   '-pix_fmt', 'rgb24', '-r', f"{fps:.02f}", '-i', '-']
+        if audio_file:
+            command += ['-i', audio_file]
+        command += ['-filter_complex', ';'.join(filters)] + output_args
+        # ffmpeg's errors go to a file, a pipe nobody reads would block the encoders once full
+        self.log_file = tempfile.TemporaryFile(mode='w+')
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.log_file)
+
+    def write_frame(self, frame):
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except (BrokenPipeError, OSError):
+            # Raises with ffmpeg's error when it exited on one
+            self.close()
+            raise Exception("ffmpeg stopped reading the frames")
+
+    def read_log(self) -> str:
+        self.log_file.seek(0)
+        return self.log_file.read().strip()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        returncode = self.process.wait()
+        self.process = None
+        log = self.read_log()
+        self.log_file.close()
+        if returncode != 0:
+            raise Exception(f"ffmpeg failed to encode the outputs. {log}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        # The error of the render is raised, not the one of the encoder it interrupted
+        try:
+            self.close()
+        except Exception:
+            pass
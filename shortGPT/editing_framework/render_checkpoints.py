@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List
+
+from shortGPT.editing_framework.schema_utils import schema_hash, slice_schema
+
+RENDER_CHECKPOINTS_DIR = ".editing_assets/render_checkpoints/"
+# Length of the segments a resumable render is cut in. A crash loses at most one segment per worker
+CHECKPOINT_SEGMENT_DURATION = 10
+# Checkpoints of renders that were abandoned, not restarted within this many seconds, are deleted
+CHECKPOINT_MAX_AGE = 7 * 24 * 3600
+RENDER_SEGMENTS_DIR = ".editing_assets/render_segments/"
+RENDER_SEGMENTS_MAX_SIZE = 4 * 1024 * 1024 * 1024
+# Shorter than the checkpoint segments: fixing a caption re-renders a few seconds of video
+INCREMENTAL_SEGMENT_DURATION = 5
+# Bump when the compositor renders different pixels for the same schema, so that stale segments are never reused
+SEGMENT_RENDERER_VERSION = 1
+
+
+class RenderCheckpoint:
+    """
+    Manifest of a resumable render. The video is cut in segments of CHECKPOINT_SEGMENT_DURATION seconds,
+    rendered to their own files, and the manifest records the finished ones. The checkpoint directory is
+    named after the hash of the schema and of the encoding settings, so a restarted render of the same
+    schema finds the segments of the previous attempt. Checkpoints untouched for max_age seconds are deleted
+    when a new one is opened.
+    """
+
+    def __init__(self, schema: Dict[str, Any], fps: float, n_frames: int, preset: str, checkpoint_dir=RENDER_CHECKPOINTS_DIR,
+                 max_age=CHECKPOINT_MAX_AGE):
+        self.key = schema_hash({'schema': schema, 'fps': fps, 'n_frames': n_frames, 'preset': preset})
+        self.directory = os.path.join(checkpoint_dir, self.key)
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        os.makedirs(self.directory, exist_ok=True)
+        prune_checkpoints(checkpoint_dir, max_age, keep=self.key)
+        self.manifest = self.load_manifest()
+        if self.manifest is None:
+            segment_frames = max(int(round(CHECKPOINT_SEGMENT_DURATION * fps)), 1)
+            segments = [{'file': f"segment_{i:04d}.mp4", 'first_frame': first_frame,
+                         'last_frame': min(first_frame + segment_frames, n_frames), 'done': False}
+                        for i, first_frame in enumerate(range(0, n_frames, segment_frames))]
+            self.manifest = {'schema_hash': self.key, 'fps': fps, 'n_frames': n_frames, 'segments': segments}
+            self.save_manifest()
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError:
+            return None
+
+    def save_manifest(self):
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    def get_segment_path(self, segment: Dict[str, Any]) -> str:
+        return os.path.join(self.directory, segment['file'])
+
+    def get_pending_segments(self) -> List[Dict[str, Any]]:
+        return [segment for segment in self.manifest['segments']
+                if not (segment['done'] and os.path.exists(self.get_segment_path(segment)))]
+
+    def mark_done(self, segment: Dict[str, Any]):
+        segment['done'] = True
+        self.save_manifest()
+
+    def get_segment_files(self) -> List[str]:
+        return [self.get_segment_path(segment) for segment in self.manifest['segments']]
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def prune_checkpoints(checkpoint_dir=RENDER_CHECKPOINTS_DIR, max_age=CHECKPOINT_MAX_AGE, keep: str = None):
+    """Deletes the checkpoints whose manifest wasn't written for max_age seconds, except the `keep` one"""
+    now = time.time()
+    for key in os.listdir(checkpoint_dir):
+        directory = os.path.join(checkpoint_dir, key)
+        if key == keep or not os.path.isdir(directory):
+            continue
+        # The manifest is rewritten after every segment, a directory without one was never started
+        manifest_path = os.path.join(directory, 'manifest.json')
+        try:
+            last_used = os.path.getmtime(manifest_path if os.path.exists(manifest_path) else directory)
+        except FileNotFoundError:
+            continue
+        if now - last_used > max_age:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def get_source_stats(assets: List[Dict[str, Any]]) -> List[Any]:
+    """Size and modification time of the local files read by the assets, so that replacing a file changes the hashes"""
+    stats = []
+    for asset in assets:
+        url = asset.get('parameters', {}).get('url')
+        if isinstance(url, str) and os.path.exists(url):
+            stat = os.stat(url)
+            stats.append([url, stat.st_size, stat.st_mtime])
+    return stats
+
+
+class RenderSegmentStore:
+    """
+    Rendered segments of incremental renders, named after the hash of their content: the layers visible in the
+    segment (without their keys, which shift when a step is added), the files they read, the frames and the encoding
+    settings. A segment whose layers didn't change since a previous render is found in the store instead of being
+    rendered again. The least recently used segments are evicted when the store grows over its size budget.
+    """
+
+    def __init__(self, store_dir=RENDER_SEGMENTS_DIR, max_size=RENDER_SEGMENTS_MAX_SIZE):
+        self.store_dir = store_dir
+        self.max_size = max_size
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def get_segments(self, schema: Dict[str, Any], fps: float, n_frames: int, preset: str) -> List[Dict[str, Any]]:
+        segment_frames = max(int(round(INCREMENTAL_SEGMENT_DURATION * fps)), 1)
+        segments = []
+        for first_frame in range(0, n_frames, segment_frames):
+            last_frame = min(first_frame + segment_frames, n_frames)
+            segment_schema = slice_schema(schema, first_frame / fps, last_frame / fps)
+            # Assets in compositing order, the order of the schema for assets with the same z
+            assets = sorted(segment_schema['visual_assets'].values(), key=lambda asset: asset['z'])
+            key = schema_hash({'assets': assets, 'sources': get_source_stats(assets), 'first_frame': first_frame,
+                               'last_frame': last_frame, 'fps': fps, 'preset': preset, 'version': SEGMENT_RENDERER_VERSION})
+            segments.append({'first_frame': first_frame, 'last_frame': last_frame, 'key': key, 'schema': segment_schema})
+        return segments
+
+    def get_path(self, segment: Dict[str, Any]) -> str:
+        return os.path.join(self.store_dir, f"{segment['key']}.mp4")
+
+    def is_rendered(self, segment: Dict[str, Any]) -> bool:
+        path = self.get_path(segment)
+        if not os.path.exists(path):
+            return False
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True
+
+    def evict(self, keep: List[str] = ()):
+        keep = {os.path.basename(path) for path in keep}
+        entries = []
+        for filename in os.listdir(self.store_dir):
+            # Segments being written are never evicted
+            if not filename.endswith('.mp4') or '.partial' in filename:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.store_dir, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if filename in keep:
+                continue
+            try:
+                os.remove(os.path.join(self.store_dir, filename))
+            except FileNotFoundError:
+                pass
+            total_size -= size
@@ -0,0 +1,93 @@
+import gc
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from shortGPT.editing_framework.multi_output import MultiOutputVideoWriter, check_output_specs
+from shortGPT.editing_utils.handle_videos import concat_videos
+
+worker_clip = None
+
+
+def init_frame_worker(build_clip, *build_args):
+    """Builds the clip of a worker process, every worker has its own media readers"""
+    global worker_clip
+    worker_clip = build_clip(*build_args)
+
+
+def get_frame_ranges(n_frames, n_workers) -> List[Tuple[int, int]]:
+    """Cuts frames [0, n_frames[ in one contiguous range per worker"""
+    boundaries = [round(i * n_frames / n_workers) for i in range(n_workers + 1)]
+    return [(first_frame, last_frame) for first_frame, last_frame in zip(boundaries, boundaries[1:]) if last_frame > first_frame]
+
+
+def render_frame_range(first_frame, last_frame, fps, size, outputs: List[Dict[str, Any]], preset='medium'):
+    """
+    Worker task: composites frames [first_frame, last_frame[ of the worker clip in order, so that the readers of
+    the worker decode the sources of its range once, and encodes them into every output spec, without audio.
+    """
+    if len(outputs) > 1:
+        writer = MultiOutputVideoWriter(size, fps, outputs, preset=preset)
+    else:
+        writer = FFMPEG_VideoWriter(outputs[0]['output_file'], size, fps, codec='libx264', preset=preset)
+    with writer:
+        for frame_index in range(first_frame, last_frame):
+            frame = worker_clip.get_frame(frame_index / fps)
+            if frame.dtype != 'uint8':
+                frame = frame.astype('uint8')
+            writer.write_frame(frame)
+
+
+def start_workers(pool: ProcessPoolExecutor):
+    """
+    Forks the worker processes of the pool now. A process forked while another thread of its parent holds a lock
+    (an ffmpeg pipe write, logging, numpy) inherits the lock held forever, so every worker is started before
+    write_video_pipelined calls on_workers_started, and before the pool starts its own manager thread.
+    Unreachable clips are collected first: the workers would inherit the pipes of their ffmpeg readers, and a
+    reader collected later, in any thread, would wait forever for an ffmpeg process nobody stops reading from.
+    """
+    gc.collect()
+    # With the fork start method, submitting the first task forks all the workers, before the manager thread of the pool
+    pool.submit(os.getpid)
+
+
+def write_video_pipelined(build_clip, build_args, output_file, size, n_frames, fps, n_workers, mp_context,
+                          preset='medium', audio_file=None, logger=None, on_workers_started=None, outputs: List[Dict[str, Any]] = None):
+    """
+    Renders frames [0, n_frames[ of the clip returned by build_clip(*build_args) with a pool of look-ahead worker
+    processes. Each worker composites one contiguous range of frames and encodes it, and the ranges are joined
+    without re-encoding them, so no source is decoded by more than one worker for the same frames.
+    `on_workers_started` is called once the workers are compositing, to do other work (like mixing the audio)
+    concurrently; it returns the audio file muxed with the video. The `outputs` specs are encoded along with
+    output_file, from the same frames, by a MultiOutputVideoWriter.
+    The workers are forked before on_workers_started is called, see start_workers.
+    """
+    outputs = [{'output_file': output_file}] + (outputs or [])
+    check_output_specs(outputs)
+    frame_ranges = get_frame_ranges(n_frames, n_workers)
+    work_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        range_outputs = [[dict(output, output_file=os.path.join(work_dir, f"range_{i:04d}_{j}.mp4")) for j, output in enumerate(outputs)]
+                         for i in range(len(frame_ranges))]
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context,
+                                 initializer=init_frame_worker, initargs=(build_clip, *build_args)) as pool:
+            start_workers(pool)
+            futures = [pool.submit(render_frame_range, first_frame, last_frame, fps, size, specs, preset)
+                       for (first_frame, last_frame), specs in zip(frame_ranges, range_outputs)]
+            if on_workers_started:
+                audio_file = on_workers_started()
+            if logger:
+                logger(t__total=len(futures))
+            for done, future in enumerate(as_completed(futures)):
+                future.result()
+                if logger:
+                    logger(t__index=done + 1)
+        for j, output in enumerate(outputs):
+            concat_videos([specs[j]['output_file'] for specs in range_outputs], output['output_file'], audio_file=audio_file, audio_codec='copy')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return output_file
@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from typing import Any, Dict
+
+
+class RenderProfiler:
+    """
+    Records where the frames of a render spend their time. The frame functions of every layer are wrapped,
+    per schema asset key and per stage (the decoded source, then each pixel action), and each call records
+    its duration minus the duration of the wrapped calls it made, so that nested stages are never counted twice.
+    """
+
+    def __init__(self):
+        self.assets = {}
+        self.current_asset = None
+        self.totals = {'compositing': 0.0, 'encoder': 0.0, 'setup': 0.0}
+        self.n_frames = 0
+        # Time spent in the wrapped calls made by each running call
+        self.children_time = []
+
+    def set_asset(self, asset_key: str, asset_type: str):
+        self.current_asset = asset_key
+        self.assets.setdefault(asset_key, {'type': asset_type, 'stages': {}, 'layer_stage': None})
+
+    def get_stage_stats(self, stage: str) -> Dict[str, Any]:
+        stages = self.assets[self.current_asset]['stages']
+        return stages.setdefault(stage, {'time': 0.0, 'calls': 0, 'allocated_bytes': 0})
+
+    def wrap_frame_function(self, make_frame, stats: Dict[str, Any]):
+        def profiled_make_frame(t):
+            self.children_time.append(0.0)
+            start = time.perf_counter()
+            try:
+                frame = make_frame(t)
+            finally:
+                elapsed = time.perf_counter() - start
+                children_time = self.children_time.pop()
+                if self.children_time:
+                    self.children_time[-1] += elapsed
+            stats['time'] += elapsed - children_time
+            stats['calls'] += 1
+            stats['allocated_bytes'] += getattr(frame, 'nbytes', 0)
+            return frame
+        return profiled_make_frame
+
+    def wrap_clip(self, clip, stage: str):
+        """Wraps the frame function of a clip of the current asset, and of its mask under `<stage>_mask`"""
+        if self.current_asset is None:
+            return clip
+        clip = clip.copy()
+        # An action applied twice (like the two crops of the background) is recorded as two stages
+        stages = self.assets[self.current_asset]['stages']
+        stage_name, n = stage, 1
+        while stage in stages:
+            n += 1
+            stage = f"{stage_name}_{n}"
+        # Stages are wrapped from the source outwards, the last one gives the frames of the layer
+        self.assets[self.current_asset]['layer_stage'] = stage
+        clip.make_frame = self.wrap_frame_function(clip.make_frame, self.get_stage_stats(stage))
+        if clip.mask is not None:
+            clip.mask = clip.mask.copy()
+            clip.mask.make_frame = self.wrap_frame_function(clip.mask.make_frame, self.get_stage_stats(f"{stage}_mask"))
+        return clip
+
+    def measure(self, total: str):
+        """Context manager adding the duration of its block to one of the totals (setup, compositing or encoder)"""
+        return ProfiledBlock(self.totals, total)
+
+    def get_report(self, wall_time: float) -> Dict[str, Any]:
+        assets = {}
+        for asset_key, asset in self.assets.items():
+            stages = asset['stages']
+            assets[asset_key] = {
+                'type': asset['type'],
+                'time': sum(stage['time'] for stage in stages.values()),
+                'calls': stages[asset['layer_stage']]['calls'] if asset['layer_stage'] else 0,
+                'allocated_bytes': sum(stage['allocated_bytes'] for stage in stages.values()),
+                'stages': stages,
+            }
+        layers_time = sum(asset['time'] for asset in assets.values())
+        for asset in assets.values():
+            asset['share'] = asset['time'] / wall_time if wall_time else 0
+        return {
+            'wall_time': wall_time,
+            'n_frames': self.n_frames,
+            'render_fps': self.n_frames / wall_time if wall_time else 0,
+            'compositing': {'time': self.totals['compositing'], 'share': self.totals['compositing'] / wall_time if wall_time else 0},
+            # Compositing time not spent in the frame functions of the layers: blitting and masking
+            'blending': {'time': max(self.totals['compositing'] - layers_time, 0)},
+            'encoder': {'time': self.totals['encoder'], 'share': self.totals['encoder'] / wall_time if wall_time else 0},
+            # Building the clips and mixing the soundtrack
+            'setup': {'time': self.totals['setup']},
+            'assets': dict(sorted(assets.items(), key=lambda item: item[1]['time'], reverse=True)),
+        }
+
+    def write_report(self, output_file: str, wall_time: float, **info) -> str:
+        """Writes the report next to the rendered file, as `<name>.profile.json`"""
+        report_file = os.path.splitext(output_file)[0] + '.profile.json'
+        report = {'output_file': output_file, **info, **self.get_report(wall_time)}
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report_file
+
+
+class ProfiledBlock:
+
+    def __init__(self, totals: Dict[str, float], total: str):
+        self.totals = totals
+        self.total = total
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.totals[self.total] += time.perf_counter() - self.start
+        return False
@@ -0,0 +1,181 @@
+import copy
+import json
+from typing import Any, Dict, List, Optional
+
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+from shortGPT.editing_framework.geometry import apply_geometric_action, resolve_position
+from shortGPT.editing_framework.schema_utils import TIME_ACTIONS, get_clip_timing, is_static_asset
+
+# Layers closer than this, in seconds, are back-to-back
+TIME_EPSILON = 1e-3
+# Actions after which a video layer still covers its box with opaque pixels
+OPAQUE_ACTIONS = TIME_ACTIONS | {'crop', 'resize', 'screen_position'}
+
+
+def get_time_action(asset: Dict[str, Any], action_type: str) -> Optional[Dict[str, Any]]:
+    return next((action for action in asset['actions'] if action['type'] == action_type), None)
+
+
+def has_simple_timing(asset: Dict[str, Any]) -> bool:
+    """Whether the window of the asset is given by one set_time_start and one set_time_end action"""
+    time_actions = [action['type'] for action in asset['actions'] if action['type'] in TIME_ACTIONS]
+    return sorted(time_actions) == ['set_time_end', 'set_time_start']
+
+
+def get_audio_duration(schema: Dict[str, Any]) -> Optional[float]:
+    """Returns the duration of the soundtrack, which is the duration of the rendered video, or None if it can't be known"""
+    ends = []
+    for asset in schema['audio_assets'].values():
+        try:
+            infos = probe_media(asset['parameters']['url'])
+        except Exception:
+            # Media that can't be probed here, like remote files
+            return None
+        timing = get_clip_timing(asset['actions'], infos['duration'])
+        loop_background_music = get_time_action(asset, 'loop_background_music')
+        if loop_background_music:
+            # Like the mixers, the looped track starts with the video and lasts the target duration
+            timing['end'] = loop_background_music['param']
+        ends.append(timing['end'])
+    if not ends or None in ends:
+        return None
+    return max(ends)
+
+
+def get_set_time_ends(visual_assets: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The set_time_end actions with a constant time, the ones clamp_to_duration can shorten"""
+    set_time_ends = [get_time_action(asset, 'set_time_end') for asset in visual_assets.values()]
+    return [action for action in set_time_ends if action and isinstance(action['param'], (int, float))]
+
+
+def clamp_to_duration(visual_assets: Dict[str, Any], duration: float):
+    for set_time_end in get_set_time_ends(visual_assets):
+        if set_time_end['param'] > duration:
+            set_time_end['param'] = duration
+
+
+def drop_empty_layers(visual_assets: Dict[str, Any]) -> Dict[str, Any]:
+    """Drops the layers that end before they start. The lowest layer is kept, it gives its size to the video."""
+    kept = {}
+    for i, (asset_key, asset) in enumerate(visual_assets.items()):
+        timing = get_clip_timing(asset['actions'])
+        if i == 0 or timing['end'] is None or timing['end'] - timing['start'] > TIME_EPSILON:
+            kept[asset_key] = asset
+    return kept
+
+
+def overlaps(timing: Dict[str, Optional[float]], start: float, end: float) -> bool:
+    return timing['start'] < end - TIME_EPSILON and (timing['end'] is None or timing['end'] > start + TIME_EPSILON)
+
+
+def merge_repeated_layers(visual_assets: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges static layers showing the same content (captions with the same text, images with the same URL) whose
+    windows touch or overlap into one layer spanning their windows. A layer is only merged into a layer composited
+    before it, and when no layer composited between them is visible during its window, so that every frame stacks
+    the same contents in the same order.
+    """
+    asset_keys = list(visual_assets)
+    positions = {asset_key: i for i, asset_key in enumerate(asset_keys)}
+    timings = {asset_key: get_clip_timing(asset['actions']) for asset_key, asset in visual_assets.items()}
+    groups = {}
+    for asset_key, asset in visual_assets.items():
+        if not (is_static_asset(asset) and has_simple_timing(asset)):
+            continue
+        content = {'type': asset['type'], 'z': asset['z'], 'parameters': asset['parameters'],
+                   'actions': [action for action in asset['actions'] if action['type'] not in TIME_ACTIONS]}
+        groups.setdefault(json.dumps(content, sort_keys=True, default=str), []).append(asset_key)
+    merged_keys = set()
+    for group_keys in groups.values():
+        windows = sorted(((timings[key], key) for key in group_keys), key=lambda window: window[0]['start'])
+        current = None
+        for timing, asset_key in windows:
+            if current is not None and timing['start'] <= current_end + TIME_EPSILON and positions[current] < positions[asset_key] \
+                    and not any(overlaps(timings[key], timing['start'], timing['end'])
+                                for key in asset_keys[positions[current] + 1:positions[asset_key]]):
+                current_end = max(current_end, timing['end'])
+                get_time_action(visual_assets[current], 'set_time_end')['param'] = current_end
+                merged_keys.add(asset_key)
+            else:
+                current, current_end = asset_key, timing['end']
+    return {asset_key: asset for asset_key, asset in visual_assets.items() if asset_key not in merged_keys}
+
+
+def get_layer_box(asset: Dict[str, Any], frame_size) -> Dict[str, Any]:
+    """Probes a video or image asset, and returns its size and position after its actions, and its duration"""
+    infos = probe_media(asset['parameters']['url'])
+    size = (infos['width'], infos['height'])
+    pos, relative = (0, 0), False
+    for action in asset['actions']:
+        if action['type'] == 'screen_position':
+            pos, relative = action['param']['pos'], action['param'].get('relative', False)
+        size = apply_geometric_action(size, action)
+    x, y = resolve_position(pos, frame_size or size, size, relative=relative)
+    return {'x': x, 'y': y, 'size': size, 'duration': infos['duration'] if asset['type'] == 'video' else None}
+
+
+def is_opaque_video(asset: Dict[str, Any]) -> bool:
+    if asset['type'] != 'video':
+        return False
+    for action in asset['actions']:
+        if action['type'] not in OPAQUE_ACTIONS:
+            return False
+        param = action['param']
+        values = param.values() if isinstance(param, dict) else [param]
+        if any(callable(value) for value in values):
+            return False
+    return True
+
+
+def remove_hidden_layers(visual_assets: Dict[str, Any]) -> Dict[str, Any]:
+    """Removes the layers that are under an opaque full-frame video during their whole window"""
+    asset_keys = list(visual_assets)
+    if not asset_keys or visual_assets[asset_keys[0]]['type'] not in ('video', 'image'):
+        return visual_assets
+    try:
+        frame_size = get_layer_box(visual_assets[asset_keys[0]], None)['size']
+        covers = []
+        for i, asset_key in enumerate(asset_keys):
+            asset = visual_assets[asset_key]
+            if i == 0 or not is_opaque_video(asset):
+                continue
+            box = get_layer_box(asset, frame_size)
+            covers_frame = box['x'] <= 0 and box['y'] <= 0 and box['x'] + box['size'][0] >= frame_size[0] and box['y'] + box['size'][1] >= frame_size[1]
+            timing = get_clip_timing(asset['actions'], box['duration'])
+            if covers_frame and timing['end'] is not None:
+                covers.append((i, timing['start'], timing['end']))
+    except Exception:
+        # Media that can't be probed here, like remote files, are never treated as covering the frame
+        return visual_assets
+    hidden = set()
+    for i, asset_key in enumerate(asset_keys):
+        asset = visual_assets[asset_key]
+        # Videos with their soundtrack are kept for their audio
+        if i == 0 or (asset['type'] == 'video' and asset['parameters'].get('audio', True)):
+            continue
+        timing = get_clip_timing(asset['actions'])
+        if timing['end'] is None:
+            continue
+        if any(cover_index > i and start <= timing['start'] + TIME_EPSILON and timing['end'] <= end + TIME_EPSILON
+               for cover_index, start, end in covers):
+            hidden.add(asset_key)
+    return {asset_key: asset for asset_key, asset in visual_assets.items() if asset_key not in hidden}
+
+
+def optimize_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a copy of the schema without the layers that cost work on every frame without changing the video:
+    windows past the end of the soundtrack are clamped, empty layers dropped, repeated captions and images merged,
+    and layers hidden under an opaque full-frame video removed.
+    """
+    schema = copy.deepcopy(schema)
+    visual_assets = dict(sorted(schema['visual_assets'].items(), key=lambda item: item[1]['z']))
+    # The soundtrack is only probed when a window could end after it
+    duration = get_audio_duration(schema) if get_set_time_ends(visual_assets) else None
+    if duration is not None:
+        clamp_to_duration(visual_assets, duration)
+    visual_assets = drop_empty_layers(visual_assets)
+    visual_assets = merge_repeated_layers(visual_assets)
+    visual_assets = remove_hidden_layers(visual_assets)
+    schema['visual_assets'] = visual_assets
+    return schema
@@ -0,0 +1,130 @@
+import copy
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+TIME_ACTIONS = {'set_time_start', 'set_time_end', 'subclip'}
+# Actions after which an image or a text still shows the same pixels at the same position during its whole lifetime
+STATIC_ACTIONS = TIME_ACTIONS | {'screen_position', 'resize', 'crop', 'auto_resize_image', 'normalize_image', 'green_screen'}
+# Pixel-valued parameters of the editing actions and of the text assets
+CROP_PARAMS = ('x1', 'y1', 'x2', 'y2', 'width', 'height', 'x_center', 'y_center')
+TEXT_PARAMS = ('fontsize', 'stroke_width', 'kerning', 'interline')
+
+
+def get_clip_timing(actions: List[Dict[str, Any]], duration: Optional[float] = None) -> Dict[str, Optional[float]]:
+    """
+    Replays the set_time_start / set_time_end / subclip actions of an asset the way moviepy applies them.
+    Returns the start and end of the clip on the timeline, its duration and the offset at which
+    the source media is read.
+    """
+    start, end, offset = 0, duration, 0
+    for action in actions:
+        if action['type'] == 'set_time_start':
+            start = action['param']
+            if duration is not None:
+                end = start + duration
+            elif end is not None:
+                duration = end - start
+        elif action['type'] == 'set_time_end':
+            end = action['param']
+            duration = end - start
+        elif action['type'] == 'subclip':
+            t_start = action['param'].get('t_start', 0) or 0
+            t_end = action['param'].get('t_end')
+            if t_start < 0 and duration is not None:
+                t_start = duration + t_start
+            if t_end is None:
+                t_end = duration
+            elif t_end < 0 and duration is not None:
+                t_end = duration + t_end
+            offset += t_start
+            if t_end is not None:
+                duration = t_end - t_start
+                end = start + duration
+    return {'start': start, 'end': end, 'duration': duration, 'offset': offset}
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    """Stable hash of a schema, or of any JSON-like part of it"""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def is_static_asset(asset: Dict[str, Any]) -> bool:
+    """Whether the pixels and the position of a visual asset don't change between its start and its end"""
+    if asset['type'] not in ('image', 'text'):
+        return False
+    for action in asset['actions']:
+        if action['type'] not in STATIC_ACTIONS:
+            return False
+        param = action['param']
+        values = param.values() if isinstance(param, dict) else [param]
+        if any(callable(value) for value in values):
+            return False
+    return True
+
+
+def slice_schema(schema: Dict[str, Any], t_start: float, t_end: float) -> Dict[str, Any]:
+    """
+    Returns the visual part of the schema restricted to the assets that can be visible between t_start and t_end.
+    The lowest asset is always kept since it gives its size to the rendered video.
+    """
+    visual_assets = dict(sorted(schema['visual_assets'].items(), key=lambda item: item[1]['z']))
+    sliced_assets = {}
+    for i, (asset_key, asset) in enumerate(visual_assets.items()):
+        timing = get_clip_timing(asset['actions'])
+        starts_after = timing['start'] >= t_end
+        ends_before = timing['end'] is not None and timing['end'] <= t_start
+        if i == 0 or not (starts_after or ends_before):
+            sliced_assets[asset_key] = asset
+    return {'visual_assets': sliced_assets, 'audio_assets': {}}
+
+
+def scale_value(value, factor):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value * factor
+    if isinstance(value, (list, tuple)):
+        return [scale_value(item, factor) for item in value]
+    return value
+
+
+def scale_action(action: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    param = action['param']
+    if action['type'] == 'crop':
+        param = {k: scale_value(v, factor) if k in CROP_PARAMS else v for k, v in param.items()}
+    elif action['type'] == 'resize':
+        param = dict(param)
+        # A scalar newsize is relative to the clip, and stays the same
+        if isinstance(param.get('newsize'), (list, tuple)):
+            param['newsize'] = scale_value(param['newsize'], factor)
+        for key in ('width', 'height'):
+            if param.get(key) is not None:
+                param[key] = scale_value(param[key], factor)
+    elif action['type'] in ('auto_resize_image', 'normalize_image'):
+        param = {k: scale_value(v, factor) if k in ('maxWidth', 'maxHeight') else v for k, v in param.items()}
+    elif action['type'] == 'screen_position' and not param.get('relative'):
+        param = dict(param, pos=scale_value(param['pos'], factor) if not isinstance(param['pos'], str) else param['pos'])
+    return dict(action, param=param)
+
+
+def scale_schema(schema: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    """
+    Returns a copy of the schema rendering the same video at `factor` times its resolution.
+    Video and image sources are shrunk first, then every pixel-valued crop / resize / position / text parameter is scaled.
+    """
+    schema = copy.deepcopy(schema)
+    for asset in schema['visual_assets'].values():
+        actions = [scale_action(action, factor) for action in asset['actions']]
+        if asset['type'] in ('video', 'image'):
+            actions.insert(0, {'type': 'resize', 'param': {'newsize': factor}})
+        elif asset['type'] == 'text':
+            parameters = asset['parameters']
+            for key in TEXT_PARAMS:
+                if parameters.get(key) is not None:
+                    parameters[key] = scale_value(parameters[key], factor)
+            # Keeps thin outlines visible at low resolutions
+            if parameters.get('stroke_width'):
+                parameters['stroke_width'] = max(parameters['stroke_width'], 1)
+            if parameters.get('size') is not None:
+                parameters['size'] = [int(value * factor) if value else value for value in parameters['size']]
+        asset['actions'] = actions
+    return schema
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from shortGPT.editing_framework.text_rendering import find_font_file
+
+TEXT_CACHE_DIR = ".editing_assets/text_cache/"
+TEXT_CACHE_MAX_SIZE = 512 * 1024 * 1024
+# Bump when render_text changes its output, so that stale rasters are never reused
+TEXT_RENDERER_VERSION = 1
+
+
+class TextRasterCache:
+    """
+    On-disk cache of rendered text rasters, stored as RGBA PNGs named after the hash of the text parameters.
+    The least recently used rasters are evicted when the cache grows over its size budget.
+    """
+
+    def __init__(self, cache_dir=TEXT_CACHE_DIR, max_size=TEXT_CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_key(self, text_params: Dict[str, Any]) -> str:
+        font = text_params.get('font', 'Courier')
+        key_data = {
+            'params': text_params,
+            # The resolved font file is part of the key, so installing a font invalidates its fallback rasters
+            'font_file': find_font_file(font) if font else None,
+            'version': TEXT_RENDERER_VERSION,
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def get(self, text_params: Dict[str, Any]) -> Optional[np.ndarray]:
+        path = self.get_path(self.get_key(text_params))
+        try:
+            with Image.open(path) as image:
+                raster = np.array(image.convert('RGBA'))
+        except (FileNotFoundError, OSError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return raster
+
+    def put(self, text_params: Dict[str, Any], raster: np.ndarray) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(self.get_key(text_params))
+        # Written next to its final path then renamed, so that concurrent renders never read a partial file.
+        # The .tmp suffix keeps partial files out of the eviction of other processes
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                Image.fromarray(raster, 'RGBA').save(temp_file, format='PNG', compress_level=1)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+        return path
+
+    def evict(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.png'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def get_or_render(self, text_params: Dict[str, Any], render) -> np.ndarray:
+        raster = self.get(text_params)
+        if raster is None:
+            raster = render(**text_params)
+            self.put(text_params, raster)
+        return raster
@@ -0,0 +1,199 @@
+import math
+import os
+import platform
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+REGULAR_STYLES = {'regular', 'normal', 'book', 'roman'}
+FALLBACK_FONTS = ['DejaVuSans-Bold.ttf', 'DejaVuSans.ttf', 'arialbd.ttf', 'Arial Bold.ttf', 'arial.ttf', 'Arial.ttf']
+# ImageMagick's default pointsize, used when neither a fontsize nor a box to fit the text in are given
+DEFAULT_FONTSIZE = 12
+# Parameters of a text asset passed on to TextClip / render_text
+TEXT_CLIP_KEYS = ('txt', 'fontsize', 'font', 'color', 'stroke_width', 'stroke_color', 'size', 'kerning', 'method', 'align')
+
+
+def get_font_directories() -> List[str]:
+    home = os.path.expanduser('~')
+    if platform.system() == 'Windows':
+        return [os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts'),
+                os.path.join(os.environ.get('LOCALAPPDATA', home), 'Microsoft', 'Windows', 'Fonts')]
+    if platform.system() == 'Darwin':
+        return ['/System/Library/Fonts', '/Library/Fonts', os.path.join(home, 'Library', 'Fonts')]
+    return ['/usr/share/fonts', '/usr/local/share/fonts', os.path.join(home, '.fonts'), os.path.join(home, '.local', 'share', 'fonts')]
+
+
+def normalize_font_name(name: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+@lru_cache(maxsize=None)
+def get_font_index() -> Dict[str, str]:
+    """
+    Maps the normalized ImageMagick-style names of the installed fonts ("Calibri-Bold", "Arial") to their font files.
+    Fonts are indexed by family and style as well as by file name.
+    """
+    index = {}
+    for directory in get_font_directories():
+        for root, _, filenames in os.walk(directory):
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(FONT_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    family, style = ImageFont.truetype(path, DEFAULT_FONTSIZE).getname()
+                except Exception:
+                    continue
+                names = [f"{family}-{style}", os.path.splitext(filename)[0]]
+                if (style or '').lower() in REGULAR_STYLES:
+                    names.append(family)
+                for name in names:
+                    index.setdefault(normalize_font_name(name), path)
+    return index
+
+
+@lru_cache(maxsize=None)
+def find_font_file(font: str) -> Optional[str]:
+    """Returns the font file of a font given by path or by ImageMagick name, or None if it isn't installed"""
+    if os.path.isfile(font):
+        return font
+    return get_font_index().get(normalize_font_name(font))
+
+
+@lru_cache(maxsize=None)
+def load_font(font: str, fontsize: int) -> ImageFont.FreeTypeFont:
+    font_file = find_font_file(font)
+    if font_file:
+        return ImageFont.truetype(font_file, fontsize)
+    for fallback in FALLBACK_FONTS:
+        try:
+            font_object = ImageFont.truetype(fallback, fontsize)
+            print(f"Font '{font}' was not found, using {fallback} instead")
+            return font_object
+        except OSError:
+            continue
+    raise FileNotFoundError(f"Font '{font}' was not found, and no fallback font is installed")
+
+
+def get_gravity(align: Optional[str]):
+    """Splits an ImageMagick gravity (center, West, NorthEast...) into its horizontal and vertical alignments"""
+    align = (align or 'center').lower()
+    horizontal = 'left' if 'west' in align else 'right' if 'east' in align else 'center'
+    vertical = 'top' if 'north' in align else 'bottom' if 'south' in align else 'center'
+    return horizontal, vertical
+
+
+def measure_line(font: ImageFont.FreeTypeFont, line: str, kerning: float) -> float:
+    if not kerning:
+        return font.getlength(line)
+    return sum(font.getlength(char) for char in line) + kerning * max(len(line) - 1, 0)
+
+
+def wrap_text(font: ImageFont.FreeTypeFont, txt: str, max_width: float, kerning: float) -> List[str]:
+    """Breaks the text in lines fitting max_width, at word boundaries like ImageMagick's caption: method"""
+    lines = []
+    for paragraph in txt.split('\n'):
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f"{line} {word}" if line else word
+            if line and measure_line(font, candidate, kerning) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def layout_text(txt: str, font: ImageFont.FreeTypeFont, size, method: str, kerning: float):
+    if method == 'caption' and size is not None and size[0]:
+        return wrap_text(font, txt, size[0], kerning)
+    return txt.split('\n')
+
+
+def fit_fontsize(txt: str, font: str, size, method: str, kerning: float, stroke: int, interline: int) -> int:
+    """Largest fontsize for which the text fits the given box, as ImageMagick does when no pointsize is given"""
+    def fits(fontsize):
+        font_object = load_font(font, fontsize)
+        lines = layout_text(txt, font_object, size, method, kerning)
+        width, height = get_text_block_size(font_object, lines, kerning, stroke, interline)
+        return (not size[0] or width <= size[0]) and (not size[1] or height <= size[1])
+    low, high = 1, 1000
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def get_line_height(font: ImageFont.FreeTypeFont, interline: int) -> int:
+    ascent, descent = font.getmetrics()
+    return ascent + descent + interline
+
+
+def get_text_block_size(font: ImageFont.FreeTypeFont, lines: List[str], kerning: float, stroke: int, interline: int):
+    width = max(measure_line(font, line, kerning) for line in lines) + 2 * stroke
+    height = len(lines) * get_line_height(font, interline) - interline + 2 * stroke
+    return math.ceil(width), math.ceil(height)
+
+
+def get_text_clip_params(text_params: Dict) -> Dict:
+    """Returns the TextClip parameters of a text asset, whose text is given as `text`"""
+    if not (any(key in text_params for key in ['text', 'fontsize', 'size'])):
+        raise Exception('You must include at least a size or a fontsize to determine the size of your text')
+    text_params = {**text_params, 'txt': text_params['text']}
+    return {k: text_params[k] for k in TEXT_CLIP_KEYS if k in text_params}
+
+
+def render_text(txt, fontsize=None, font='Courier', color='black', stroke_width=1, stroke_color=None, size=None,
+                kerning=None, method='label', align='center', interline=None) -> np.ndarray:
+    """
+    Rasterizes text in-process with Pillow / FreeType, taking the same parameters as moviepy's TextClip.
+    Returns the text as an RGBA array on a transparent background.
+    """
+    kerning = kerning or 0
+    interline = interline or 0
+    stroke = int(round(stroke_width)) if stroke_color is not None and stroke_width else 0
+    if fontsize is None:
+        fontsize = fit_fontsize(txt, font, size, method, kerning, stroke, interline) if size is not None else DEFAULT_FONTSIZE
+    font_object = load_font(font, int(fontsize))
+    lines = layout_text(txt, font_object, size, method, kerning)
+    block_width, block_height = get_text_block_size(font_object, lines, kerning, stroke, interline)
+    width = size[0] if size is not None and size[0] else block_width
+    height = size[1] if size is not None and size[1] else block_height
+
+    horizontal, vertical = get_gravity(align)
+    top = {'top': 0, 'center': (height - block_height) / 2, 'bottom': height - block_height}[vertical] + stroke
+    # The fill and the stroke are drawn as separate coverage masks, then colored, to avoid dark fringes
+    # from blending antialiased edges with the transparent background
+    fill_mask = Image.new('L', (width, height), 0)
+    stroke_mask = Image.new('L', (width, height), 0)
+    fill_draw, stroke_draw = ImageDraw.Draw(fill_mask), ImageDraw.Draw(stroke_mask)
+    line_height = get_line_height(font_object, interline)
+    for i, line in enumerate(lines):
+        line_width = measure_line(font_object, line, kerning)
+        x = {'left': 0, 'center': (width - 2 * stroke - line_width) / 2, 'right': width - 2 * stroke - line_width}[horizontal] + stroke
+        y = top + i * line_height
+        chunks = [line] if not kerning else list(line)
+        for chunk in chunks:
+            fill_draw.text((x, y), chunk, font=font_object, fill=255)
+            if stroke:
+                stroke_draw.text((x, y), chunk, font=font_object, fill=255, stroke_width=stroke, stroke_fill=255)
+            x += font_object.getlength(chunk) + kerning
+
+    fill_alpha = np.asarray(fill_mask, dtype=np.float32)[:, :, np.newaxis] / 255
+    fill_rgb = np.array(ImageColor.getrgb(color)[:3], dtype=np.float32)
+    if stroke:
+        stroke_rgb = np.array(ImageColor.getrgb(stroke_color)[:3], dtype=np.float32)
+        rgb = fill_rgb * fill_alpha + stroke_rgb * (1 - fill_alpha)
+        alpha = np.maximum(np.asarray(stroke_mask), np.asarray(fill_mask))
+    else:
+        rgb = np.broadcast_to(fill_rgb, (height, width, 3))
+        alpha = np.asarray(fill_mask)
+    return np.dstack([np.round(rgb).astype(np.uint8), alpha.astype(np.uint8)])
@@ -0,0 +1,110 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+
+from shortGPT.editing_utils.handle_videos import concat_videos
+
+BACKGROUND_STORE_DIR = ".editing_assets/background_store/"
+# Every segment starts on a keyframe, so any run of consecutive segments can be joined without re-encoding
+BACKGROUND_SEGMENT_DURATION = 2
+BACKGROUND_FPS = 30
+BACKGROUND_SIZE = (1080, 1920)
+
+
+def get_store_path(name, store_dir=BACKGROUND_STORE_DIR):
+    return os.path.join(store_dir, name.replace(os.sep, "_"))
+
+def get_background_index(name, store_dir=BACKGROUND_STORE_DIR):
+    """Returns the index of an ingested background video, or None if it wasn't ingested"""
+    index_file = os.path.join(get_store_path(name, store_dir), "index.json")
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def ingest_background_video(name, video_url, store_dir=BACKGROUND_STORE_DIR, force=False):
+    """Transcodes a background video once to the short format (1080x1920, cropped at its center, 30 fps, without audio)
+    and stores it as segments of BACKGROUND_SEGMENT_DURATION seconds, each starting on a keyframe.
+    Args:
+        name (str): The name of the background video asset.
+        video_url (str): The local path or URL of the video.
+        store_dir (str): The directory of the background store.
+        force (bool): Ingests the video again even if it is already in the store.
+    """
+    store_path = get_store_path(name, store_dir)
+    if not force and get_background_index(name, store_dir):
+        return store_path
+    os.makedirs(store_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(dir=store_dir)
+    width, height = BACKGROUND_SIZE
+    segment_frames = BACKGROUND_SEGMENT_DURATION * BACKGROUND_FPS
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-i', video_url, '-an',
+           # Same framing as the CROP_1920x1080 editing step: the center of the video, scaled to the height of a short
+           '-vf', f'scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},fps={BACKGROUND_FPS}',
+           '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20', '-pix_fmt', 'yuv420p',
+           '-g', str(segment_frames), '-keyint_min', str(segment_frames), '-sc_threshold', '0',
+           # Half a frame of tolerance, or the muxer misses the keyframes landing just before a split time
+           '-f', 'segment', '-segment_time', str(BACKGROUND_SEGMENT_DURATION), '-segment_time_delta', str(0.5 / BACKGROUND_FPS),
+           '-reset_timestamps', '1',
+           '-segment_list', os.path.join(work_dir, 'segments.csv'), '-segment_list_type', 'csv',
+           os.path.join(work_dir, 'segment_%05d.mp4')]
+    try:
+        subprocess.run(cmd, check=True)
+        segments = []
+        with open(os.path.join(work_dir, 'segments.csv'), "r", encoding="utf-8") as f:
+            for line in f:
+                file, start, end = line.strip().rsplit(",", 2)
+                segments.append({'file': file, 'start': float(start), 'end': float(end)})
+        if not segments:
+            raise Exception(f"The background video {name} could not be segmented")
+        os.remove(os.path.join(work_dir, 'segments.csv'))
+        index = {'name': name, 'url': video_url, 'fps': BACKGROUND_FPS, 'size': list(BACKGROUND_SIZE),
+                 'duration': segments[-1]['end'], 'segments': segments}
+        # The index is written last, its presence means the segments are complete
+        with open(os.path.join(work_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        shutil.rmtree(store_path, ignore_errors=True)
+        os.replace(work_dir, store_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return store_path
+
+def ingest_background_videos(store_dir=BACKGROUND_STORE_DIR, force=False):
+    """Ingests every background video asset of the AssetDatabase into the background store"""
+    from shortGPT.config.asset_db import AssetDatabase
+    df = AssetDatabase.get_df()
+    for name in df[df['type'] == 'background video']['name']:
+        if force or not get_background_index(name, store_dir):
+            print(f"Ingesting the background video {name}")
+            ingest_background_video(name, AssetDatabase.get_asset_link(name), store_dir, force=force)
+
+def extract_random_clip_from_store(name, clip_duration, output_file, store_dir=BACKGROUND_STORE_DIR):
+    """Joins consecutive segments of an ingested background video, starting at a random segment, into a clip
+    of at least clip_duration seconds. The segments are copied without decoding them.
+    Args:
+        name (str): The name of the ingested background video asset.
+        clip_duration (float): The duration of the clip in seconds.
+        output_file (str): The output file path for the clip.
+    """
+    index = get_background_index(name, store_dir)
+    if index is None:
+        raise Exception(f"The background video {name} is not in the background store")
+    if index['duration'] < clip_duration:
+        raise Exception("Video too short")
+    # Same window as extract_random_clip_from_video: the start and end of the video are avoided when they can be
+    video_duration = index['duration']
+    start_time = video_duration*0.15 + random.random() * max(0.7*video_duration - clip_duration, 0)
+    start_time = min(start_time, video_duration - clip_duration)
+    # The clip starts with the segment containing start_time, which is never later than start_time
+    segments = [segment for segment in index['segments'] if segment['end'] > start_time]
+    first_start = segments[0]['start']
+    clip_segments = [segment for segment in segments if segment['start'] < first_start + clip_duration]
+    store_path = get_store_path(name, store_dir)
+    return concat_videos([os.path.join(store_path, segment['file']) for segment in clip_segments], output_file)
+
+
+if __name__ == '__main__':
+    ingest_background_videos()
@@ -34,8 +34,24 @@ def getYoutubeVideoLink(url):
         print("Failed getting video link from the following video/url", e.args[0])
     return None, None
 
-def extract_random_clip_from_video(video_url, video_duration, clip_duration , output_file):
-    print(video_url, video_duration, clip_duration , output_file)
+# Seconds of the video probed around the random start when looking for a keyframe
+KEYFRAME_SEARCH_WINDOW = 10
+
+def get_keyframe_times(video_url, start_time, end_time):
+    """Returns the times of the keyframes of the first video stream between start_time and end_time, read from the packet index"""
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-read_intervals', f'{max(start_time, 0)}%{end_time}',
+           '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_url]
+    output = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if output.returncode != 0:
+        return []
+    keyframe_times = []
+    for line in output.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframe_times.append(float(pts_time))
+    return sorted(keyframe_times)
+
+def extract_random_clip_from_video(video_url, video_duration, clip_duration , output_file, stream_copy=True):
     """Extracts a clip from a video using a signed URL.
     Args:
         video_url (str): The signed URL of the video.
@@ -43,19 +59,35 @@ def extract_random_clip_from_video(video_url, video_duration, clip_duration , ou
         start_time (int): The start time of the clip in seconds.
         clip_duration (int): The duration of the clip in seconds.
         output_file (str): The output file path for the extracted clip.
+        stream_copy (bool): Snaps the start of the clip to the nearest keyframe and copies the video stream
+            without re-encoding it. Falls back to a re-encode when no keyframe is found near the start.
     """
+    print(video_url, video_duration, clip_duration , output_file)
     if not video_duration:
         raise Exception("Could not get video duration")
     if not video_duration*0.7 > 120:
         raise Exception("Video too short")
     start_time = video_duration*0.15 + random.random()* (0.7*video_duration-clip_duration)
-    
-    (
-        ffmpeg
-        .input(video_url, ss=start_time, t=clip_duration)
-        .output(output_file, codec="libx264", preset="ultrafast")
-        .run()
-    )
+    keyframe_times = []
+    if stream_copy:
+        keyframe_times = [t for t in get_keyframe_times(video_url, start_time - KEYFRAME_SEARCH_WINDOW, start_time + KEYFRAME_SEARCH_WINDOW)
+                          if t + clip_duration <= video_duration]
+    if keyframe_times:
+        # The cut starts on a keyframe, so the copied stream decodes from its first frame
+        keyframe_time = min(keyframe_times, key=lambda t: abs(t - start_time))
+        (
+            ffmpeg
+            .input(video_url, ss=keyframe_time, t=clip_duration)
+            .output(output_file, c="copy", avoid_negative_ts="make_zero")
+            .run()
+        )
+    else:
+        (
+            ffmpeg
+            .input(video_url, ss=start_time, t=clip_duration)
+            .output(output_file, codec="libx264", preset="ultrafast")
+            .run()
+        )
     if not os.path.exists(output_file):
         raise Exception("Random clip failed to be written")
     return output_file
@@ -85,4 +117,29 @@ def get_aspect_ratio(video_file):
     else:
         sar = dar
     par = dar/sar
-    return dar
\ No newline at end of file
+    return dar
+
+def concat_videos(video_files, output_file, audio_file=None, audio_codec="aac"):
+    """Joins videos sharing the same encoding with ffmpeg's concat demuxer, without re-encoding them.
+    Args:
+        video_files (list): The videos to join, in order.
+        output_file (str): The output file path for the joined video.
+        audio_file (str): Optional soundtrack to encode in the joined video instead of the videos' audio.
+        audio_codec (str): The codec the soundtrack is encoded with, "copy" to keep its encoding.
+    """
+    list_file = output_file + ".concat.txt"
+    with open(list_file, "w", encoding="utf-8") as f:
+        for video_file in video_files:
+            escaped_path = os.path.abspath(video_file).replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_file]
+    if audio_file:
+        cmd += ['-i', audio_file, '-map', '0:v', '-map', '1:a', '-c:a', audio_codec]
+    cmd += ['-c:v', 'copy', output_file]
+    try:
+        subprocess.run(cmd, check=True)
+    finally:
+        os.remove(list_file)
+    if not os.path.exists(output_file):
+        raise Exception("Concatenated video failed to be written")
+    return output_file
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from shortGPT.editing_framework.geometry import auto_resized_size
+from shortGPT.editing_framework.media_cache import RemoteMediaCache, is_remote_url
+
+# maxWidth / maxHeight of the auto_resize_image action of the SHOW_IMAGE editing step
+IMAGE_BOX = (690, 690)
+INGEST_WORKERS = 8
+MIN_IMAGE_SIZE = 16
+
+
+def prepare_image(source_path, output_file, box=IMAGE_BOX):
+    """Decodes an image, fits it to the box like the auto_resize_image action, converts it to RGB (RGBA when it is
+    transparent) and writes it as a PNG. Raises an exception if the file isn't a usable image."""
+    with Image.open(source_path) as image:
+        image.load()
+        if image.width < MIN_IMAGE_SIZE or image.height < MIN_IMAGE_SIZE:
+            raise Exception(f"The image is too small ({image.width}x{image.height})")
+        transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+    image = image.resize(auto_resized_size(image.size, *box), Image.LANCZOS)
+    # Written next to its final path then renamed, so that a render never reads a partial file
+    fd, temp_path = tempfile.mkstemp(suffix='.png', dir=os.path.dirname(output_file))
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            image.save(temp_file, format='PNG', compress_level=1)
+        os.replace(temp_path, output_file)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return output_file
+
+def ingest_image(image_url, output_dir, box=IMAGE_BOX, media_cache: RemoteMediaCache = None):
+    """Downloads and prepares one image for rendering. Returns the path of the prepared image, or None if it can't be used."""
+    if not image_url:
+        return None
+    key = hashlib.sha256(f"{image_url}|{box[0]}x{box[1]}".encode('utf-8')).hexdigest()
+    output_file = os.path.join(output_dir, f"{key}.png")
+    if os.path.exists(output_file):
+        return output_file
+    try:
+        media_cache = media_cache or RemoteMediaCache()
+        source_path = media_cache.get_or_download(image_url) if is_remote_url(image_url) else image_url
+        return prepare_image(source_path, output_file, box)
+    except Exception as e:
+        print(f"Could not ingest the image {image_url} ({e}), it won't be shown")
+        return None
+
+def ingest_timed_images(timed_image_urls, output_dir, box=IMAGE_BOX, max_workers=INGEST_WORKERS):
+    """
+    Downloads, validates and prepares the images of (timing, image_url) pairs concurrently, so that rendering
+    them does no image work. Returns the (timing, image_path) pairs of the images that could be prepared.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    media_cache = RemoteMediaCache()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        image_paths = list(pool.map(lambda pair: ingest_image(pair[1], output_dir, box, media_cache), timed_image_urls))
+    return [(timing, image_path) for (timing, _), image_path in zip(timed_image_urls, image_paths) if image_path]
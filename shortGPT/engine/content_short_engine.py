@@ -11,7 +11,9 @@ from shortGPT.config.asset_db import AssetDatabase
 from shortGPT.config.languages import Language
 from shortGPT.editing_framework.editing_engine import (EditingEngine,
                                                        EditingStep)
-from shortGPT.editing_utils import captions, editing_images
+from shortGPT.editing_utils import captions, editing_images, image_ingestion
+from shortGPT.editing_utils.background_store import (extract_random_clip_from_store,
+                                                     get_background_index)
 from shortGPT.editing_utils.handle_videos import extract_random_clip_from_video
 from shortGPT.engine.abstract_content_engine import AbstractContentEngine
 from shortGPT.gpt import gpt_editing, gpt_translate, gpt_yt
@@ -83,13 +85,20 @@ class ContentShortEngine(AbstractContentEngine):
 
     def _generateImageUrls(self):
         if self._db_timed_image_searches:
-            self._db_timed_image_urls = editing_images.getImageUrlsTimed(
-                self._db_timed_image_searches)
+            # The images are downloaded and prepared once, the render reads them ready to be shown
+            self._db_timed_image_urls = image_ingestion.ingest_timed_images(
+                editing_images.getImageUrlsTimed(self._db_timed_image_searches), self.dynamicAssetDir + "images/")
 
     def _chooseBackgroundMusic(self):
         self._db_background_music_url = AssetDatabase.get_asset_link(self._db_background_music_name)
 
     def _chooseBackgroundVideo(self):
+        background_index = get_background_index(self._db_background_video_name)
+        if background_index:
+            # The video is read from the background store, its remote link isn't resolved
+            self._db_background_video_url = background_index['url']
+            self._db_background_video_duration = background_index['duration']
+            return
         self._db_background_video_url = AssetDatabase.get_asset_link(
             self._db_background_video_name)
         self._db_background_video_duration = AssetDatabase.get_asset_duration(
@@ -106,8 +115,14 @@ class ContentShortEngine(AbstractContentEngine):
                 self._db_audio_path, isVideo=False)
         if not self._db_background_trimmed:
             self.logger("Rendering short: (2/4) preparing background video asset...")
-            self._db_background_trimmed = extract_random_clip_from_video(
-                self._db_background_video_url, self._db_background_video_duration, self._db_voiceover_duration, self.dynamicAssetDir + "clipped_background.mp4")
+            if get_background_index(self._db_background_video_name):
+                # Ingested background videos are cut from local segments, already in the short format
+                self._db_background_trimmed = extract_random_clip_from_store(
+                    self._db_background_video_name, self._db_voiceover_duration, self.dynamicAssetDir + "clipped_background.mp4")
+                self._db_background_short_format = True
+            else:
+                self._db_background_trimmed = extract_random_clip_from_video(
+                    self._db_background_video_url, self._db_background_video_duration, self._db_voiceover_duration, self.dynamicAssetDir + "clipped_background.mp4")
 
     def _prepareCustomAssets(self):
         self.logger("Rendering short: (3/4) preparing custom assets...")
@@ -128,8 +143,7 @@ class ContentShortEngine(AbstractContentEngine):
             videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': self._db_background_music_url,
                                                                           'loop_background_music': self._db_voiceover_duration,
                                                                           "volume_percentage": 0.11})
-            videoEditor.addEditingStep(EditingStep.CROP_1920x1080, {
-                                       'url': self._db_background_trimmed})
+            self._addBackgroundVideoStep(videoEditor)
             videoEditor.addEditingStep(EditingStep.ADD_SUBSCRIBE_ANIMATION, {'url': AssetDatabase.get_asset_link('subscribe animation')})
 
             if self._db_watermark:
@@ -147,10 +161,19 @@ class ContentShortEngine(AbstractContentEngine):
                                                                         'set_time_start': timing[0],
                                                                         'set_time_end': timing[1]})
 
-            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None)
+            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None, resumable=True)
 
         self._db_video_path = outputPath
 
+    def _addBackgroundVideoStep(self, videoEditor: EditingEngine):
+        if self._db_background_short_format:
+            videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_VIDEO, {'url': self._db_background_trimmed,
+                                                                          'set_time_start': 0,
+                                                                          'set_time_end': self._db_voiceover_duration})
+        else:
+            videoEditor.addEditingStep(EditingStep.CROP_1920x1080, {
+                                       'url': self._db_background_trimmed})
+
     def _addYoutubeMetadata(self):
         if not os.path.exists('videos/'):
             os.makedirs('videos')
@@ -78,8 +78,7 @@ class RedditShortEngine(ContentShortEngine):
             videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': self._db_background_music_url,
                                                                           'loop_background_music': self._db_voiceover_duration,
                                                                           "volume_percentage": 0.11})
-            videoEditor.addEditingStep(EditingStep.CROP_1920x1080, {
-                                       'url': self._db_background_trimmed})
+            self._addBackgroundVideoStep(videoEditor)
             videoEditor.addEditingStep(EditingStep.ADD_SUBSCRIBE_ANIMATION, {'url': AssetDatabase.get_asset_link('subscribe animation')})
 
             if self._db_watermark:
@@ -99,7 +98,7 @@ class RedditShortEngine(ContentShortEngine):
                                                                         'set_time_start': timing[0],
                                                                         'set_time_end': timing[1]})
 
-            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None)
+            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None, resumable=True)
 
         self._db_video_path = outputPath
 
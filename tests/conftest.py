@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+requires_ffmpeg = pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')),
+                                     reason="ffmpeg and ffprobe are needed to render")
+
+VIDEO_SIZE = (64, 112)
+MEDIA_DURATION = 2
+MEDIA_FPS = 10
+# Not a whole number of frames at MEDIA_FPS
+SHORT_VOICE_DURATION = 1.95
+
+
+def run_ffmpeg(*args):
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', *args], check=True, stdin=subprocess.DEVNULL)
+
+
+def count_frames(video_file) -> int:
+    output = subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_frames', '-show_entries', 'stream=nb_read_frames',
+                             '-of', 'csv=p=0', str(video_file)], stdout=subprocess.PIPE, check=True, text=True)
+    return int(output.stdout.strip())
+
+
+@pytest.fixture(scope='session')
+def media_dir(tmp_path_factory):
+    """A short test pattern video, a sine voiceover and a PNG image, made with ffmpeg's lavfi sources"""
+    if not shutil.which('ffmpeg'):
+        pytest.skip("ffmpeg is needed to make the test media")
+    directory = tmp_path_factory.mktemp('media')
+    width, height = VIDEO_SIZE
+    run_ffmpeg('-f', 'lavfi', '-i', f"testsrc=size={width}x{height}:rate={MEDIA_FPS}:duration={MEDIA_DURATION}",
+               '-c:v', 'libx264', '-pix_fmt', 'yuv420p', str(directory / 'video.mp4'))
+    run_ffmpeg('-f', 'lavfi', '-i', f"sine=frequency=440:duration={MEDIA_DURATION}", str(directory / 'voice.wav'))
+    run_ffmpeg('-f', 'lavfi', '-i', f"sine=frequency=220:duration={SHORT_VOICE_DURATION}", str(directory / 'short_voice.wav'))
+    run_ffmpeg('-f', 'lavfi', '-i', "color=c=red:size=16x16", '-frames:v', '1', str(directory / 'image.png'))
+    return directory
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Runs the test in a temporary directory, so that the .editing_assets caches start empty"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_video_schema(media_dir, with_audio=True, voice='voice.wav'):
+    schema = {
+        'visual_assets': {
+            'background_video_0': {
+                'type': 'video', 'z': 0,
+                'parameters': {'url': str(media_dir / 'video.mp4'), 'audio': False},
+                'actions': [{'type': 'set_time_start', 'param': 0}, {'type': 'set_time_end', 'param': MEDIA_DURATION}],
+            },
+        },
+        'audio_assets': {},
+    }
+    if with_audio:
+        schema['audio_assets']['voiceover_0'] = {'type': 'audio', 'z': -1, 'parameters': {'url': str(media_dir / voice)}, 'actions': []}
+    return schema
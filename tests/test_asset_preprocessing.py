@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+from moviepy.editor import ColorClip
+
+from shortGPT.editing_framework.asset_preprocessing import KeyedVideoCache, make_keyed_clip, split_keyed_actions
+
+GREEN_SCREEN = {'type': 'green_screen', 'param': {'color': [52, 255, 20], 'thr': 100, 's': 5}}
+
+
+def make_green_clip(size=(16, 8), duration=0.5, fps=10):
+    clip = ColorClip(size, color=(52, 255, 20), duration=duration).set_mask(ColorClip(size, color=0.25, ismask=True, duration=duration))
+    clip.fps = fps
+    return clip
+
+
+def set_mtime(cache, key, mtime):
+    os.utime(os.path.join(cache.cache_dir, f"{key}.json"), (mtime, mtime))
+
+
+def test_split_keyed_actions():
+    timing = {'type': 'set_time_start', 'param': 1}
+    resize = {'type': 'resize', 'param': {'newsize': 0.5}}
+    assert split_keyed_actions([timing, resize, GREEN_SCREEN]) == ([resize, GREEN_SCREEN], [timing])
+    # Nothing to key, or a resize that changes over time
+    assert split_keyed_actions([timing, resize]) is None
+    assert split_keyed_actions([{'type': 'resize', 'param': {'newsize': lambda t: 1}}, GREEN_SCREEN]) is None
+
+
+def test_make_keyed_clip_uses_the_alpha_as_mask():
+    frames = np.zeros((2, 4, 4, 4), dtype=np.uint8)
+    frames[1, :, :, :3] = 200
+    frames[1, :, :, 3] = 255
+    clip = make_keyed_clip(frames, fps=10, duration=0.2)
+    assert clip.get_frame(0.15)[0, 0].tolist() == [200, 200, 200]
+    assert clip.mask.get_frame(0.05)[0, 0] == 0
+    assert clip.mask.get_frame(0.15)[0, 0] == 1
+    # Past the last frame, the last frame is held
+    assert clip.mask.get_frame(0.5)[0, 0] == 1
+
+
+def test_get_or_build_builds_once(tmp_path):
+    cache = KeyedVideoCache(cache_dir=str(tmp_path))
+    builds = []
+
+    def build_clip():
+        builds.append(1)
+        return make_green_clip()
+    first = cache.get_or_build('green.mp4', [GREEN_SCREEN], build_clip)
+    second = cache.get_or_build('green.mp4', [GREEN_SCREEN], build_clip)
+    assert len(builds) == 1
+    assert first.mask.get_frame(0.2)[0, 0] == pytest.approx(0.25, abs=1 / 255)
+    assert np.array_equal(first.get_frame(0.2), second.get_frame(0.2))
+
+
+def test_evicts_least_recently_loaded_assets(tmp_path):
+    cache = KeyedVideoCache(cache_dir=str(tmp_path))
+    keys = [cache.get_key(f'green_{i}.mp4', [GREEN_SCREEN]) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.build(key, make_green_clip())
+        set_mtime(cache, key, 1000 + i)
+    cache.load(keys[0])
+    asset_size = sum(os.path.getsize(os.path.join(tmp_path, f"{keys[0]}{extension}")) for extension in ('.npy', '.json'))
+    cache.max_size = 3 * asset_size
+    new_key = cache.get_key('green_3.mp4', [GREEN_SCREEN])
+    cache.build(new_key, make_green_clip())
+    assert cache.load(keys[1]) is None
+    assert not os.path.exists(os.path.join(tmp_path, f"{keys[1]}.npy"))
+    assert all(cache.load(key) is not None for key in (keys[0], keys[2], new_key))
+
+
+def test_eviction_keeps_the_asset_just_built_and_partial_files(tmp_path):
+    cache = KeyedVideoCache(cache_dir=str(tmp_path), max_size=0)
+    partial_file = tmp_path / 'tmpabc123.tmp'
+    partial_file.write_bytes(b'0' * 1024)
+    clip = cache.get_or_build('green.mp4', [GREEN_SCREEN], make_green_clip)
+    assert clip is not None
+    assert partial_file.exists()
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from conftest import MEDIA_DURATION, make_video_schema, requires_ffmpeg
+from shortGPT.editing_framework.audio_premix import premix_audio
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
+from shortGPT.editing_framework.editing_engine import EditingEngine, EditingStep
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+
+
+def add_music(schema, media_dir, actions):
+    schema['audio_assets']['background_music_0'] = {'type': 'audio', 'z': -1, 'parameters': {'url': str(media_dir / 'voice.wav')},
+                                                    'actions': actions}
+    return schema
+
+
+@requires_ffmpeg
+def test_premix_is_reused(media_dir, tmp_path):
+    schema = add_music(make_video_schema(media_dir), media_dir, [{'type': 'volume_percentage', 'param': 0.1}])
+    audio_file, duration = premix_audio(schema, cache_dir=str(tmp_path))
+    assert duration == pytest.approx(MEDIA_DURATION)
+    assert probe_media(audio_file)['has_audio']
+    mtime = os.path.getmtime(audio_file)
+    assert premix_audio(schema, cache_dir=str(tmp_path)) == (audio_file, duration)
+    assert os.path.getmtime(audio_file) == mtime
+    assert premix_audio(make_video_schema(media_dir), cache_dir=str(tmp_path))[0] != audio_file
+
+
+@requires_ffmpeg
+def test_background_music_step_is_premixed(media_dir, tmp_path):
+    # The step adds a normalize_audio action, which the moviepy mix ignores
+    engine = EditingEngine()
+    engine.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {'url': str(media_dir / 'voice.wav')})
+    engine.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': str(media_dir / 'short_voice.wav'),
+                                                             'loop_background_music': MEDIA_DURATION, 'volume_percentage': 0.11})
+    schema = engine.dumpEditingSchema()
+    assert any(action['type'] == 'normalize_audio' for asset in schema['audio_assets'].values() for action in asset['actions'])
+    audio_file, duration = premix_audio(schema, cache_dir=str(tmp_path))
+    assert duration == pytest.approx(MEDIA_DURATION)
+    assert probe_media(audio_file)['has_audio']
+
+
+def test_no_audio_assets():
+    assert premix_audio({'visual_assets': {}, 'audio_assets': {}}) is None
+
+
+@requires_ffmpeg
+def test_unknown_audio_action_raises_not_implemented(media_dir, tmp_path):
+    schema = add_music(make_video_schema(media_dir), media_dir, [{'type': 'fade_in', 'param': 1}])
+    with pytest.raises(NotImplementedError):
+        premix_audio(schema, cache_dir=str(tmp_path))
+
+
+@requires_ffmpeg
+def test_unknown_audio_action_is_mixed_by_moviepy(media_dir, workdir):
+    schema = add_music(make_video_schema(media_dir), media_dir, [{'type': 'fade_in', 'param': 1}])
+    engine = CoreEditingEngine()
+    video, audio_file = engine.build_video_and_soundtrack(schema)
+    assert audio_file is None
+    assert video.audio is not None
+    engine.readers.close()
+    output_file = str(workdir / 'out.mp4')
+    CoreEditingEngine().generate_video(schema, output_file, lookahead_workers=1)
+    assert probe_media(output_file)['has_audio']
+
+
+@requires_ffmpeg
+def test_evicts_least_recently_used_premixes(media_dir, tmp_path):
+    schemas = [add_music(make_video_schema(media_dir), media_dir, [{'type': 'volume_percentage', 'param': volume}])
+               for volume in (0.1, 0.2, 0.3)]
+    audio_files = []
+    for i, schema in enumerate(schemas):
+        audio_file, _ = premix_audio(schema, cache_dir=str(tmp_path))
+        info_file = audio_file[:-len('.m4a')] + '.json'
+        os.utime(info_file, (1000 + i, 1000 + i))
+        audio_files.append(audio_file)
+    # Reusing the oldest track makes it the most recently used
+    premix_audio(schemas[0], cache_dir=str(tmp_path))
+    premix_size = os.path.getsize(audio_files[0]) + os.path.getsize(audio_files[0][:-len('.m4a')] + '.json')
+    partial_file = tmp_path / f"{'0' * 64}.1234.m4a"
+    partial_file.write_bytes(b'0')
+    premix_audio(make_video_schema(media_dir), cache_dir=str(tmp_path), max_size=int(3.5 * premix_size))
+    assert not os.path.exists(audio_files[1])
+    assert os.path.exists(audio_files[0]) and os.path.exists(audio_files[2])
+    assert partial_file.exists()
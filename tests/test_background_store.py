@@ -0,0 +1,76 @@
+import os
+import random
+import subprocess
+
+import pytest
+
+from conftest import count_frames, requires_ffmpeg, run_ffmpeg
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+from shortGPT.editing_utils import background_store
+from shortGPT.editing_utils.background_store import (BACKGROUND_FPS, BACKGROUND_SEGMENT_DURATION, extract_random_clip_from_store,
+                                                     get_background_index, get_store_path, ingest_background_video)
+
+SOURCE_DURATION = 9
+# Small frames keep the ingestion fast, the store works the same at the size of a short
+STORE_SIZE = (64, 112)
+
+
+def get_first_packet_flags(video_file) -> str:
+    output = subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-read_intervals', '%+#1',
+                             '-show_entries', 'packet=flags', '-of', 'csv=p=0', video_file], stdout=subprocess.PIPE, text=True, check=True)
+    return output.stdout.splitlines()[0]
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(background_store, 'BACKGROUND_SIZE', STORE_SIZE)
+    source = str(tmp_path / 'landscape.mp4')
+    run_ffmpeg('-f', 'lavfi', '-i', f'testsrc=size=160x90:rate=25:duration={SOURCE_DURATION}', '-c:v', 'libx264',
+               '-pix_fmt', 'yuv420p', source)
+    store_dir = str(tmp_path / 'store')
+    ingest_background_video('minecraft parkour', source, store_dir)
+    return store_dir
+
+
+@requires_ffmpeg
+def test_ingested_segments_start_on_keyframes(store_dir):
+    index = get_background_index('minecraft parkour', store_dir)
+    assert index['duration'] == pytest.approx(SOURCE_DURATION, abs=0.1)
+    assert len(index['segments']) == -(-SOURCE_DURATION // BACKGROUND_SEGMENT_DURATION)
+    for segment in index['segments']:
+        segment_file = os.path.join(get_store_path('minecraft parkour', store_dir), segment['file'])
+        infos = probe_media(segment_file)
+        assert (infos['width'], infos['height'], infos['fps']) == (*STORE_SIZE, BACKGROUND_FPS)
+        assert 'K' in get_first_packet_flags(segment_file)
+
+
+@requires_ffmpeg
+def test_ingestion_is_skipped_once_done(store_dir):
+    index_file = os.path.join(get_store_path('minecraft parkour', store_dir), 'index.json')
+    mtime = os.path.getmtime(index_file)
+    ingest_background_video('minecraft parkour', 'missing.mp4', store_dir)
+    assert os.path.getmtime(index_file) == mtime
+    # Only the ingested video is left in the store
+    assert os.listdir(store_dir) == ['minecraft parkour']
+
+
+@requires_ffmpeg
+def test_extract_random_clip_from_store(store_dir, tmp_path):
+    random.seed(1)
+    output_file = str(tmp_path / 'clip.mp4')
+    extract_random_clip_from_store('minecraft parkour', 3, output_file, store_dir)
+    n_frames = count_frames(output_file)
+    # Whole segments are joined: at least the duration of the clip, at most one segment more
+    assert 3 * BACKGROUND_FPS <= n_frames <= (3 + BACKGROUND_SEGMENT_DURATION) * BACKGROUND_FPS
+    assert n_frames % (BACKGROUND_SEGMENT_DURATION * BACKGROUND_FPS) == 0
+
+
+def test_extract_random_clip_of_a_missing_video(tmp_path):
+    with pytest.raises(Exception, match="not in the background store"):
+        extract_random_clip_from_store('missing', 3, str(tmp_path / 'clip.mp4'), str(tmp_path))
+
+
+@requires_ffmpeg
+def test_extract_clip_longer_than_the_video(store_dir, tmp_path):
+    with pytest.raises(Exception, match="too short"):
+        extract_random_clip_from_store('minecraft parkour', SOURCE_DURATION + 1, str(tmp_path / 'clip.mp4'), store_dir)
@@ -0,0 +1,52 @@
+import os
+
+from conftest import requires_ffmpeg
+from shortGPT.editing_framework.benchmark import (BENCHMARK_CONFIGS, IMAGE_SIZES, build_benchmark_engine, generate_media,
+                                                  print_result)
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+
+MEDIA = {'background': 'background.mp4', 'green_screen': 'green_screen.mp4', 'voices': {10: 'voice_10.wav'},
+         'music': 'music.mp3', 'images': [f"image_{i}.png" for i in range(len(IMAGE_SIZES))]}
+
+
+def test_benchmark_schema_has_the_layers_of_its_config():
+    config = BENCHMARK_CONFIGS['short']
+    schema = build_benchmark_engine(MEDIA, config).dumpEditingSchema()
+    visual_types = [asset['type'] for asset in schema['visual_assets'].values()]
+    assert visual_types.count('text') == config['n_captions']
+    assert visual_types.count('image') == config['n_images']
+    # The background and the subscribe animation
+    assert visual_types.count('video') == 2
+    assert len(schema['audio_assets']) == 2
+
+
+def test_minimal_benchmark_schema():
+    schema = build_benchmark_engine(MEDIA, dict(BENCHMARK_CONFIGS['minimal'], duration=10)).dumpEditingSchema()
+    assert [asset['type'] for asset in schema['visual_assets'].values()] == ['video']
+    assert len(schema['audio_assets']) == 1
+
+
+def test_print_result(capsys):
+    print_result({'config': 'short', 'backend': 'moviepy', 'cache': 'cold', 'wall_time': 12.5, 'render_fps': 24.0,
+                  'peak_rss_mb': None, 'peak_subprocess_rss_mb': 10.0, 'subprocesses': 3})
+    assert capsys.readouterr().out.split()[:4] == ['short', 'moviepy', 'cold', '12.50s']
+
+
+def test_print_result_reports_fallbacks(capsys):
+    result = {'config': 'short', 'backend': 'ffmpeg', 'cache': 'cold', 'wall_time': 12.5, 'render_fps': 24.0,
+              'peak_rss_mb': None, 'peak_subprocess_rss_mb': 10.0, 'subprocesses': 3}
+    print_result(dict(result, rendered_with='ffmpeg'))
+    assert 'fell back' not in capsys.readouterr().out
+    print_result(dict(result, rendered_with='moviepy'))
+    assert capsys.readouterr().out.rstrip().endswith('fell back to moviepy')
+
+
+@requires_ffmpeg
+def test_media_are_generated_once(tmp_path):
+    media = generate_media([1], str(tmp_path))
+    assert abs(probe_media(media['voices'][1])['duration'] - 1) < 0.05
+    background = probe_media(media['background'])
+    assert (background['width'], background['height']) == (1920, 1080)
+    mtimes = {path: os.path.getmtime(path) for path in [media['background'], media['music'], *media['images']]}
+    generate_media([1], str(tmp_path))
+    assert {path: os.path.getmtime(path) for path in mtimes} == mtimes
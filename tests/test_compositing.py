@@ -0,0 +1,127 @@
+import numpy as np
+from moviepy.editor import ColorClip, CompositeVideoClip
+
+from shortGPT.editing_framework.compositing import IntervalCompositeVideoClip, LazyAssetClip, flatten_clips
+
+SIZE = (40, 30)
+
+
+def make_clips():
+    background = ColorClip(SIZE, color=(10, 20, 30), duration=3)
+    background.fps = 10
+    clips = [background]
+    for i in range(6):
+        clip = ColorClip((8 + i, 6), color=(40 * i, 200, 255 - 30 * i), duration=0.5)
+        clip = clip.set_start(i * 0.4).set_position((i * 5, 3 * i))
+        if i % 2:
+            clip = clip.set_opacity(0.5)
+        clips.append(clip)
+    return clips
+
+
+def assert_same_frames(clip, reference, times, tolerance=0):
+    for t in times:
+        difference = np.abs(clip.get_frame(t).astype(float) - reference.get_frame(t).astype(float))
+        assert difference.max() <= tolerance, t
+
+
+def test_interval_index():
+    clips = make_clips()
+    composite = IntervalCompositeVideoClip(clips)
+    assert composite.breakpoints[0] == 0
+    assert composite.breakpoints == sorted(set(composite.breakpoints))
+    for t in (0, 0.45, 0.5, 1.0, 2.9):
+        expected = [clip for clip in clips if clip.start <= t and (clip.end is None or t < clip.end)]
+        assert composite.playing_clips(t) == expected
+
+
+def test_matches_composite_video_clip():
+    clips = make_clips()
+    times = np.arange(0, 3, 0.05)
+    assert_same_frames(IntervalCompositeVideoClip(clips), CompositeVideoClip(clips), times)
+    assert_same_frames(IntervalCompositeVideoClip(clips).mask, CompositeVideoClip(clips).mask, times)
+
+
+def make_static_clips():
+    background = ColorClip(SIZE, color=(10, 20, 30), duration=3)
+    background.fps = 10
+    overlays = [
+        ColorClip((12, 10), color=(255, 0, 0), duration=2).set_position((2, 2)).set_opacity(0.6),
+        ColorClip((10, 12), color=(0, 255, 0), duration=2).set_position((8, 6)),
+        ColorClip((20, 8), color=(0, 0, 255), duration=2).set_position((30, 25)).set_opacity(0.3),
+    ]
+    return [background] + [clip.set_start(0.5) for clip in overlays]
+
+
+def test_flatten_clips_matches_blitting_each_clip():
+    clips = make_static_clips()
+    layer = flatten_clips(clips[1:], SIZE, 1.0)
+    # Cut to the frame
+    assert layer.pos(0) == (2, 2)
+    assert layer.size == (SIZE[0] - 2, SIZE[1] - 2)
+    flattened = CompositeVideoClip([clips[0], layer.set_duration(3)])
+    assert_same_frames(flattened, CompositeVideoClip(clips), [1.0], tolerance=1)
+
+
+def test_flatten_clips_outside_the_frame():
+    clip = ColorClip((4, 4), color=(255, 0, 0), duration=1).set_position((50, 50))
+    assert flatten_clips([clip], SIZE, 0) is None
+
+
+def test_static_runs_are_flattened_once():
+    clips = make_static_clips()
+    composite = IntervalCompositeVideoClip(clips, static_clips=[False, True, True, True])
+    layers = composite.playing_clips(1.0)
+    assert layers[0] is clips[0]
+    assert len(layers) == 2
+    assert composite.playing_clips(1.5)[1] is layers[1]
+    assert_same_frames(composite, CompositeVideoClip(clips), np.arange(0, 3, 0.1), tolerance=1)
+
+
+def test_short_intervals_are_not_flattened():
+    clips = make_static_clips()
+    clips[1:] = [clip.set_duration(0.2) for clip in clips[1:]]
+    composite = IntervalCompositeVideoClip(clips, static_clips=[False, True, True, True])
+    assert composite.playing_clips(0.6) == clips
+
+
+def make_lazy_clips(clips, built, released):
+    lazy_clips = []
+    for i, clip in enumerate(clips):
+        def build(i=i, clip=clip):
+            built.append(i)
+            return clip, lambda: released.append(i)
+        lazy_clips.append(LazyAssetClip(build, clip.start, clip.end))
+    return lazy_clips
+
+
+def test_lazy_clips_match_their_clips():
+    clips = make_clips()
+    built, released = [], []
+    composite = IntervalCompositeVideoClip(clips[:1] + make_lazy_clips(clips[1:], built, released))
+    assert built == []
+    assert_same_frames(composite, CompositeVideoClip(clips), np.arange(0, 3, 0.1))
+
+
+def test_lazy_clips_are_built_while_visible():
+    clips = make_clips()
+    built, released = [], []
+    composite = IntervalCompositeVideoClip(clips[:1] + make_lazy_clips(clips[1:], built, released))
+    for t in np.arange(0, 0.4, 0.1):
+        composite.get_frame(t)
+    # Built once, by the frame or the mask, however many frames show it
+    assert built == [0]
+    composite.get_frame(0.45)
+    assert built == [0, 1] and released == []
+    composite.get_frame(0.9)
+    assert released == [0, 1]
+    # Built again when the timeline goes back to it
+    composite.get_frame(0.1)
+    assert built == [0, 1, 2, 0]
+
+
+def test_lazy_clip_of_a_missing_asset_is_skipped():
+    background = make_clips()[0]
+    missing = LazyAssetClip(lambda: (None, None), 0.5, 1)
+    composite = IntervalCompositeVideoClip([background, missing])
+    assert np.array_equal(composite.get_frame(0.6), background.get_frame(0.6))
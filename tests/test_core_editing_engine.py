@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pytest
+from moviepy.editor import VideoFileClip
+
+from conftest import MEDIA_DURATION, MEDIA_FPS, SHORT_VOICE_DURATION, VIDEO_SIZE, count_frames, make_video_schema, requires_ffmpeg
+from shortGPT.editing_framework import core_editing_engine, render_checkpoints
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine, get_frame_count
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+from shortGPT.editing_framework.render_checkpoints import RENDER_SEGMENTS_DIR
+
+
+@requires_ffmpeg
+def test_pipelined_render_muxes_premixed_soundtrack(media_dir, workdir):
+    output_file = str(workdir / 'out.mp4')
+    CoreEditingEngine().generate_video(make_video_schema(media_dir), output_file, lookahead_workers=1)
+    infos = probe_media(output_file)
+    assert (infos['width'], infos['height']) == VIDEO_SIZE
+    assert infos['has_audio']
+    assert infos['duration'] == pytest.approx(MEDIA_DURATION, abs=0.2)
+
+
+@requires_ffmpeg
+def test_pipelined_render_without_audio(media_dir, workdir):
+    output_file = str(workdir / 'out.mp4')
+    CoreEditingEngine().generate_video(make_video_schema(media_dir, with_audio=False), output_file, lookahead_workers=1)
+    infos = probe_media(output_file)
+    assert not infos['has_audio']
+
+
+def test_frame_count_matches_moviepy():
+    assert get_frame_count(2, 10) == 20
+    assert get_frame_count(1.95, 10) == 20
+    assert get_frame_count(5.0, 30) == 150
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('render_args', [
+    {'lookahead_workers': 0},
+    {'lookahead_workers': 1},
+    {'n_workers': 2},
+    {'resumable': True},
+    {'incremental': True},
+], ids=['write_videofile', 'pipelined', 'segmented', 'resumable', 'incremental'])
+def test_render_paths_write_the_same_frames(media_dir, workdir, render_args):
+    output_file = str(workdir / 'out.mp4')
+    schema = make_video_schema(media_dir, voice='short_voice.wav')
+    CoreEditingEngine().generate_video(schema, output_file, **render_args)
+    assert count_frames(output_file) == get_frame_count(SHORT_VOICE_DURATION, MEDIA_FPS)
+
+
+@requires_ffmpeg
+def test_segmented_render_matches_single_render(media_dir, workdir):
+    schema = make_video_schema(media_dir)
+    CoreEditingEngine().generate_video(schema, str(workdir / 'single.mp4'), lookahead_workers=0)
+    CoreEditingEngine().generate_video(schema, str(workdir / 'segmented.mp4'), n_workers=3)
+    single, segmented = VideoFileClip(str(workdir / 'single.mp4')), VideoFileClip(str(workdir / 'segmented.mp4'))
+    try:
+        for t in (0.05, 0.75, 1.45, 1.85):
+            difference = np.abs(single.get_frame(t).astype(int) - segmented.get_frame(t).astype(int))
+            assert difference.mean() < 3
+    finally:
+        single.close()
+        segmented.close()
+
+
+@requires_ffmpeg
+def test_incremental_render_only_renders_the_changed_segments(media_dir, workdir, monkeypatch):
+    monkeypatch.setattr(render_checkpoints, 'INCREMENTAL_SEGMENT_DURATION', 0.5)
+    output_file = str(workdir / 'out.mp4')
+    schema = make_video_schema(media_dir)
+    schema['visual_assets']['image_0'] = {'type': 'image', 'z': 1, 'parameters': {'url': str(media_dir / 'image.png')},
+                                          'actions': [{'type': 'set_time_start', 'param': 0}, {'type': 'set_time_end', 'param': 0.4}]}
+    CoreEditingEngine().generate_video(schema, output_file, incremental=True)
+    first_segments = set(os.listdir(RENDER_SEGMENTS_DIR))
+    assert len(first_segments) == MEDIA_DURATION * 2
+    schema['visual_assets']['image_0']['actions'][0]['param'] = 0.1
+    CoreEditingEngine().generate_video(schema, output_file, incremental=True)
+    # Only the first segment shows the image, it is the only one rendered again
+    assert len(set(os.listdir(RENDER_SEGMENTS_DIR)) - first_segments) == 1
+    assert count_frames(output_file) == get_frame_count(MEDIA_DURATION, MEDIA_FPS)
+    assert sorted(os.listdir(workdir)) == ['.editing_assets', 'out.mp4']
+
+
+@requires_ffmpeg
+def test_incremental_render_uses_a_worker_per_cpu_by_default(media_dir, workdir, monkeypatch):
+    pool_sizes = []
+
+    class RecordingExecutor(core_editing_engine.ProcessPoolExecutor):
+        def __init__(self, max_workers=None, **kwargs):
+            pool_sizes.append(max_workers)
+            super().__init__(max_workers=max_workers, **kwargs)
+    monkeypatch.setattr(core_editing_engine, 'ProcessPoolExecutor', RecordingExecutor)
+    monkeypatch.setattr(core_editing_engine, 'get_segment_workers', lambda: 2)
+    CoreEditingEngine().generate_video(make_video_schema(media_dir), str(workdir / 'out.mp4'), incremental=True)
+    CoreEditingEngine().generate_video(make_video_schema(media_dir), str(workdir / 'resumable.mp4'), resumable=True)
+    assert pool_sizes == [2, 2]
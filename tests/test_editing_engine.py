@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import MEDIA_DURATION, VIDEO_SIZE, requires_ffmpeg
+from shortGPT.editing_framework.editing_engine import DRAFT_FPS, DRAFT_SCALE, EditingEngine, EditingStep, RenderingBackend
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+from shortGPT.editing_framework.geometry import resized_size
+
+
+def make_engine(media_dir):
+    engine = EditingEngine()
+    engine.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {'url': str(media_dir / 'voice.wav')})
+    engine.addEditingStep(EditingStep.ADD_BACKGROUND_VIDEO, {'url': str(media_dir / 'video.mp4'), 'set_time_start': 0, 'set_time_end': MEDIA_DURATION})
+    return engine
+
+
+@requires_ffmpeg
+def test_draft_render_uses_the_draft_resolution_and_frame_rate(media_dir, workdir):
+    output_file = str(workdir / 'draft.mp4')
+    make_engine(media_dir).renderVideo(output_file, draft=True)
+    infos = probe_media(output_file)
+    assert (infos['width'], infos['height']) == resized_size(VIDEO_SIZE, DRAFT_SCALE)
+    assert infos['fps'] == DRAFT_FPS
+    assert infos['duration'] == pytest.approx(MEDIA_DURATION, abs=0.2)
+    assert infos['has_audio']
+
+
+@requires_ffmpeg
+def test_ffmpeg_backend_renders_the_background_music_step(media_dir, workdir):
+    engine = make_engine(media_dir)
+    engine.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': str(media_dir / 'short_voice.wav'),
+                                                             'loop_background_music': MEDIA_DURATION, 'volume_percentage': 0.11})
+    output_file = str(workdir / 'out.mp4')
+    engine.renderVideo(output_file, backend=RenderingBackend.FFMPEG)
+    assert engine.last_render_backend == RenderingBackend.FFMPEG
+    assert probe_media(output_file)['has_audio']
+
+
+@requires_ffmpeg
+def test_ffmpeg_backend_falls_back_to_moviepy(media_dir, workdir):
+    engine = make_engine(media_dir)
+    engine.schema['visual_assets']['background_video_0']['actions'].append({'type': 'rotate', 'param': 90})
+    engine.renderVideo(str(workdir / 'out.mp4'), backend=RenderingBackend.FFMPEG)
+    assert engine.last_render_backend == RenderingBackend.MOVIEPY
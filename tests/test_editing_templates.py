@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from shortGPT.editing_framework.editing_engine import (EDITING_TEMPLATES, FLOWS_PATH, STEPS_PATH, EditingEngine, EditingStep,
+                                                       Flow)
+from shortGPT.editing_framework.editing_templates import StepTemplate, update_dict
+
+# An argument for every input of the editing steps
+STEP_ARGS = {'url': 'public/media.mp4', 'text': 'Hello', 'set_time_start': 1.5, 'set_time_end': 3, 'volume_percentage': 0.2,
+             'loop_background_music': 30, 'subclip': {'t_start': 0, 't_end': 2}}
+
+
+def legacy_step(editingStep: EditingStep, args):
+    """The editing step built by EditingEngine.addEditingStep before the templates were compiled"""
+    with open(STEPS_PATH / editingStep.value, 'r', encoding='utf-8') as f:
+        step_name, editingStepDict = list(json.load(f).items())[0]
+    if 'inputs' in editingStepDict:
+        required_args = editingStepDict['inputs'].get('actions', []) + editingStepDict['inputs'].get('parameters', [])
+        for required_argument in required_args:
+            if required_argument not in args:
+                raise Exception(f"Error. '{required_argument}' input missing, you must include it to use this editing step")
+        action_names = [action['type'] for action in editingStepDict.get('actions', [])]
+        param_names = list(editingStepDict.get('parameters', {}))
+        for arg_name in args:
+            if 'parameters' in editingStepDict['inputs'] and arg_name in param_names:
+                editingStepDict['parameters'][arg_name] = args[arg_name]
+            if 'actions' in editingStepDict['inputs'] and arg_name in action_names:
+                for action in editingStepDict['actions']:
+                    if action['type'] == arg_name:
+                        action['param'] = args[arg_name]
+    return step_name, editingStepDict
+
+
+def legacy_flow(flow: Flow, args):
+    with open(FLOWS_PATH / flow.value, 'r', encoding='utf-8') as f:
+        json_flow = json.load(f)
+    for required_argument in json_flow['inputs']:
+        update = args[required_argument]
+        for path_key in reversed(json_flow['inputs'][required_argument].split("/")):
+            update = {path_key: update}
+        json_flow = update_dict(json_flow, update)
+    return json_flow
+
+
+@pytest.mark.parametrize('step', list(EditingStep))
+def test_steps_match_the_legacy_steps(step):
+    engine = EditingEngine()
+    engine.addEditingStep(step, STEP_ARGS)
+    engine.addEditingStep(step, dict(STEP_ARGS, url='public/other.mp4', text='World'))
+    step_name, legacy_asset = legacy_step(step, STEP_ARGS)
+    _, second_legacy_asset = legacy_step(step, dict(STEP_ARGS, url='public/other.mp4', text='World'))
+    assets = engine.schema['audio_assets' if legacy_asset['type'] == 'audio' else 'visual_assets']
+    assert assets == {f"{step_name}_0": legacy_asset, f"{step_name}_1": second_legacy_asset}
+
+
+def test_steps_are_independent_copies():
+    engine = EditingEngine()
+    engine.addEditingStep(EditingStep.ADD_CAPTION_SHORT, STEP_ARGS)
+    engine.schema['visual_assets']['caption_0']['actions'][0]['param'] = 99
+    assert EDITING_TEMPLATES.get_step(EditingStep.ADD_CAPTION_SHORT.value).instantiate(STEP_ARGS) == \
+        legacy_step(EditingStep.ADD_CAPTION_SHORT, STEP_ARGS)[1]
+
+
+@pytest.mark.parametrize('step', [EditingStep.ADD_CAPTION_SHORT, EditingStep.ADD_BACKGROUND_MUSIC])
+def test_missing_input_raises_like_the_legacy_steps(step):
+    args = dict(STEP_ARGS)
+    del args['url' if step == EditingStep.ADD_BACKGROUND_MUSIC else 'text']
+    with pytest.raises(Exception) as legacy_error:
+        legacy_step(step, args)
+    with pytest.raises(Exception) as error:
+        EditingEngine().addEditingStep(step, args)
+    assert str(error.value) == str(legacy_error.value)
+
+
+def test_flow_matches_the_legacy_flow():
+    args = {'username_text': 'u/someone', 'ncomments_text': '12', 'nupvote_text': '3.4k', 'question_text': 'Why?'}
+    engine = EditingEngine()
+    engine.ingestFlow(Flow.WHITE_REDDIT_IMAGE_FLOW, args)
+    assert engine.schema == legacy_flow(Flow.WHITE_REDDIT_IMAGE_FLOW, args)
+    with pytest.raises(Exception, match="'question_text' input missing"):
+        engine.ingestFlow(Flow.WHITE_REDDIT_IMAGE_FLOW, {k: v for k, v in args.items() if k != 'question_text'})
+
+
+@pytest.mark.parametrize('json_step, error', [
+    ({'a': {'type': 'image', 'z': 0}, 'b': {'type': 'image', 'z': 0}}, "exactly one asset"),
+    ({'a': {'type': 'gif', 'z': 0}}, "unknown asset type"),
+    ({'a': {'type': 'image'}}, "no z index"),
+    ({'a': {'type': 'image', 'z': 0, 'actions': [{'type': 'crop'}]}}, "a type and a param"),
+    ({'a': {'type': 'image', 'z': 0, 'parameters': {'url': None}, 'inputs': {'parameters': ['text']}}}, "fills no parameter"),
+])
+def test_invalid_steps_are_rejected(json_step, error):
+    with pytest.raises(Exception, match=error):
+        StepTemplate('broken.json', json_step)
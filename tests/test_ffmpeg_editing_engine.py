@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from moviepy.editor import VideoFileClip
+
+from conftest import MEDIA_DURATION, MEDIA_FPS, VIDEO_SIZE, make_video_schema, requires_ffmpeg
+from shortGPT.editing_framework.ffmpeg_editing_engine import FFmpegEditingEngine, probe_media
+
+
+@requires_ffmpeg
+def test_probe_media(media_dir):
+    infos = probe_media(str(media_dir / 'video.mp4'))
+    assert (infos['width'], infos['height']) == VIDEO_SIZE
+    assert infos['fps'] == MEDIA_FPS
+    assert infos['duration'] == pytest.approx(MEDIA_DURATION, abs=0.1)
+    assert not infos['has_audio']
+    assert probe_media(str(media_dir / 'voice.wav'))['has_audio']
+
+
+@requires_ffmpeg
+def test_probe_media_raises_on_missing_file(tmp_path):
+    with pytest.raises(Exception):
+        probe_media(str(tmp_path / 'missing.mp4'))
+
+
+@requires_ffmpeg
+def test_generate_video_composites_layers(media_dir, tmp_path):
+    schema = make_video_schema(media_dir)
+    schema['visual_assets']['image_0'] = {
+        'type': 'image', 'z': 1, 'parameters': {'url': str(media_dir / 'image.png')},
+        'actions': [{'type': 'set_time_start', 'param': 0.5}, {'type': 'set_time_end', 'param': 1.5},
+                    {'type': 'screen_position', 'param': {'pos': (8, 8)}}],
+    }
+    output_file = str(tmp_path / 'out.mp4')
+    FFmpegEditingEngine().generate_video(schema, output_file)
+    infos = probe_media(output_file)
+    assert (infos['width'], infos['height']) == VIDEO_SIZE
+    assert infos['has_audio']
+    assert infos['duration'] == pytest.approx(MEDIA_DURATION, abs=0.2)
+    clip = VideoFileClip(output_file)
+    try:
+        # The red image covers (8, 8)-(24, 24) only between 0.5s and 1.5s
+        shown, hidden = clip.get_frame(1.0)[16, 16].astype(int), clip.get_frame(1.8)[16, 16].astype(int)
+    finally:
+        clip.close()
+    assert shown[0] > 200 and shown[1] < 60 and shown[2] < 60
+    assert not np.array_equal(shown, hidden)
+
+
+@requires_ffmpeg
+def test_unsupported_action_raises_not_implemented(media_dir, tmp_path):
+    schema = make_video_schema(media_dir)
+    schema['visual_assets']['image_0'] = {'type': 'image', 'z': 1, 'parameters': {'url': str(media_dir / 'image.png')},
+                                          'actions': [{'type': 'rotate', 'param': 90}]}
+    with pytest.raises(NotImplementedError):
+        FFmpegEditingEngine().compile_video(schema, str(tmp_path / 'out.mp4'), str(tmp_path))
+
+
+@requires_ffmpeg
+def test_unreadable_image_raises_not_implemented(media_dir, tmp_path):
+    # Left to moviepy, whose image reader may know the format
+    image_file = tmp_path / 'image.png'
+    image_file.write_bytes(b'not an image')
+    schema = make_video_schema(media_dir)
+    schema['visual_assets']['image_0'] = {'type': 'image', 'z': 1, 'parameters': {'url': str(image_file)}, 'actions': []}
+    with pytest.raises(NotImplementedError):
+        FFmpegEditingEngine().compile_video(schema, str(tmp_path / 'out.mp4'), str(tmp_path))
+
+
+def test_green_screen_filter_matches_moviepy_threshold():
+    filter_string = FFmpegEditingEngine().green_screen_filter({'color': [52, 255, 20], 'thr': 100, 's': 5})
+    assert filter_string.startswith('colorkey=color=0x34ff14:')
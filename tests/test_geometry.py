@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from moviepy.editor import ColorClip, CompositeVideoClip
+
+from shortGPT.editing_framework.geometry import (apply_geometric_action, auto_resized_size, crop_box, resized_size,
+                                                 resolve_position)
+
+FRAME_SIZE = (101, 57)
+
+
+def get_blit_box(frame):
+    """Returns the (x, y, width, height) box of the non-black pixels of a frame"""
+    ys, xs = np.nonzero(frame.any(axis=2))
+    return int(xs.min()), int(ys.min()), int(xs.max() - xs.min() + 1), int(ys.max() - ys.min() + 1)
+
+
+@pytest.mark.parametrize('param', [
+    {'x1': 10, 'y1': 5},
+    {'x2': 90, 'y2': 50},
+    {'x1': 3, 'width': 40, 'y2': 50, 'height': 20},
+    {'x2': 80, 'width': 33.5, 'y1': 2.7, 'height': 21},
+    {'x_center': 50, 'width': 21, 'y_center': 28.5, 'height': 11},
+    {'x_center': 50, 'width': 40, 'y1': 3, 'y2': 40},
+    {'x1': 20, 'x2': 500},
+])
+def test_crop_box_matches_moviepy(param):
+    frame = np.zeros((FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype='uint8')
+    frame[..., 0] = np.arange(FRAME_SIZE[0])[None, :]
+    frame[..., 1] = np.arange(FRAME_SIZE[1])[:, None]
+    clip = ColorClip(FRAME_SIZE, color=(0, 0, 0), duration=1).fl_image(lambda _: frame)
+    cropped = clip.crop(**param).get_frame(0)
+    x, y, width, height = crop_box(FRAME_SIZE, **param)
+    assert cropped.shape[:2] == (height, width)
+    assert (cropped[0, 0, 0], cropped[0, 0, 1]) == (x, y)
+
+
+@pytest.mark.parametrize('param, size', [
+    ({}, FRAME_SIZE),
+    ({'newsize': 0.37}, (37, 21)),
+    ({'newsize': (30.9, 20.2)}, (30, 20)),
+    ({'width': 33}, (33, 18)),
+    ({'height': 20}, (35, 20)),
+])
+def test_resized_size(param, size):
+    # The same arithmetic as moviepy's resize: the product truncated to an int
+    assert resized_size(FRAME_SIZE, **param) == size
+
+
+def test_auto_resized_size_fits_the_longest_side():
+    assert auto_resized_size((200, 100), maxWidth=50, maxHeight=80) == (50, 25)
+    assert auto_resized_size((100, 200), maxWidth=80, maxHeight=50) == (25, 50)
+    # Already fitted images keep their size
+    assert auto_resized_size((50, 31), maxWidth=50, maxHeight=80) == (50, 31)
+
+
+@pytest.mark.parametrize('pos, relative', [
+    ('center', False),
+    ('left', False),
+    ('bottom', False),
+    (['right', 'top'], False),
+    ((12.7, 'center'), False),
+    ((3, 40), False),
+    ((0.5, 0.25), True),
+    ((0.1, 'bottom'), True),
+])
+def test_resolve_position_matches_moviepy(pos, relative):
+    clip_size = (21, 10)
+    background = ColorClip(FRAME_SIZE, color=(0, 0, 0), duration=1)
+    overlay = ColorClip(clip_size, color=(255, 255, 255), duration=1).set_position(pos, relative=relative)
+    frame = CompositeVideoClip([background, overlay]).get_frame(0)
+    assert get_blit_box(frame)[:2] == resolve_position(pos, FRAME_SIZE, clip_size, relative=relative)
+
+
+def test_apply_geometric_action():
+    assert apply_geometric_action(FRAME_SIZE, {'type': 'crop', 'param': {'x1': 1, 'width': 50}}) == (50, 57)
+    assert apply_geometric_action(FRAME_SIZE, {'type': 'resize', 'param': {'width': 33}}) == (33, 18)
+    assert apply_geometric_action(FRAME_SIZE, {'type': 'set_time_start', 'param': 1}) == FRAME_SIZE
@@ -0,0 +1,49 @@
+import os
+import random
+
+import pytest
+
+from conftest import count_frames, requires_ffmpeg, run_ffmpeg
+from shortGPT.editing_utils.handle_videos import extract_random_clip_from_video, get_keyframe_times
+
+LONG_VIDEO_DURATION = 180
+# One keyframe every KEYFRAME_INTERVAL seconds
+KEYFRAME_INTERVAL = 2
+
+
+@pytest.fixture(scope='module')
+def long_video(tmp_path_factory):
+    video_file = str(tmp_path_factory.mktemp('long_video') / 'long.mp4')
+    run_ffmpeg('-f', 'lavfi', '-i', f'testsrc=size=32x32:rate=5:duration={LONG_VIDEO_DURATION}', '-c:v', 'libx264',
+               '-g', str(5 * KEYFRAME_INTERVAL), '-keyint_min', str(5 * KEYFRAME_INTERVAL), '-sc_threshold', '0',
+               '-pix_fmt', 'yuv420p', video_file)
+    return video_file
+
+
+@requires_ffmpeg
+def test_get_keyframe_times(long_video):
+    keyframe_times = get_keyframe_times(long_video, 20.5, 30.5)
+    # ffprobe starts reading at the keyframe before the interval
+    assert keyframe_times == pytest.approx([20, 22, 24, 26, 28, 30])
+
+
+@requires_ffmpeg
+def test_get_keyframe_times_of_a_missing_file(tmp_path):
+    assert get_keyframe_times(str(tmp_path / 'missing.mp4'), 0, 10) == []
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('stream_copy', [True, False])
+def test_extract_random_clip(long_video, tmp_path, stream_copy):
+    random.seed(3)
+    output_file = str(tmp_path / 'clip.mp4')
+    extract_random_clip_from_video(long_video, LONG_VIDEO_DURATION, 10, output_file, stream_copy=stream_copy)
+    # A copied stream can end a few frames after the cut
+    assert 10 * 5 <= count_frames(output_file) < 11 * 5
+    # The clip starts with a keyframe
+    assert len(get_keyframe_times(output_file, 0, 1)) == 1
+
+
+def test_extract_random_clip_of_a_short_video(tmp_path):
+    with pytest.raises(Exception, match="too short"):
+        extract_random_clip_from_video('video.mp4', 100, 10, str(tmp_path / 'clip.mp4'))
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+from moviepy.editor import ImageClip
+from PIL import Image
+
+from shortGPT.editing_framework import core_editing_engine
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine, uses_imagemagick
+from shortGPT.editing_framework.image_compositor import ImageCompositor
+
+
+@pytest.fixture
+def images(tmp_path):
+    x, y = np.meshgrid(np.arange(120), np.arange(80))
+    background = np.dstack([x, y, x + y, np.full(x.shape, 255)]).astype('uint8')
+    overlay = np.zeros((30, 40, 4), dtype='uint8')
+    overlay[..., 1] = 200
+    overlay[..., 3] = np.linspace(0, 255, 40)[None, :]
+    paths = {'background': str(tmp_path / 'background.png'), 'overlay': str(tmp_path / 'overlay.png')}
+    Image.fromarray(background, 'RGBA').save(paths['background'])
+    Image.fromarray(overlay, 'RGBA').save(paths['overlay'])
+    return paths
+
+
+def make_schema(images, font='DejaVu-Sans'):
+    return {'visual_assets': {
+        'background': {'type': 'image', 'z': 0, 'parameters': {'url': images['background']}, 'actions': []},
+        'overlay': {'type': 'image', 'z': 1, 'parameters': {'url': images['overlay']},
+                    'actions': [{'type': 'crop', 'param': {'x1': 5, 'width': 30}},
+                                {'type': 'screen_position', 'param': {'pos': [0.5, 'bottom'], 'relative': True}}]},
+        'caption': {'type': 'text', 'z': 2, 'parameters': {'text': 'Hi', 'fontsize': 20, 'font': font, 'color': 'white'},
+                    'actions': [{'type': 'screen_position', 'param': {'pos': 'center'}}]},
+    }, 'audio_assets': {}}
+
+
+def test_supports():
+    image = {'type': 'image', 'z': 0, 'parameters': {'url': 'a.png'}, 'actions': []}
+    assert ImageCompositor.supports({'visual_assets': {'image': image}})
+    assert not ImageCompositor.supports({'visual_assets': {'image': dict(image, actions=[{'type': 'mirror_x', 'param': {}}])}})
+    assert not ImageCompositor.supports({'visual_assets': {'video': dict(image, type='video')}})
+    moving = dict(image, actions=[{'type': 'screen_position', 'param': {'pos': lambda t: (t, 0)}}])
+    assert not ImageCompositor.supports({'visual_assets': {'image': moving}})
+
+
+def test_matches_the_moviepy_composite(images, tmp_path, workdir, monkeypatch):
+    schema = make_schema(images)
+    engine = CoreEditingEngine()
+    composited = ImageCompositor(engine.text_cache).composite(schema)
+    moviepy_file = str(tmp_path / 'moviepy.png')
+    # The moviepy path of generate_image, forced for the comparison
+    monkeypatch.setattr(ImageCompositor, 'supports', staticmethod(lambda schema: False))
+    engine.generate_image(schema, moviepy_file)
+    expected = np.array(Image.open(moviepy_file).convert('RGB'))
+    assert composited.shape[:2] == expected.shape[:2]
+    assert np.abs(composited[..., :3].astype(int) - expected).max() <= 1
+
+
+def test_texts_in_imagemagick_fonts_are_left_to_moviepy(images, tmp_path, workdir, monkeypatch):
+    monkeypatch.setattr(core_editing_engine, 'IMAGEMAGICK_AVAILABLE', True)
+    assert uses_imagemagick({'font': 'NoSuchFont'})
+    assert not uses_imagemagick({'font': 'DejaVu-Sans'})
+    rendered_texts = []
+
+    def make_text_clip(self, text_clip_params):
+        rendered_texts.append(text_clip_params['text'])
+        return ImageClip(np.zeros((10, 10, 3), dtype='uint8'))
+    monkeypatch.setattr(CoreEditingEngine, 'make_text_clip', make_text_clip)
+    monkeypatch.setattr(ImageCompositor, 'generate_image', lambda *args: pytest.fail("rendered by the ImageCompositor"))
+    output_file = str(tmp_path / 'image.png')
+    CoreEditingEngine().generate_image(make_schema(images, font='NoSuchFont'), output_file)
+    assert rendered_texts == ['Hi']
+    assert os.path.exists(output_file)
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+from PIL import Image
+
+from shortGPT.editing_framework.geometry import auto_resized_size
+from shortGPT.editing_utils.image_ingestion import IMAGE_BOX, ingest_image, ingest_timed_images, prepare_image
+
+
+def save_image(path, size, mode='RGB'):
+    Image.new(mode, size, (200, 10, 10, 128) if mode == 'RGBA' else (200, 10, 10)).save(str(path))
+    return str(path)
+
+
+@pytest.mark.parametrize('size', [(1200, 800), (500, 1000), (100, 60)])
+def test_prepare_image_fits_the_box(tmp_path, size):
+    output_file = prepare_image(save_image(tmp_path / 'source.jpg', size), str(tmp_path / 'prepared.png'))
+    with Image.open(output_file) as image:
+        assert image.size == auto_resized_size(size, *IMAGE_BOX)
+        assert image.mode == 'RGB'
+        # Already fitted, the size stays the same when the editing step resizes it again
+        assert auto_resized_size(image.size, *IMAGE_BOX) == image.size
+
+
+def test_prepare_image_keeps_transparency(tmp_path):
+    output_file = prepare_image(save_image(tmp_path / 'source.png', (300, 200), 'RGBA'), str(tmp_path / 'prepared.png'))
+    with Image.open(output_file) as image:
+        assert image.mode == 'RGBA'
+
+
+def test_prepare_image_rejects_unusable_files(tmp_path):
+    with pytest.raises(Exception, match="too small"):
+        prepare_image(save_image(tmp_path / 'icon.png', (8, 8)), str(tmp_path / 'prepared.png'))
+    (tmp_path / 'broken.jpg').write_bytes(b'<html>not found</html>')
+    with pytest.raises(Exception):
+        prepare_image(str(tmp_path / 'broken.jpg'), str(tmp_path / 'prepared.png'))
+    assert sorted(os.listdir(str(tmp_path))) == ['broken.jpg', 'icon.png']
+
+
+def test_ingest_image_is_done_once(tmp_path):
+    source = save_image(tmp_path / 'source.jpg', (800, 600))
+    output_dir = str(tmp_path / 'ingested')
+    os.makedirs(output_dir)
+    image_path = ingest_image(source, output_dir)
+    mtime = os.path.getmtime(image_path)
+    assert ingest_image(source, output_dir) == image_path
+    assert os.path.getmtime(image_path) == mtime
+    assert ingest_image(source, output_dir, box=(100, 100)) != image_path
+
+
+def test_ingest_timed_images_leaves_out_unusable_images(tmp_path):
+    good = save_image(tmp_path / 'good.jpg', (800, 600))
+    (tmp_path / 'broken.jpg').write_bytes(b'')
+    timed_images = [((0, 2), good), ((2, 4), str(tmp_path / 'broken.jpg')), ((4, 6), None), ((6, 8), good)]
+    ingested = ingest_timed_images(timed_images, str(tmp_path / 'ingested'))
+    assert [timing for timing, _ in ingested] == [(0, 2), (6, 8)]
+    assert ingested[0][1] == ingested[1][1]
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+
+from conftest import VIDEO_SIZE, requires_ffmpeg
+from shortGPT.editing_framework.geometry import crop_box, resized_size
+from shortGPT.editing_framework.media_readers import MediaReaderPool, get_read_shift, split_decoder_actions
+
+
+@requires_ffmpeg
+def test_assets_of_the_same_file_share_one_reader(media_dir):
+    pool = MediaReaderPool()
+    video_file = os.path.join(media_dir, 'video.mp4')
+    first, second = pool.get_video(video_file), pool.get_video(video_file).subclip(0.5, 1)
+    assert first is not second
+    assert first.reader is second.reader
+    assert len(pool.videos) == 1
+    assert pool.get_audio(os.path.join(media_dir, 'voice.wav')).reader is pool.get_audio(os.path.join(media_dir, 'voice.wav')).reader
+    assert pool.get_image(os.path.join(media_dir, 'image.png')) is not pool.get_image(os.path.join(media_dir, 'image.png'))
+    assert len(pool.images) == 1
+    pool.close()
+
+
+def test_read_shift_of_an_asset():
+    assert get_read_shift([]) == 0
+    assert get_read_shift([{'type': 'set_time_start', 'param': 1.5}, {'type': 'subclip', 'param': {'t_start': 1.5}}]) == 0
+    assert get_read_shift([{'type': 'subclip', 'param': {'t_start': 0.5}}]) == 0.5
+    assert get_read_shift([{'type': 'set_time_start', 'param': 1}]) == -1
+
+
+@requires_ffmpeg
+def test_assets_reading_the_file_at_different_times_get_their_own_readers(media_dir):
+    pool = MediaReaderPool()
+    video_file = os.path.join(media_dir, 'video.mp4')
+    background = pool.get_video(video_file)
+    delayed = pool.get_video(video_file, read_shift=0.5).subclip(0.5)
+    assert background.reader is not delayed.reader
+    assert pool.get_video(video_file, read_shift=0.5).reader is delayed.reader
+    assert len(pool.videos) == 2
+    voice_file = os.path.join(media_dir, 'voice.wav')
+    assert pool.get_audio(voice_file).reader is not pool.get_audio(voice_file, 0.5).reader
+    assert len(pool.audios) == 2
+    for t in np.arange(0, 1.5, 0.1):
+        assert np.array_equal(background.get_frame(t + 0.5), delayed.get_frame(t))
+    pool.close()
+
+
+@requires_ffmpeg
+def test_close_closes_every_reader(media_dir):
+    pool = MediaReaderPool()
+    video = pool.get_video(os.path.join(media_dir, 'video.mp4'))
+    audio = pool.get_audio(os.path.join(media_dir, 'voice.wav'))
+    child = pool.open_child()
+    child_video = child.get_video(os.path.join(media_dir, 'video.mp4'))
+    video.get_frame(0)
+    pool.close()
+    assert video.reader.proc is None
+    assert audio.reader.proc is None
+    assert child_video.reader.proc is None
+    assert (pool.videos, pool.audios, pool.images, pool.children) == ({}, {}, {}, [])
+
+
+@requires_ffmpeg
+def test_close_child_forgets_it(media_dir):
+    pool = MediaReaderPool()
+    child = pool.open_child()
+    video = child.get_video(os.path.join(media_dir, 'video.mp4'))
+    pool.close_child(child)
+    assert video.reader.proc is None
+    assert pool.children == []
+
+
+def test_split_decoder_actions_keeps_the_leading_crops_and_resizes():
+    crop = {'type': 'crop', 'param': {'x1': 10, 'width': 20}}
+    resize = {'type': 'resize', 'param': {'width': 10}}
+    timing = {'type': 'set_time_start', 'param': 1}
+    mirror = {'type': 'mirror_x', 'param': {}}
+    assert split_decoder_actions([timing, crop, resize, mirror, crop]) == ([crop, resize], [timing, mirror, crop])
+    assert split_decoder_actions([mirror, crop]) == ([], [mirror, crop])
+    # Sizes changing over time are left to moviepy
+    animated = {'type': 'resize', 'param': {'newsize': lambda t: 1 + t}}
+    assert split_decoder_actions([crop, animated, resize]) == ([crop], [animated, resize])
+
+
+@requires_ffmpeg
+def test_decoder_crop_matches_moviepy(media_dir):
+    video_file = os.path.join(media_dir, 'video.mp4')
+    param = {'x_center': 30, 'width': 40, 'y1': 10, 'height': 60}
+    pool = MediaReaderPool()
+    filtered = pool.get_video(video_file, decoder_actions=[{'type': 'crop', 'param': param}])
+    cropped = pool.get_video(video_file).crop(**param)
+    assert tuple(filtered.size) == tuple(cropped.size) == (40, 60)
+    for t in (0, 0.55, 1.2):
+        assert np.array_equal(filtered.get_frame(t), cropped.get_frame(t))
+    pool.close()
+
+
+@requires_ffmpeg
+def test_decoder_resize_gives_the_size_of_moviepy(media_dir):
+    pool = MediaReaderPool()
+    actions = [{'type': 'crop', 'param': {'x1': 2, 'width': 33}}, {'type': 'resize', 'param': {'height': 50}}]
+    clip = pool.get_video(os.path.join(media_dir, 'video.mp4'), decoder_actions=actions)
+    size = resized_size(crop_box(VIDEO_SIZE, **actions[0]['param'])[2:], **actions[1]['param'])
+    assert tuple(clip.size) == size
+    assert clip.get_frame(0.3).shape == (size[1], size[0], 3)
+    pool.close()
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from moviepy.editor import VideoFileClip
+
+from conftest import MEDIA_DURATION, MEDIA_FPS, VIDEO_SIZE, count_frames, make_video_schema, requires_ffmpeg
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine, get_frame_count
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+from shortGPT.editing_framework.multi_output import MultiOutputVideoWriter, check_output_specs, get_output_size
+
+
+def test_output_size_crops_then_resizes():
+    assert get_output_size((64, 112), {'output_file': 'out.mp4'}) == ((0, 0, 64, 112), (64, 112))
+    crop = {'x_center': 32, 'y_center': 56, 'width': 64, 'height': 64}
+    assert get_output_size((64, 112), {'crop': crop}) == ((0, 24, 64, 64), (64, 64))
+    assert get_output_size((64, 112), {'crop': crop, 'resize': {'width': 32}}) == ((0, 24, 64, 64), (32, 32))
+
+
+def test_output_size_is_rounded_down_to_even_dimensions():
+    _, size = get_output_size((64, 112), {'resize': {'width': 33}})
+    assert size[0] % 2 == 0 and size[1] % 2 == 0
+    assert size == (32, 56)
+
+
+@pytest.mark.parametrize('outputs, message', [
+    ([{'crop': {'width': 10}}], "no output_file"),
+    ([{'output_file': 'out.mp4', 'scale': 0.5}], "unknown keys ['scale']"),
+    ([{'output_file': 'out.mp4'}, {'output_file': './out.mp4'}], "written twice"),
+])
+def test_invalid_output_specs(outputs, message):
+    with pytest.raises(Exception, match=message.replace('[', r'\[').replace(']', r'\]')):
+        check_output_specs(outputs)
+
+
+@requires_ffmpeg
+def test_writer_encodes_every_rendition_of_the_frames(tmp_path):
+    # Left half red, right half blue
+    frame = np.zeros((112, 64, 3), dtype=np.uint8)
+    frame[:, :32, 0] = 255
+    frame[:, 32:, 2] = 255
+    outputs = [{'output_file': str(tmp_path / 'full.mp4')},
+               {'output_file': str(tmp_path / 'left.mp4'), 'crop': {'x1': 0, 'width': 32}, 'resize': {'width': 16}, 'preset': 'ultrafast'}]
+    with MultiOutputVideoWriter((64, 112), MEDIA_FPS, outputs) as writer:
+        for _ in range(5):
+            writer.write_frame(frame)
+    full, left = probe_media(outputs[0]['output_file']), probe_media(outputs[1]['output_file'])
+    assert (full['width'], full['height']) == (64, 112)
+    assert (left['width'], left['height']) == (16, 56)
+    assert count_frames(outputs[1]['output_file']) == 5
+    clip = VideoFileClip(outputs[1]['output_file'])
+    try:
+        red, green, blue = clip.get_frame(0)[8:48, 2:14].reshape(-1, 3).mean(axis=0)
+        assert red > 200 and blue < 50
+    finally:
+        clip.close()
+
+
+@requires_ffmpeg
+def test_writer_raises_the_ffmpeg_error(tmp_path):
+    writer = MultiOutputVideoWriter((64, 112), MEDIA_FPS, [{'output_file': str(tmp_path / 'out.mp4'), 'preset': 'not_a_preset'}])
+    with pytest.raises(Exception, match="ffmpeg"):
+        for _ in range(50):
+            writer.write_frame(np.zeros((112, 64, 3), dtype=np.uint8))
+        writer.close()
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('lookahead_workers', [0, 1], ids=['in_process', 'pipelined'])
+def test_multi_output_render_writes_the_renditions(media_dir, workdir, lookahead_workers):
+    output_file = str(workdir / 'out.mp4')
+    outputs = [{'output_file': str(workdir / 'square.mp4'), 'crop': {'x_center': 32, 'y_center': 56, 'width': 64, 'height': 64}},
+               {'output_file': str(workdir / 'small.mp4'), 'resize': {'width': 32}, 'bitrate': '100k'}]
+    CoreEditingEngine().generate_video(make_video_schema(media_dir), output_file, lookahead_workers=lookahead_workers, outputs=outputs)
+    sizes = {}
+    for file in (output_file, outputs[0]['output_file'], outputs[1]['output_file']):
+        infos = probe_media(file)
+        sizes[file] = (infos['width'], infos['height'])
+        assert infos['has_audio']
+        assert count_frames(file) == get_frame_count(MEDIA_DURATION, MEDIA_FPS)
+    assert list(sizes.values()) == [VIDEO_SIZE, (64, 64), (32, 56)]
+    # The square rendition is the middle of the full video
+    full, square = VideoFileClip(output_file), VideoFileClip(outputs[0]['output_file'])
+    try:
+        difference = np.abs(full.get_frame(1)[24:88].astype(int) - square.get_frame(1).astype(int))
+        assert difference.mean() < 3
+    finally:
+        full.close()
+        square.close()
@@ -0,0 +1,103 @@
+import os
+import time
+
+from shortGPT.editing_framework.render_checkpoints import (CHECKPOINT_SEGMENT_DURATION, INCREMENTAL_SEGMENT_DURATION, RenderCheckpoint,
+                                                           RenderSegmentStore, prune_checkpoints)
+
+SCHEMA = {'visual_assets': {}, 'audio_assets': {}}
+
+
+def caption_schema(captions):
+    """A schema with one text layer per (key, text, start, end) caption"""
+    return {'visual_assets': {key: {'type': 'text', 'z': 1, 'parameters': {'text': text},
+                                    'actions': [{'type': 'set_time_start', 'param': start}, {'type': 'set_time_end', 'param': end}]}
+                              for key, text, start, end in captions},
+            'audio_assets': {}}
+
+
+def test_checkpoint_cuts_the_frames_in_segments(tmp_path):
+    fps = 10
+    n_frames = 2 * CHECKPOINT_SEGMENT_DURATION * fps + 3
+    checkpoint = RenderCheckpoint(SCHEMA, fps, n_frames, 'medium', checkpoint_dir=str(tmp_path))
+    segments = checkpoint.manifest['segments']
+    assert [(segment['first_frame'], segment['last_frame']) for segment in segments] == \
+        [(0, 100), (100, 200), (200, 203)]
+    assert checkpoint.get_pending_segments() == segments
+
+
+def test_restarted_checkpoint_skips_finished_segments(tmp_path):
+    checkpoint = RenderCheckpoint(SCHEMA, 10, 250, 'medium', checkpoint_dir=str(tmp_path))
+    first_segment = checkpoint.manifest['segments'][0]
+    open(checkpoint.get_segment_path(first_segment), 'wb').close()
+    checkpoint.mark_done(first_segment)
+    restarted = RenderCheckpoint(SCHEMA, 10, 250, 'medium', checkpoint_dir=str(tmp_path))
+    assert restarted.key == checkpoint.key
+    assert [segment['first_frame'] for segment in restarted.get_pending_segments()] == [100, 200]
+    # A segment recorded as done but whose file is gone is rendered again
+    os.remove(restarted.get_segment_path(restarted.manifest['segments'][0]))
+    assert len(restarted.get_pending_segments()) == 3
+
+
+def test_other_settings_get_another_checkpoint(tmp_path):
+    checkpoint = RenderCheckpoint(SCHEMA, 10, 250, 'medium', checkpoint_dir=str(tmp_path))
+    assert RenderCheckpoint(SCHEMA, 10, 250, 'fast', checkpoint_dir=str(tmp_path)).key != checkpoint.key
+    assert RenderCheckpoint(SCHEMA, 25, 250, 'medium', checkpoint_dir=str(tmp_path)).key != checkpoint.key
+
+
+def test_remove_deletes_the_checkpoint(tmp_path):
+    checkpoint = RenderCheckpoint(SCHEMA, 10, 250, 'medium', checkpoint_dir=str(tmp_path))
+    checkpoint.remove()
+    assert not os.path.exists(checkpoint.directory)
+
+
+def test_abandoned_checkpoints_are_pruned(tmp_path):
+    old_time = time.time() - 3600
+    abandoned = RenderCheckpoint(SCHEMA, 10, 250, 'medium', checkpoint_dir=str(tmp_path))
+    os.utime(abandoned.manifest_path, (old_time, old_time))
+    recent = RenderCheckpoint(SCHEMA, 10, 250, 'fast', checkpoint_dir=str(tmp_path))
+    RenderCheckpoint(SCHEMA, 10, 250, 'slow', checkpoint_dir=str(tmp_path), max_age=60)
+    assert not os.path.exists(abandoned.directory)
+    assert os.path.exists(recent.directory)
+    # The checkpoint being opened is kept however old it is
+    os.utime(recent.manifest_path, (old_time, old_time))
+    prune_checkpoints(str(tmp_path), max_age=60, keep=recent.key)
+    assert os.path.exists(recent.directory)
+
+
+def test_segment_keys_only_change_where_the_layers_changed(tmp_path):
+    store = RenderSegmentStore(store_dir=str(tmp_path))
+    fps = 10
+    n_frames = 3 * INCREMENTAL_SEGMENT_DURATION * fps
+    schema = caption_schema([('caption_0', 'first', 0, 1), ('caption_1', 'second', INCREMENTAL_SEGMENT_DURATION + 1, INCREMENTAL_SEGMENT_DURATION + 2)])
+    segments = store.get_segments(schema, fps, n_frames, 'medium')
+    assert [(segment['first_frame'], segment['last_frame']) for segment in segments] == [(0, 50), (50, 100), (100, 150)]
+    # Inserting a layer shifts the keys of the others, the segments keep their hashes
+    renamed = caption_schema([('caption_1', 'first', 0, 1), ('caption_2', 'second', INCREMENTAL_SEGMENT_DURATION + 1, INCREMENTAL_SEGMENT_DURATION + 2)])
+    assert [segment['key'] for segment in store.get_segments(renamed, fps, n_frames, 'medium')] == [segment['key'] for segment in segments]
+    edited = caption_schema([('caption_0', 'first', 0, 1), ('caption_1', 'edited', INCREMENTAL_SEGMENT_DURATION + 1, INCREMENTAL_SEGMENT_DURATION + 2)])
+    edited_keys = [segment['key'] for segment in store.get_segments(edited, fps, n_frames, 'medium')]
+    assert [old['key'] == new for old, new in zip(segments, edited_keys)] == [True, False, True]
+    assert store.get_segments(schema, fps, n_frames, 'fast')[0]['key'] != segments[0]['key']
+
+
+def test_segment_store_finds_rendered_segments(tmp_path):
+    store = RenderSegmentStore(store_dir=str(tmp_path))
+    segment = store.get_segments(caption_schema([('caption_0', 'text', 0, 1)]), 10, 20, 'medium')[0]
+    assert not store.is_rendered(segment)
+    with open(store.get_path(segment), 'wb') as f:
+        f.write(b'segment')
+    os.utime(store.get_path(segment), (0, 0))
+    assert store.is_rendered(segment)
+    # Reusing a segment makes it the most recently used
+    assert os.path.getmtime(store.get_path(segment)) > 0
+
+
+def test_segment_store_evicts_the_least_recently_used_segments(tmp_path):
+    store = RenderSegmentStore(store_dir=str(tmp_path), max_size=25)
+    for i, name in enumerate(['old.mp4', 'kept.mp4', 'recent.mp4', 'writing.partial.mp4']):
+        path = tmp_path / name
+        path.write_bytes(b'0' * 10)
+        os.utime(path, (i, i))
+    store.evict(keep=[str(tmp_path / 'kept.mp4')])
+    assert sorted(os.listdir(tmp_path)) == ['kept.mp4', 'recent.mp4', 'writing.partial.mp4']
+
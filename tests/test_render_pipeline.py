@@ -0,0 +1,73 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+from moviepy.editor import ColorClip, VideoClip, VideoFileClip
+
+from conftest import count_frames, make_video_schema, requires_ffmpeg
+from shortGPT.editing_framework import render_pipeline
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
+from shortGPT.editing_framework.ffmpeg_editing_engine import probe_media
+
+N_WORKERS = 2
+requires_fork = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="The look-ahead workers are forked")
+
+
+def build_color_clip(color):
+    clip = ColorClip((32, 16), color=color, duration=1)
+    clip.fps = 10
+    return clip
+
+
+def build_counter_clip():
+    # The red channel of frame i is 20 * i
+    clip = VideoClip(lambda t: np.full((16, 32, 3), (int(round(t * 10)) * 20, 0, 0), dtype=np.uint8), duration=1)
+    clip.fps = 10
+    return clip
+
+
+def test_frame_ranges_are_contiguous():
+    assert render_pipeline.get_frame_ranges(10, 3) == [(0, 3), (3, 7), (7, 10)]
+    assert render_pipeline.get_frame_ranges(2, 4) == [(0, 1), (1, 2)]
+    assert render_pipeline.get_frame_ranges(0, 2) == []
+
+
+@requires_ffmpeg
+@requires_fork
+def test_workers_are_forked_before_on_workers_started(tmp_path):
+    workers_started = []
+
+    def on_workers_started():
+        workers_started.append(len(multiprocessing.active_children()))
+        return None
+    output_file = str(tmp_path / 'out.mp4')
+    render_pipeline.write_video_pipelined(build_color_clip, ((200, 0, 0),), output_file, (32, 16), 10, 10, N_WORKERS,
+                                          multiprocessing.get_context('fork'), preset='ultrafast', on_workers_started=on_workers_started)
+    assert workers_started == [N_WORKERS]
+    assert count_frames(output_file) == 10
+
+
+@requires_ffmpeg
+@requires_fork
+def test_ranges_are_joined_in_order(tmp_path):
+    output_file = str(tmp_path / 'out.mp4')
+    outputs = [{'output_file': str(tmp_path / 'small.mp4'), 'resize': {'width': 16}}]
+    render_pipeline.write_video_pipelined(build_counter_clip, (), output_file, (32, 16), 10, 10, 3,
+                                          multiprocessing.get_context('fork'), preset='ultrafast', outputs=outputs)
+    for file in (output_file, outputs[0]['output_file']):
+        assert count_frames(file) == 10
+    assert probe_media(outputs[0]['output_file'])['width'] == 16
+    clip = VideoFileClip(output_file)
+    try:
+        reds = [clip.get_frame(i / 10)[:, :, 0].mean() for i in range(10)]
+        assert reds == pytest.approx([20 * i for i in range(10)], abs=6)
+    finally:
+        clip.close()
+    # Only the outputs are left, the ranges are removed
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['out.mp4', 'small.mp4']
+
+
+@requires_ffmpeg
+def test_lookahead_is_opt_in(media_dir, workdir, monkeypatch):
+    monkeypatch.setattr(CoreEditingEngine, 'generate_video_pipelined', lambda *args, **kwargs: pytest.fail("rendered with look-ahead"))
+    CoreEditingEngine().generate_video(make_video_schema(media_dir), str(workdir / 'out.mp4'))
@@ -0,0 +1,62 @@
+import json
+import os
+import time
+
+from moviepy.editor import ColorClip
+
+from conftest import count_frames, make_video_schema, requires_ffmpeg
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
+from shortGPT.editing_framework.render_profiling import RenderProfiler
+
+
+def slow_frame_function(make_frame, delay):
+    def make_slow_frame(t):
+        time.sleep(delay)
+        return make_frame(t)
+    return make_slow_frame
+
+
+def test_nested_stages_are_not_counted_twice():
+    profiler = RenderProfiler()
+    profiler.set_asset('image_0', 'image')
+    clip = ColorClip((4, 4), color=(0, 0, 0), duration=1)
+    clip.make_frame = slow_frame_function(clip.make_frame, 0.02)
+    clip = profiler.wrap_clip(clip, 'source')
+    clip.make_frame = slow_frame_function(clip.make_frame, 0.01)
+    clip = profiler.wrap_clip(clip, 'source')
+    for t in (0, 0.5):
+        clip.get_frame(t)
+    stages = profiler.assets['image_0']['stages']
+    # The same stage twice is recorded as two stages
+    assert set(stages) == {'source', 'source_2'}
+    assert 0.04 <= stages['source']['time'] < 0.06
+    assert 0.02 <= stages['source_2']['time'] < 0.04
+    assert stages['source']['allocated_bytes'] == 2 * ColorClip((4, 4), color=(0, 0, 0), duration=1).get_frame(0).nbytes
+    report = profiler.get_report(wall_time=1)
+    assert report['assets']['image_0']['calls'] == 2
+    assert report['assets']['image_0']['time'] == stages['source']['time'] + stages['source_2']['time']
+
+
+def test_clips_outside_an_asset_are_not_wrapped():
+    clip = ColorClip((4, 4), color=(0, 0, 0), duration=1)
+    assert RenderProfiler().wrap_clip(clip, 'source') is clip
+
+
+def test_measure_adds_to_the_totals():
+    profiler = RenderProfiler()
+    for _ in range(2):
+        with profiler.measure('encoder'):
+            time.sleep(0.01)
+    assert profiler.get_report(wall_time=0.1)['encoder']['time'] >= 0.02
+
+
+@requires_ffmpeg
+def test_profiled_render_writes_a_report(media_dir, workdir):
+    output_file = str(workdir / 'profiled.mp4')
+    CoreEditingEngine().generate_video(make_video_schema(media_dir), output_file, profile=True)
+    with open(str(workdir / 'profiled.profile.json'), 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    assert os.path.exists(output_file)
+    assert report['n_frames'] == count_frames(output_file)
+    assert report['assets']['background_video_0']['calls'] == report['n_frames']
+    assert report['assets']['background_video_0']['type'] == 'video'
@@ -0,0 +1,181 @@
+import os
+
+import numpy as np
+import pytest
+from moviepy.editor import ImageClip
+
+from shortGPT.editing_framework import ffmpeg_editing_engine, schema_optimizer
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
+from shortGPT.editing_framework.editing_engine import EditingEngine, EditingStep
+from shortGPT.editing_framework.ffmpeg_editing_engine import FFmpegEditingEngine, probe_media
+from shortGPT.editing_framework.schema_optimizer import (drop_empty_layers, get_audio_duration, merge_repeated_layers,
+                                                         optimize_schema, remove_hidden_layers)
+
+from conftest import MEDIA_DURATION, SHORT_VOICE_DURATION, VIDEO_SIZE, make_video_schema, requires_ffmpeg
+
+
+def image_layer(url, z, start, end, **position):
+    return {'type': 'image', 'z': z, 'parameters': {'url': str(url)},
+            'actions': [{'type': 'set_time_start', 'param': start}, {'type': 'set_time_end', 'param': end},
+                        {'type': 'screen_position', 'param': position or {'pos': (0, 0)}}]}
+
+
+def get_end(asset):
+    return next(action['param'] for action in asset['actions'] if action['type'] == 'set_time_end')
+
+
+def test_merge_repeated_layers_joins_touching_windows():
+    layers = {
+        'background': image_layer('background.png', 0, 0, 3),
+        'caption_0': image_layer('caption.png', 1, 0, 1),
+        'caption_1': image_layer('caption.png', 1, 1, 2),
+        'caption_2': image_layer('caption.png', 1, 2.5, 3),
+    }
+    merged = merge_repeated_layers(layers)
+    assert list(merged) == ['background', 'caption_0', 'caption_2']
+    assert get_end(merged['caption_0']) == 2
+    assert get_end(merged['caption_2']) == 3
+
+
+def test_merge_repeated_layers_keeps_the_stacking_order():
+    # other_0 is composited between the captions and visible during caption_1, merging would draw caption_1 under it
+    layers = {
+        'background': image_layer('background.png', 0, 0, 3),
+        'caption_0': image_layer('caption.png', 1, 0, 1),
+        'other_0': image_layer('other.png', 1, 0, 2),
+        'caption_1': image_layer('caption.png', 1, 1, 2),
+    }
+    assert list(merge_repeated_layers(dict(layers))) == list(layers)
+    # Once other_0 is gone by the time caption_1 starts, the captions can be merged
+    layers['other_0'] = image_layer('other.png', 1, 0, 1)
+    merged = merge_repeated_layers(layers)
+    assert list(merged) == ['background', 'caption_0', 'other_0']
+    assert get_end(merged['caption_0']) == 2
+
+
+def test_merge_repeated_layers_only_merges_into_earlier_layers():
+    # The first window is composited last, its content can't move under the other layer
+    layers = {
+        'background': image_layer('background.png', 0, 0, 3),
+        'caption_1': image_layer('caption.png', 1, 1, 2),
+        'other_0': image_layer('other.png', 1, 0, 3),
+        'caption_0': image_layer('caption.png', 1, 0, 1),
+    }
+    assert list(merge_repeated_layers(layers)) == list(layers)
+
+
+def test_drop_empty_layers_keeps_the_lowest_layer():
+    layers = {
+        'background': image_layer('background.png', 0, 1, 1),
+        'empty': image_layer('caption.png', 1, 2, 2),
+        'reversed': image_layer('caption.png', 1, 2, 1),
+        'caption': image_layer('caption.png', 1, 0, 1),
+    }
+    assert list(drop_empty_layers(layers)) == ['background', 'caption']
+
+
+@requires_ffmpeg
+def test_optimized_schema_renders_the_same_frames(media_dir, tmp_path):
+    for name, color in (('caption.png', (255, 255, 0)), ('other.png', (0, 0, 255))):
+        ImageClip(np.full((16, 16, 3), color, dtype=np.uint8)).save_frame(str(tmp_path / name))
+    schema = make_video_schema(media_dir, voice='short_voice.wav')
+    schema['visual_assets'].update({
+        'caption_0': image_layer(tmp_path / 'caption.png', 1, 0, 0.5, pos=(8, 8)),
+        'other_0': image_layer(tmp_path / 'other.png', 1, 0, 1, pos=(16, 16)),
+        'caption_1': image_layer(tmp_path / 'caption.png', 1, 0.5, 1, pos=(8, 8)),
+        'caption_2': image_layer(tmp_path / 'caption.png', 1, 1, 1.5, pos=(8, 8)),
+        'late': image_layer(tmp_path / 'other.png', 2, 1.5, MEDIA_DURATION + 1, pos=(0, 0)),
+    })
+    optimized = optimize_schema(schema)
+    assert list(optimized['visual_assets']) == ['background_video_0', 'caption_0', 'other_0', 'caption_1', 'late']
+    assert get_end(optimized['visual_assets']['caption_1']) == 1.5
+    assert abs(get_end(optimized['visual_assets']['late']) - SHORT_VOICE_DURATION) < 0.05
+    engine = CoreEditingEngine()
+    clips = [engine.build_video_clip(schema, with_audio=False), engine.build_video_clip(optimized, with_audio=False)]
+    try:
+        for t in (0.25, 0.75, 1.25, 1.75):
+            np.testing.assert_array_equal(clips[0].get_frame(t), clips[1].get_frame(t))
+    finally:
+        for clip in clips:
+            clip.close()
+        engine.readers.close()
+
+
+@requires_ffmpeg
+def test_remove_hidden_layers_under_a_full_frame_video(media_dir):
+    video = make_video_schema(media_dir, with_audio=False)['visual_assets']['background_video_0']
+    layers = {
+        'background': video,
+        'hidden': image_layer(media_dir / 'image.png', 1, 0.5, 1),
+        'visible': image_layer(media_dir / 'image.png', 1, 0, MEDIA_DURATION + 1),
+        'cover': {**video, 'z': 2},
+        'caption': image_layer(media_dir / 'image.png', 3, 0, 1),
+    }
+    assert list(remove_hidden_layers(layers)) == ['background', 'visible', 'cover', 'caption']
+    # A video that is resized down no longer covers the frame
+    layers['cover'] = {**video, 'z': 2, 'actions': video['actions'] + [{'type': 'resize', 'param': {'width': VIDEO_SIZE[0] // 2}}]}
+    assert list(remove_hidden_layers(layers)) == list(layers)
+
+
+@requires_ffmpeg
+def test_optimize_schema_only_probes_the_soundtrack_when_a_window_can_be_clamped(media_dir, monkeypatch):
+    calls = []
+    monkeypatch.setattr(schema_optimizer, 'get_audio_duration', lambda schema: calls.append(schema) or MEDIA_DURATION)
+    schema = make_video_schema(media_dir)
+    video = schema['visual_assets']['background_video_0']
+    video['actions'] = [action for action in video['actions'] if action['type'] != 'set_time_end']
+    optimize_schema(schema)
+    assert calls == []
+    optimize_schema(make_video_schema(media_dir))
+    assert len(calls) == 1
+
+
+@requires_ffmpeg
+def test_probe_media_probes_each_version_of_a_file_once(media_dir, tmp_path, monkeypatch):
+    calls = []
+    run_ffprobe = ffmpeg_editing_engine.run_ffprobe
+    monkeypatch.setattr(ffmpeg_editing_engine, 'run_ffprobe', lambda url: calls.append(url) or run_ffprobe(url))
+    path = tmp_path / 'image.png'
+    path.write_bytes((media_dir / 'image.png').read_bytes())
+    infos = probe_media(str(path))
+    infos['width'] = 0
+    assert probe_media(str(path))['width'] == 16
+    assert calls == [str(path)]
+    # A new version of the file is probed again
+    ImageClip(np.zeros((24, 8, 3), dtype=np.uint8)).save_frame(str(path))
+    os.utime(path, (0, 1))
+    assert probe_media(str(path))['width'] == 8
+    assert len(calls) == 2
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('music_actions', [
+    [],
+    [{'type': 'set_time_start', 'param': 1}],
+    [{'type': 'subclip', 'param': {'t_start': 0.5}}, {'type': 'set_time_start', 'param': 1.2}],
+    [{'type': 'loop_background_music', 'param': 3}, {'type': 'normalize_music', 'param': None}],
+], ids=['voice', 'delayed', 'subclip', 'looped'])
+def test_audio_duration_matches_the_mix(media_dir, music_actions, monkeypatch):
+    schema = make_video_schema(media_dir, voice='short_voice.wav')
+    schema['audio_assets']['music_0'] = {'type': 'audio', 'z': -1, 'parameters': {'url': str(media_dir / 'voice.wav')},
+                                         'actions': music_actions}
+    expected = max(track['end'] for track in FFmpegEditingEngine().compile_audio_tracks(schema))
+    # The duration is read from the probes, without measuring the volume of normalized tracks
+    monkeypatch.setattr(FFmpegEditingEngine, 'measure_max_volume', lambda *args: pytest.fail("measured the volume"))
+    assert get_audio_duration(schema) == pytest.approx(expected)
+
+
+@requires_ffmpeg
+def test_audio_duration_of_the_background_music_step(media_dir):
+    engine = EditingEngine()
+    engine.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {'url': str(media_dir / 'short_voice.wav')})
+    engine.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': str(media_dir / 'voice.wav'),
+                                                             'loop_background_music': SHORT_VOICE_DURATION, 'volume_percentage': 0.11})
+    assert get_audio_duration(engine.dumpEditingSchema()) == pytest.approx(SHORT_VOICE_DURATION, abs=0.05)
+
+
+def test_audio_duration_is_unknown_without_probes(tmp_path):
+    assert get_audio_duration({'visual_assets': {}, 'audio_assets': {}}) is None
+    schema = {'visual_assets': {}, 'audio_assets': {'voiceover_0': {'type': 'audio', 'z': -1, 'parameters': {'url': str(tmp_path / 'missing.wav')},
+                                                                      'actions': []}}}
+    assert get_audio_duration(schema) is None
@@ -0,0 +1,100 @@
+import pytest
+from moviepy.editor import ColorClip
+
+from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
+from shortGPT.editing_framework.schema_utils import get_clip_timing, is_static_asset, scale_schema, schema_hash, slice_schema
+
+
+def make_asset(asset_type='image', z=1, actions=(), **parameters):
+    return {'type': asset_type, 'z': z, 'parameters': parameters, 'actions': list(actions)}
+
+
+def timed(start, end=None):
+    actions = [{'type': 'set_time_start', 'param': start}]
+    if end is not None:
+        actions.append({'type': 'set_time_end', 'param': end})
+    return actions
+
+
+@pytest.mark.parametrize('actions, duration', [
+    (timed(1.5), 4),
+    (timed(1.5, 3), None),
+    (timed(1.5, 3), 4),
+    ([{'type': 'subclip', 'param': {'t_start': 1, 't_end': 3}}] + timed(2), 4),
+    (timed(2) + [{'type': 'subclip', 'param': {'t_start': 0.5}}], 4),
+    ([{'type': 'subclip', 'param': {'t_start': -3, 't_end': -1}}], 4),
+])
+def test_clip_timing_matches_moviepy(actions, duration):
+    clip = CoreEditingEngine().process_common_actions(ColorClip((4, 4), color=(0, 0, 0), duration=duration), actions)
+    timing = get_clip_timing(actions, duration)
+    assert (timing['start'], timing['end'], timing['duration']) == pytest.approx((clip.start, clip.end, clip.duration))
+
+
+def test_schema_hash_ignores_key_order():
+    schema = {'visual_assets': {'a': make_asset(url='a.png'), 'b': make_asset(z=2, url='b.png')}, 'audio_assets': {}}
+    reordered = {'audio_assets': {}, 'visual_assets': {'b': make_asset(z=2, url='b.png'), 'a': make_asset(url='a.png')}}
+    assert schema_hash(schema) == schema_hash(reordered)
+    schema['visual_assets']['b']['z'] = 3
+    assert schema_hash(schema) != schema_hash(reordered)
+
+
+def test_is_static_asset():
+    position = {'type': 'screen_position', 'param': {'pos': 'center'}}
+    assert is_static_asset(make_asset('image', 1, timed(0, 2) + [position], url='img.png'))
+    assert is_static_asset(make_asset('text', 1, [position, {'type': 'resize', 'param': {'width': 100}}], text='a'))
+    assert not is_static_asset(make_asset('video', 1, [position], url='bg.mp4'))
+    # Positions and sizes changing over time
+    assert not is_static_asset(make_asset('image', 1, [{'type': 'screen_position', 'param': {'pos': lambda t: (t, 0)}}], url='img.png'))
+    assert not is_static_asset(make_asset('image', 1, [{'type': 'resize', 'param': {'newsize': lambda t: 1 + t}}], url='img.png'))
+    assert not is_static_asset(make_asset('text', 1, [{'type': 'fadein', 'param': 1}], text='a'))
+
+
+def test_slice_schema_keeps_the_assets_visible_in_the_slice():
+    schema = {'visual_assets': {
+        'caption_2': make_asset('text', 2, timed(6, 8), text='b'),
+        'background': make_asset('video', 0, timed(0, 10), url='bg.mp4'),
+        'caption_1': make_asset('text', 2, timed(1, 4), text='a'),
+        'watermark': make_asset('image', 3, url='logo.png'),
+    }, 'audio_assets': {'voiceover': {'type': 'audio', 'parameters': {'url': 'voice.wav'}, 'actions': []}}}
+    assert list(slice_schema(schema, 0, 5)['visual_assets']) == ['background', 'caption_1', 'watermark']
+    # Assets ending when the slice starts, or starting when it ends, are dropped
+    assert list(slice_schema(schema, 4, 6)['visual_assets']) == ['background', 'watermark']
+    assert slice_schema(schema, 5, 10)['audio_assets'] == {}
+
+
+def test_slice_schema_always_keeps_the_lowest_asset():
+    schema = {'visual_assets': {'caption': make_asset('text', 1, timed(0, 1), text='a'),
+                                'background': make_asset('video', 0, timed(0, 2), url='bg.mp4')}, 'audio_assets': {}}
+    assert list(slice_schema(schema, 5, 6)['visual_assets']) == ['background']
+
+
+def test_scale_schema_scales_pixel_parameters():
+    schema = {'visual_assets': {
+        'video': make_asset('video', 0, [{'type': 'crop', 'param': {'x1': 30, 'width': 300, 'height': 600}},
+                                         {'type': 'resize', 'param': {'width': 1080}}], url='bg.mp4'),
+        'image': make_asset('image', 1, [{'type': 'screen_position', 'param': {'pos': [90, 'center']}},
+                                         {'type': 'auto_resize_image', 'param': {'maxWidth': 690, 'maxHeight': 690}}], url='img.png'),
+        'relative': make_asset('image', 2, [{'type': 'screen_position', 'param': {'pos': [0.5, 0.2], 'relative': True}}], url='img.png'),
+        'text': make_asset('text', 3, text='Hi', fontsize=60, stroke_width=2, size=[900, None]),
+    }, 'audio_assets': {}}
+    scaled = scale_schema(schema, 1 / 3)
+    video, image = scaled['visual_assets']['video'], scaled['visual_assets']['image']
+    # Sources are shrunk first
+    assert video['actions'][0] == {'type': 'resize', 'param': {'newsize': 1 / 3}}
+    assert video['actions'][1]['param'] == {'x1': 10, 'width': 100, 'height': 200}
+    assert video['actions'][2]['param'] == {'width': 360}
+    assert image['actions'][1]['param']['pos'] == [30, 'center']
+    assert image['actions'][2]['param'] == {'maxWidth': 230, 'maxHeight': 230}
+    assert scaled['visual_assets']['relative']['actions'][1]['param']['pos'] == [0.5, 0.2]
+    text = scaled['visual_assets']['text']['parameters']
+    assert (text['fontsize'], text['stroke_width'], text['size']) == (20, 1, [300, None])
+    # The schema itself is left untouched
+    assert schema['visual_assets']['text']['parameters']['fontsize'] == 60
+    assert len(schema['visual_assets']['video']['actions']) == 2
+
+
+def test_scale_schema_keeps_relative_resize():
+    schema = {'visual_assets': {'image': make_asset('image', 0, [{'type': 'resize', 'param': {'newsize': 0.5}}], url='img.png')},
+              'audio_assets': {}}
+    actions = scale_schema(schema, 0.5)['visual_assets']['image']['actions']
+    assert actions == [{'type': 'resize', 'param': {'newsize': 0.5}}, {'type': 'resize', 'param': {'newsize': 0.5}}]
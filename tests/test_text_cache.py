@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+
+from shortGPT.editing_framework.text_cache import TextRasterCache
+
+
+def make_raster(value):
+    rng = np.random.default_rng(value)
+    # Noise, so that every PNG has about the same size whatever its content
+    return rng.integers(0, 256, size=(32, 32, 4), dtype=np.uint8)
+
+
+def set_mtime(cache, params, mtime):
+    os.utime(cache.get_path(cache.get_key(params)), (mtime, mtime))
+
+
+def test_get_or_render_renders_once(tmp_path):
+    cache = TextRasterCache(cache_dir=str(tmp_path))
+    calls = []
+
+    def render(**params):
+        calls.append(params)
+        return make_raster(1)
+    params = {'txt': 'Hello', 'fontsize': 20, 'font': 'Arial'}
+    first = cache.get_or_render(params, render)
+    second = cache.get_or_render(dict(params), render)
+    assert len(calls) == 1
+    assert np.array_equal(first, second)
+
+
+def test_key_depends_on_every_parameter(tmp_path):
+    cache = TextRasterCache(cache_dir=str(tmp_path))
+    params = {'txt': 'Hello', 'fontsize': 20, 'font': 'Arial'}
+    assert cache.get_key(params) == cache.get_key(dict(reversed(list(params.items()))))
+    assert cache.get_key(params) != cache.get_key({**params, 'fontsize': 21})
+    assert cache.get_key(params) != cache.get_key({**params, 'txt': 'Hello!'})
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TextRasterCache(cache_dir=str(tmp_path), max_size=10 ** 9)
+    params = [{'txt': f'text {i}', 'fontsize': 20} for i in range(3)]
+    for i, text_params in enumerate(params):
+        cache.put(text_params, make_raster(i))
+        set_mtime(cache, text_params, 1000 + i)
+    # Reading the oldest raster makes it the most recently used
+    assert cache.get(params[0]) is not None
+    raster_size = os.path.getsize(cache.get_path(cache.get_key(params[0])))
+    cache.max_size = 3 * raster_size
+    cache.put({'txt': 'text 3', 'fontsize': 20}, make_raster(3))
+    assert cache.get(params[1]) is None
+    assert cache.get(params[0]) is not None
+    assert cache.get(params[2]) is not None
+
+
+def test_eviction_ignores_files_being_written(tmp_path):
+    cache = TextRasterCache(cache_dir=str(tmp_path), max_size=0)
+    partial_file = tmp_path / 'tmpabc123.tmp'
+    partial_file.write_bytes(b'0' * 1024)
+    cache.put({'txt': 'Hello', 'fontsize': 20}, make_raster(1))
+    assert partial_file.exists()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.png')]
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from PIL import ImageFont
+
+from shortGPT.editing_framework.text_rendering import (FALLBACK_FONTS, find_font_file, get_gravity, get_text_clip_params,
+                                                       load_font, render_text, wrap_text)
+
+
+@pytest.fixture(scope='module')
+def font():
+    for fallback in FALLBACK_FONTS:
+        try:
+            ImageFont.truetype(fallback, 12)
+            return fallback
+        except OSError:
+            continue
+    pytest.skip("No fallback font is installed")
+
+
+def test_get_gravity():
+    assert get_gravity(None) == ('center', 'center')
+    assert get_gravity('West') == ('left', 'center')
+    assert get_gravity('NorthEast') == ('right', 'top')
+    assert get_gravity('south') == ('center', 'bottom')
+
+
+def test_get_text_clip_params():
+    params = get_text_clip_params({'text': 'Hello', 'fontsize': 40, 'font': 'Arial', 'stroke_width': 2, 'unused': 1})
+    assert params == {'txt': 'Hello', 'fontsize': 40, 'font': 'Arial', 'stroke_width': 2}
+
+
+def test_get_text_clip_params_needs_a_size():
+    with pytest.raises(Exception):
+        get_text_clip_params({'font': 'Arial'})
+
+
+def test_find_font_file(tmp_path, font):
+    assert find_font_file('Not-An-Installed-Font-Name') is None
+    font_file = tmp_path / 'font.ttf'
+    font_file.write_bytes(b'')
+    assert find_font_file(str(font_file)) == str(font_file)
+
+
+def test_wrap_text_fits_width(font):
+    font_object = load_font(font, 20)
+    lines = wrap_text(font_object, 'the quick brown fox jumps over the lazy dog', 120, 0)
+    assert len(lines) > 1
+    assert ' '.join(lines) == 'the quick brown fox jumps over the lazy dog'
+    assert all(font_object.getlength(line) <= 120 for line in lines if ' ' in line)
+
+
+def test_render_text_in_a_box(font):
+    raster = render_text('Hello world', fontsize=30, font=font, color='white', size=(300, 80), method='caption')
+    assert raster.shape == (80, 300, 4)
+    assert raster.dtype == np.uint8
+    # Opaque white glyphs on a transparent background
+    assert raster[:, :, 3].max() == 255
+    assert raster[0, 0, 3] == 0
+    assert (raster[raster[:, :, 3] == 255][:, :3] == 255).all()
+
+
+def test_render_text_stroke_colors_the_outline(font):
+    raster = render_text('O', fontsize=60, font=font, color='white', stroke_width=3, stroke_color='black')
+    opaque = raster[raster[:, :, 3] == 255][:, :3]
+    assert (opaque == 0).all(axis=1).any()
+    assert (opaque == 255).all(axis=1).any()
+
+
+def test_render_text_fits_the_fontsize_to_the_box(font):
+    raster = render_text('Fit me', font=font, color='white', size=(200, 50), method='caption')
+    assert raster.shape == (50, 200, 4)
+    visible_columns = np.nonzero(raster[:, :, 3].max(axis=0))[0]
+    assert visible_columns.max() - visible_columns.min() > 100